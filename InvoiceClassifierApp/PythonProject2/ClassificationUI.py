@@ -1,13 +1,20 @@
 import streamlit as st
 import os
+import sys
 
-# Define target folders (modify if needed)
-# Dynamically locate the root of the .NET output directory
-CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))  # where Python script is
-BASE_DIR = os.path.abspath(os.path.join(CURRENT_DIR, ".."))
+# Run with `python -m invoice_tools upload`; target folders come from the invoice_tools configuration
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from invoice_tools.config import load_config
+from invoice_tools.uploads import UploadStore
 
-TRAIN_PATH = os.path.join(BASE_DIR, "TrainData")
-INVOICE_PATH = os.path.join(BASE_DIR, "Invoices")
+config = load_config()
+TRAIN_PATH = config.train_data
+INVOICE_PATH = config.invoices
+UPLOAD_STORE_PATH = config.uploads
+
+# Streamlit reruns this script on every widget change; the content-addressed
+# store recognises files it already holds, so reruns don't rewrite them.
+uploads = UploadStore(UPLOAD_STORE_PATH)
 
 # Ensure directories exist
 os.makedirs(TRAIN_PATH, exist_ok=True)
@@ -30,9 +37,7 @@ if label and training_files:
     os.makedirs(label_dir, exist_ok=True)
 
     for file in training_files:
-        file_path = os.path.join(label_dir, file.name)
-        with open(file_path, "wb") as f:
-            f.write(file.getbuffer())
+        uploads.save(file.getbuffer(), file.name, label_dir)
     st.success(f"✅ Uploaded {len(training_files)} files to category '{label}'")
 
 # Upload Invoices to Classify
@@ -42,9 +47,7 @@ invoice_files = st.file_uploader("Upload invoice documents (.pdf only)", accept_
 
 if invoice_files:
     for file in invoice_files:
-        file_path = os.path.join(INVOICE_PATH, file.name)
-        with open(file_path, "wb") as f:
-            f.write(file.getbuffer())
+        uploads.save(file.getbuffer(), file.name, INVOICE_PATH)
     st.success(f"✅ Uploaded {len(invoice_files)} invoice(s) for classification")
 
 # Option to show existing folders
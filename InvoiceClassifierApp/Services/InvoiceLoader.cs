@@ -22,6 +22,9 @@ public class InvoiceLoader
 
             foreach (var file in Directory.GetFiles(dir))
             {
+                if (IsSuperseded(file))
+                    continue;
+
                 var ext = Path.GetExtension(file).ToLower();
                 string text = "";
 
@@ -34,7 +37,7 @@ public class InvoiceLoader
 
                 data.Add(new InvoiceVector
                 {
-                    Filename = Path.GetFileName(file),
+                    Filename = SourceFilename(file),
                     Label = label.ToLower(),
                     Text = text
                 });
@@ -53,15 +56,20 @@ public class InvoiceLoader
 
         foreach (var file in Directory.GetFiles(invoiceDir))
         {
+            if (IsSuperseded(file))
+                continue;
+
             string text = "";
             var ext = Path.GetExtension(file).ToLower();
 
             if (ext == ".pdf")
                 text = ExtractTextFromPdf(file);
+            else if (ext == ".txt")
+                text = File.ReadAllText(file);
 
             invoices.Add(new InvoiceVector
             {
-                Filename = Path.GetFileName(file),
+                Filename = SourceFilename(file),
                 Label = "unlabeled",
                 Text = text
             });
@@ -70,6 +78,31 @@ public class InvoiceLoader
         return invoices;
     }
 
+    // Text pre-extracted by invoice_tools.extract is saved as "<name>.pdf.txt";
+    // report it under the PDF's name so predictions.csv keys stay the same.
+    private static string SourceFilename(string path)
+    {
+        var name = Path.GetFileName(path);
+        return name.EndsWith(".pdf.txt", StringComparison.OrdinalIgnoreCase) ? name[..^".txt".Length] : name;
+    }
+
+    // "invoice_tools.extract --siblings" writes "<name>.pdf.txt" next to each PDF. Only one of the
+    // pair is loaded: the text while it is at least as new as the PDF, otherwise the PDF.
+    private static bool IsSuperseded(string path)
+    {
+        if (path.EndsWith(".pdf.txt", StringComparison.OrdinalIgnoreCase))
+        {
+            var pdf = path[..^".txt".Length];
+            return File.Exists(pdf) && File.GetLastWriteTimeUtc(path) < File.GetLastWriteTimeUtc(pdf);
+        }
+        if (path.EndsWith(".pdf", StringComparison.OrdinalIgnoreCase))
+        {
+            var text = path + ".txt";
+            return File.Exists(text) && File.GetLastWriteTimeUtc(text) >= File.GetLastWriteTimeUtc(path);
+        }
+        return false;
+    }
+
     private string ExtractTextFromPdf(string path)
     {
         using var reader = new PdfReader(path);
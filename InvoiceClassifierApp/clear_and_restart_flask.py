@@ -2,6 +2,7 @@
 import os
 import shutil
 import subprocess
+import sys
 
 # Step 1: Remove __pycache__ folders
 for root, dirs, files in os.walk(".", topdown=False):
@@ -21,4 +22,4 @@ for root, dirs, files in os.walk(".", topdown=True):
 
 # Step 3: Restart Flask app
 print("\n✅ Cache cleared. Restarting Flask UI...")
-subprocess.run(["python", "invoice_ui_app.py"])
+subprocess.run([sys.executable, "-m", "invoice_tools", "serve", "--debug"])
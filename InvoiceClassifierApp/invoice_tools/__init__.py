@@ -0,0 +1,9 @@
+"""Shared Python tooling for the invoice classifier.
+
+The plotting scripts, the Flask UI and the Streamlit uploader all work on
+the same embeddings and predictions the .NET app produces. The modules in
+this package hold the code they share so each script stays a thin wrapper.
+
+Keep this file free of heavy imports: scripts only pay for the modules they
+actually use.
+"""
@@ -0,0 +1,243 @@
+"""Approximate nearest-neighbour search with an inverted-file (IVF) index.
+
+Brute-force KNN scores every training vector for every invoice, which grows
+linearly with TrainData. ``IVFIndex`` clusters the training vectors with
+spherical k-means (the coarse quantizer) and keeps one inverted list of
+rows per cluster. A query only scores the members of its ``nprobe`` closest
+lists; that shortlist is re-ranked with exact cosine similarity on the
+full-precision vectors, so results match brute force whenever the true
+neighbours are among the probed lists. ``nprobe`` is the recall/latency
+knob: ``nprobe == nlist`` is exact.
+
+The index is persisted next to the store it was built from (``ivf.npz``)
+and only references the store's rows, so vectors are never duplicated. It
+records the store's ``generation`` and refuses to load against any other
+write of the store, even one with the same number of rows::
+
+    python -m invoice_tools.ann build train.store --nlist 1024
+    python -m invoice_tools.ann eval train.store --queries invoices.store --target-recall 0.99
+"""
+
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+from .kmeans import assign, spherical_kmeans, unit_rows
+from .knn import top_positions
+from .store import EmbeddingStore
+
+INDEX_FILE = "ivf.npz"
+# Points per list used to train the coarse quantizer (as FAISS recommends).
+TRAIN_POINTS_PER_LIST = 64
+
+
+def _exact_order(indices: np.ndarray, scores: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Sort each row best first, equal scores by row index (like brute force)."""
+    order = np.lexsort((indices, -scores), axis=1)
+    return np.take_along_axis(indices, order, axis=1), np.take_along_axis(scores, order, axis=1)
+
+
+def _recall(approx: np.ndarray, exact: np.ndarray) -> float:
+    hits = sum(len(np.intersect1d(a[a >= 0], e[e >= 0])) for a, e in zip(approx, exact))
+    total = int((exact >= 0).sum())
+    return hits / total if total else 1.0
+
+
+class IVFIndex:
+    def __init__(self, vectors: np.ndarray, rows: np.ndarray, norms: np.ndarray, centroids: np.ndarray,
+                 order: np.ndarray, offsets: np.ndarray, nprobe: int = 8):
+        self.vectors = vectors        # store matrix (usually memory-mapped)
+        self.rows = rows              # store row of every indexed item
+        self.norms = norms            # norm of every indexed item
+        self.centroids = centroids    # nlist x D unit vectors
+        self.order = order            # items grouped by list
+        self.offsets = offsets        # list l holds order[offsets[l]:offsets[l + 1]]
+        self.nprobe = nprobe
+
+    @property
+    def nlist(self) -> int:
+        return self.centroids.shape[0]
+
+    @property
+    def dim(self) -> int:
+        return self.centroids.shape[1]
+
+    def __len__(self) -> int:
+        return self.rows.shape[0]
+
+    @classmethod
+    def build(cls, vectors: np.ndarray, nlist: int | None = None, rows: np.ndarray | None = None,
+              nprobe: int = 8, seed: int = 0) -> "IVFIndex":
+        """Index ``vectors[rows]`` (all rows by default).
+
+        ``nlist`` defaults to about sqrt(N) lists.
+        """
+        rows = np.arange(vectors.shape[0]) if rows is None else np.asarray(rows, dtype=np.int64)
+        n = rows.shape[0]
+        if n == 0:
+            raise ValueError("cannot index an empty set of vectors")
+        nlist = min(nlist or max(1, int(np.sqrt(n))), n)
+
+        norms = np.empty(n, dtype=np.float32)
+        for start in range(0, n, 8192):
+            norms[start:start + 8192] = np.linalg.norm(
+                np.asarray(vectors[rows[start:start + 8192]], dtype=np.float32), axis=1)
+        norms[norms == 0] = 1
+
+        rng = np.random.default_rng(seed)
+        sample = np.sort(rng.choice(n, min(n, nlist * TRAIN_POINTS_PER_LIST), replace=False))
+        centroids = spherical_kmeans(unit_rows(vectors[rows[sample]]), nlist, seed=seed)
+
+        lists = np.empty(n, dtype=np.int64)
+        for start in range(0, n, 8192):
+            block = np.asarray(vectors[rows[start:start + 8192]], dtype=np.float32) / norms[start:start + 8192, None]
+            lists[start:start + 8192], _ = assign(block, centroids)
+        order = np.argsort(lists, kind="stable")
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(lists, minlength=centroids.shape[0]))])
+        return cls(vectors, rows, norms, centroids, order, offsets, nprobe=min(nprobe, centroids.shape[0]))
+
+    def save(self, path: str, generation: str | None = None) -> None:
+        """Write the index; ``generation`` is that of the store it was built from."""
+        tmp = path + ".tmp.npz"
+        meta = {"nprobe": self.nprobe, "count": int(self.vectors.shape[0]), "generation": generation}
+        np.savez(tmp, rows=self.rows, norms=self.norms, centroids=self.centroids, order=self.order,
+                 offsets=self.offsets, meta=np.array(json.dumps(meta)))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str, vectors: np.ndarray, generation: str | None = None) -> "IVFIndex":
+        with np.load(path) as data:
+            meta = json.loads(str(data["meta"]))
+            check_source(path, meta, vectors, generation)
+            return cls(vectors, data["rows"], data["norms"], data["centroids"], data["order"], data["offsets"],
+                       nprobe=meta["nprobe"])
+
+    def search(self, queries: np.ndarray, k: int, nprobe: int | None = None) -> tuple[np.ndarray, np.ndarray]:
+        """Item indices and exact cosine similarities of the approximate top ``k``.
+
+        Queries are grouped by inverted list, so each probed list is scored
+        against all the queries that probe it with one matrix product.
+        Rows with fewer than ``k`` candidates are padded with index -1.
+        """
+        nprobe = min(nprobe or self.nprobe, self.nlist)
+        q = unit_rows(np.atleast_2d(queries))
+        k = min(k, len(self))
+        best = np.full((q.shape[0], k), -np.inf, dtype=np.float32)
+        best_idx = np.full((q.shape[0], k), -1, dtype=np.int64)
+
+        coarse = q @ self.centroids.T
+        if nprobe < self.nlist:
+            probes = np.argpartition(-coarse, nprobe - 1, axis=1)[:, :nprobe]
+        else:
+            probes = np.broadcast_to(np.arange(self.nlist), coarse.shape)
+
+        query_ids = np.repeat(np.arange(q.shape[0]), probes.shape[1])
+        list_ids = probes.ravel()
+        by_list = np.argsort(list_ids, kind="stable")
+        bounds = np.searchsorted(list_ids[by_list], np.arange(self.nlist + 1))
+
+        for lst in range(self.nlist):
+            qs = query_ids[by_list[bounds[lst]:bounds[lst + 1]]]
+            members = self.order[self.offsets[lst]:self.offsets[lst + 1]]
+            if len(qs) == 0 or len(members) == 0:
+                continue
+            vecs = np.asarray(self.vectors[self.rows[members]], dtype=np.float32) / self.norms[members, None]
+            scores = q[qs] @ vecs.T
+
+            cand = np.concatenate([best[qs], scores], axis=1)
+            cand_idx = np.concatenate([best_idx[qs], np.broadcast_to(members, scores.shape)], axis=1)
+            keep = top_positions(cand, k, cand_idx)
+            best[qs] = np.take_along_axis(cand, keep, axis=1)
+            best_idx[qs] = np.take_along_axis(cand_idx, keep, axis=1)
+
+        return _exact_order(best_idx, best)
+
+    def recall(self, queries: np.ndarray, k: int, nprobe: int | None = None) -> float:
+        """Fraction of the exact top ``k`` found with ``nprobe`` lists."""
+        return _recall(self.search(queries, k, nprobe)[0], self.search(queries, k, self.nlist)[0])
+
+    def tune_nprobe(self, queries: np.ndarray, k: int, target_recall: float) -> tuple[int, list[dict]]:
+        """Smallest power-of-two ``nprobe`` reaching ``target_recall`` on ``queries``.
+
+        Also returns the recall/latency of every ``nprobe`` tried.
+        """
+        exact, _ = self.search(queries, k, self.nlist)
+        report = []
+        nprobe = 1
+        while True:
+            started = time.perf_counter()
+            approx, _ = self.search(queries, k, nprobe)
+            elapsed = time.perf_counter() - started
+            recall = _recall(approx, exact)
+            report.append({"nprobe": nprobe, "recall": recall, "ms_per_query": 1000 * elapsed / max(1, len(queries))})
+            if recall >= target_recall or nprobe >= self.nlist:
+                return nprobe, report
+            nprobe = min(nprobe * 2, self.nlist)
+
+
+def check_source(path: str, meta: dict, vectors: np.ndarray, generation: str | None) -> None:
+    """Raise unless the index at ``path`` was built from this write of the store."""
+    if meta["count"] != vectors.shape[0]:
+        raise ValueError(f"{path} was built for {meta['count']} vectors, store has {vectors.shape[0]}; rebuild it")
+    if generation is not None and meta.get("generation") != generation:
+        raise ValueError(f"{path} was built from an earlier write of the store; rebuild it")
+
+
+def labeled_rows(store: EmbeddingStore) -> np.ndarray:
+    return np.array([i for i, label in enumerate(store.labels) if label is not None], dtype=np.int64)
+
+
+def index_path(store: EmbeddingStore) -> str:
+    return os.path.join(store.path, INDEX_FILE)
+
+
+def main(argv: list[str] | None = None) -> None:
+    from .knn import KnnClassifier
+
+    parser = argparse.ArgumentParser(description="Build and evaluate an IVF index over a training store.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_build = sub.add_parser("build", help="Build the index for the labeled rows of a store")
+    p_build.add_argument("store")
+    p_build.add_argument("--nlist", type=int, help="Number of inverted lists (default: sqrt(N))")
+    p_build.add_argument("--nprobe", type=int, default=8, help="Default lists probed per query")
+    p_build.add_argument("--seed", type=int, default=0)
+
+    p_eval = sub.add_parser("eval", help="Recall/latency per nprobe and agreement with brute-force KNN")
+    p_eval.add_argument("store")
+    p_eval.add_argument("--queries", required=True, help="Store of query embeddings")
+    p_eval.add_argument("-k", type=int, default=3)
+    p_eval.add_argument("--target-recall", type=float, default=0.95)
+    p_eval.add_argument("--save", action="store_true", help="Persist the tuned nprobe in the index")
+    args = parser.parse_args(argv)
+
+    store = EmbeddingStore.open(args.store)
+    if args.command == "build":
+        started = time.perf_counter()
+        index = IVFIndex.build(store.vectors, args.nlist, rows=labeled_rows(store), nprobe=args.nprobe, seed=args.seed)
+        index.save(index_path(store), store.generation)
+        print(f"✅ Built IVF index ({len(index)} vectors, {index.nlist} lists) in "
+              f"{time.perf_counter() - started:.2f}s: {index_path(store)}")
+        return
+
+    index = IVFIndex.load(index_path(store), store.vectors, store.generation)
+    queries = EmbeddingStore.open(args.queries).vectors
+    nprobe, report = index.tune_nprobe(queries, args.k, args.target_recall)
+    for row in report:
+        print(f"nprobe={row['nprobe']:>5}  recall@{args.k}={row['recall']:.4f}  {row['ms_per_query']:.3f} ms/query")
+
+    exact = KnnClassifier.from_store(store, k=args.k).predict_batch(queries)
+    index.nprobe = nprobe
+    approx = KnnClassifier.from_store(store, k=args.k, index=index).predict_batch(queries)
+    agree = sum(a.label == e.label for a, e in zip(approx, exact)) / max(1, len(exact))
+    print(f"✅ nprobe={nprobe}: predictions agree with brute force on {agree:.2%} of {len(exact)} queries")
+    if args.save:
+        index.save(index_path(store), store.generation)
+        print(f"💾 Saved nprobe={nprobe} to {index_path(store)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+"""Leave-one-out label-consistency audit of a labeled embedding store.
+
+``plot_umap.py`` used to flag "possible misclassified documents" with a
+4-NN search on the 2-D UMAP coordinates. Here every labeled document is
+classified by its ``k`` nearest *other* labeled documents in the original
+embedding space, with the same voting rules as ``KnnClassifier``. The
+neighbour search reuses the tiled top-k of ``similarity.iter_topk``, so the
+N x N similarity matrix is never materialized and a memory-mapped store of
+a million vectors is audited in O(N x k) memory.
+
+The report is JSON: overall and per-label accuracy, the confusion matrix
+(rows are the given label, columns the leave-one-out prediction) and the
+most suspicious documents together with their nearest conflicting
+neighbour. ``--predictions`` additionally writes one CSV row per document::
+
+    python -m invoice_tools.audit train.store -o audit.json --predictions loo.csv
+"""
+
+import argparse
+import csv
+import json
+import time
+from typing import NamedTuple
+
+import numpy as np
+
+from .knn import vote_majority
+from .similarity import TILE_COLS, TILE_ROWS, iter_topk
+from .store import EmbeddingStore, load_embeddings
+
+NO_NEIGHBOR = -1
+
+
+class LooResult(NamedTuple):
+    """Per-document leave-one-out outcome; arrays are aligned with ``filenames``."""
+
+    filenames: list[str]
+    classes: np.ndarray
+    codes: np.ndarray
+    predicted: np.ndarray
+    score: np.ndarray
+    top_neighbor: np.ndarray
+    agreement: np.ndarray
+    conflict: np.ndarray
+    conflict_score: np.ndarray
+
+
+def leave_one_out(vectors: np.ndarray, labels: list[str], filenames: list[str], k: int = 3,
+                  tile_rows: int = TILE_ROWS, tile_cols: int = TILE_COLS) -> LooResult:
+    """Classify every row by its ``k`` nearest other rows.
+
+    ``agreement`` is the share of those neighbours carrying the row's own
+    label; ``conflict`` is the nearest of them with a different label
+    (``NO_NEIGHBOR`` if all agree) and ``conflict_score`` its similarity.
+    """
+    if vectors.shape[0] != len(labels) or len(labels) != len(filenames):
+        raise ValueError("vectors, labels and filenames must have the same length")
+    n = len(labels)
+    classes, codes = np.unique(np.asarray(labels, dtype=object), return_inverse=True)
+    codes = codes.astype(np.int32)
+
+    predicted = np.full(n, NO_NEIGHBOR, dtype=np.int32)
+    score = np.zeros(n, dtype=np.float32)
+    top_neighbor = np.full(n, NO_NEIGHBOR, dtype=np.int64)
+    agreement = np.zeros(n, dtype=np.float32)
+    conflict = np.full(n, NO_NEIGHBOR, dtype=np.int64)
+    conflict_score = np.full(n, -np.inf, dtype=np.float32)
+
+    for r0, idx, sims in iter_topk(vectors, vectors, k, self_index=np.arange(n),
+                                   tile_rows=tile_rows, tile_cols=tile_cols):
+        if idx.shape[1] == 0:
+            continue
+        r1 = r0 + idx.shape[0]
+        own = codes[r0:r1, None]
+        neighbor_codes = codes[idx]
+        predicted[r0:r1] = vote_majority(neighbor_codes, sims, len(classes))
+        score[r0:r1] = sims[:, 0]
+        top_neighbor[r0:r1] = idx[:, 0]
+
+        differs = neighbor_codes != own
+        agreement[r0:r1] = 1 - differs.mean(axis=1)
+        first = differs.argmax(axis=1)
+        rows = np.nonzero(differs.any(axis=1))[0]
+        conflict[r0 + rows] = idx[rows, first[rows]]
+        conflict_score[r0 + rows] = sims[rows, first[rows]]
+
+    return LooResult(list(filenames), classes, codes, predicted, score, top_neighbor,
+                     agreement, conflict, conflict_score)
+
+
+def confusion_matrix(result: LooResult) -> np.ndarray:
+    """Counts of (given label, predicted label); rows without neighbours are left out."""
+    n_labels = len(result.classes)
+    valid = result.predicted >= 0
+    flat = result.codes[valid].astype(np.int64) * n_labels + result.predicted[valid]
+    return np.bincount(flat, minlength=n_labels * n_labels).reshape(n_labels, n_labels)
+
+
+def suspicious(result: LooResult, top: int) -> np.ndarray:
+    """Rows with at least one conflicting neighbour, most suspicious first.
+
+    Wrong leave-one-out predictions come first, then lower agreement, then
+    a closer conflicting neighbour.
+    """
+    rows = np.nonzero(result.conflict >= 0)[0]
+    correct = result.predicted[rows] == result.codes[rows]
+    order = np.lexsort((-result.conflict_score[rows], result.agreement[rows], correct))
+    return rows[order[:top]]
+
+
+def build_report(result: LooResult, k: int, top: int = 50) -> dict:
+    matrix = confusion_matrix(result)
+    support = matrix.sum(axis=1)
+    hits = np.diag(matrix)
+    total = int(support.sum())
+    names, classes = result.filenames, result.classes
+
+    per_label = {
+        str(label): {
+            "support": int(support[i]),
+            "correct": int(hits[i]),
+            "accuracy": float(hits[i] / support[i]) if support[i] else None,
+        }
+        for i, label in enumerate(classes)
+    }
+    flagged = []
+    for i in suspicious(result, top):
+        c = result.conflict[i]
+        flagged.append({
+            "filename": names[i],
+            "label": str(classes[result.codes[i]]),
+            "predicted": str(classes[result.predicted[i]]),
+            "score": float(result.score[i]),
+            "agreement": float(result.agreement[i]),
+            "conflicting_neighbor": {
+                "filename": names[c],
+                "label": str(classes[result.codes[c]]),
+                "score": float(result.conflict_score[i]),
+            },
+        })
+
+    return {
+        "k": k,
+        "documents": len(names),
+        "evaluated": total,
+        "accuracy": float(hits.sum() / total) if total else None,
+        "labels": [str(label) for label in classes],
+        "per_label": per_label,
+        "confusion_matrix": matrix.tolist(),
+        "suspicious": flagged,
+    }
+
+
+def write_loo_csv(path: str, result: LooResult) -> None:
+    names, classes = result.filenames, result.classes
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Filename", "Label", "PredictedLabel", "SimilarityScore", "TopNeighbor",
+                         "Agreement", "ConflictingNeighbor", "ConflictingScore"])
+        for i, name in enumerate(names):
+            has_pred = result.predicted[i] >= 0
+            c = result.conflict[i]
+            writer.writerow([
+                name,
+                classes[result.codes[i]],
+                classes[result.predicted[i]] if has_pred else "unknown",
+                f"{result.score[i]:.4f}",
+                names[result.top_neighbor[i]] if has_pred else "none",
+                f"{result.agreement[i]:.4f}",
+                names[c] if c >= 0 else "",
+                f"{result.conflict_score[i]:.4f}" if c >= 0 else "",
+            ])
+
+
+def audit_store(store: EmbeddingStore, k: int = 3, **tiles) -> LooResult:
+    """Leave-one-out over the labeled rows of ``store``."""
+    rows = [i for i, label in enumerate(store.labels) if label is not None]
+    vectors = store.vectors[rows] if len(rows) != len(store) else store.vectors
+    return leave_one_out(
+        vectors,
+        [store.labels[i] for i in rows],
+        [store.filenames[i] for i in rows],
+        k=k,
+        **tiles,
+    )
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Leave-one-out KNN audit of the labels in an embedding store.")
+    parser.add_argument("embeddings", help="Embedding store, embeddings/ folder or batch JSON file")
+    parser.add_argument("-k", type=int, default=3, help="Number of neighbors (default: 3, as in Program.cs)")
+    parser.add_argument("-o", "--out", default="audit.json", help="Output JSON report")
+    parser.add_argument("--predictions", help="Also write per-document leave-one-out predictions to this CSV")
+    parser.add_argument("--top", type=int, default=50, help="Suspicious documents to list in the report")
+    parser.add_argument("--tile-rows", type=int, default=TILE_ROWS)
+    parser.add_argument("--tile-cols", type=int, default=TILE_COLS)
+    args = parser.parse_args(argv)
+
+    store = load_embeddings(args.embeddings)
+    start = time.perf_counter()
+    result = audit_store(store, k=args.k, tile_rows=args.tile_rows, tile_cols=args.tile_cols)
+    elapsed = time.perf_counter() - start
+
+    report = build_report(result, args.k, args.top)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    if args.predictions:
+        write_loo_csv(args.predictions, result)
+
+    if report["accuracy"] is None:
+        print(f"⚠️ No labeled documents with neighbours in {args.embeddings}")
+        return
+    print(f"✅ Audited {report['evaluated']} labeled documents in {elapsed:.2f}s, "
+          f"leave-one-out accuracy {report['accuracy']:.2%}")
+    for label, stats in report["per_label"].items():
+        if stats["accuracy"] is not None:
+            print(f" - {label}: {stats['accuracy']:.2%} of {stats['support']}")
+    print(f"🔍 {len(report['suspicious'])} suspicious documents listed in {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,14 @@
+"""Reproducible performance benchmarks for the Python tools.
+
+* ``corpus``       - seeded synthetic labeled embedding corpora in every
+  layout the tools read (store, ``embeddings/`` folder, ``predictions.csv``)
+  plus synthetic invoice PDFs.
+* ``embed_server`` - an offline, deterministic stand-in for the OpenAI
+  ``/v1/embeddings`` endpoint.
+* ``runner``       - times each stage the plotting scripts and the UI
+  exercise and writes the timings to JSON, so runs on different commits
+  can be compared.
+
+    python -m invoice_tools.bench run -n 20000 --dim 1536 -o bench.json
+    python -m invoice_tools.bench compare baseline.json bench.json
+"""
@@ -0,0 +1,76 @@
+import argparse
+import json
+import sys
+
+from .corpus import make_corpus, write_corpus
+from .embed_server import serve
+from .runner import STAGES, compare, run
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m invoice_tools.bench",
+                                     description="Benchmarks for the invoice_tools package.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    def corpus_args(p: argparse.ArgumentParser) -> None:
+        p.add_argument("-n", type=int, default=5000, help="Number of documents")
+        p.add_argument("--dim", type=int, default=1536, help="Embedding dimension (1536 or 3072 like OpenAI)")
+        p.add_argument("--labels", type=int, default=8, help="Number of labels")
+        p.add_argument("--spread", type=float, default=1.0, help="Distance of documents from their label centre")
+        p.add_argument("--seed", type=int, default=0)
+
+    p_run = sub.add_parser("run", help="Time every stage on a synthetic corpus")
+    corpus_args(p_run)
+    p_run.add_argument("-o", "--out", default="bench.json", help="Output JSON")
+    p_run.add_argument("--repeat", type=int, default=3)
+    p_run.add_argument("--stages", nargs="+", choices=list(STAGES), help="Only run these stages")
+    p_run.add_argument("--work-dir", help="Keep the generated corpus here instead of a temporary folder")
+    p_run.add_argument("--scan-limit", type=int, default=2000, help="Documents joined by the per-file scan")
+    p_run.add_argument("--umap-limit", type=int, default=20000)
+    p_run.add_argument("--similarity-limit", type=int, default=50000)
+    p_run.add_argument("--embed-requests", type=int, default=50)
+
+    p_corpus = sub.add_parser("corpus", help="Write a synthetic corpus (store, embeddings/, predictions.csv, PDFs)")
+    corpus_args(p_corpus)
+    p_corpus.add_argument("-o", "--out", required=True, help="Output folder")
+    p_corpus.add_argument("--pdfs", type=int, default=0, help="Also write this many synthetic invoice PDFs")
+
+    p_serve = sub.add_parser("serve", help="Run the offline embeddings endpoint")
+    p_serve.add_argument("--host", default="127.0.0.1")
+    p_serve.add_argument("--port", type=int, default=8765)
+    p_serve.add_argument("--latency", type=float, default=0.0, help="Seconds added to every response")
+    p_serve.add_argument("--max-in-flight", type=int, default=0,
+                         help="Answer requests beyond this many concurrent ones with 429 (default: no limit)")
+
+    p_compare = sub.add_parser("compare", help="Compare two result files; exit code 1 on regressions")
+    p_compare.add_argument("baseline")
+    p_compare.add_argument("current")
+    p_compare.add_argument("--tolerance", type=float, default=0.2, help="Allowed slowdown (0.2 = 20%%)")
+
+    args = parser.parse_args(argv)
+    if args.command == "run":
+        result = run(args.n, args.dim, args.labels, args.spread, args.seed, args.repeat, args.stages,
+                     args.work_dir, args.scan_limit, args.umap_limit, args.similarity_limit, args.embed_requests)
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+        print(f"✅ Results saved to: {args.out}")
+    elif args.command == "corpus":
+        corpus = make_corpus(args.n, args.dim, args.labels, args.spread, args.seed)
+        paths = write_corpus(args.out, corpus, pdfs=args.pdfs, seed=args.seed)
+        print(f"✅ Wrote {args.n} documents to {', '.join(paths.values())}")
+    elif args.command == "serve":
+        serve(args.host, args.port, args.latency, args.max_in_flight)
+    else:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        with open(args.current, "r", encoding="utf-8") as f:
+            current = json.load(f)
+        regressions = compare(baseline, current, args.tolerance)
+        if regressions:
+            print(f"❌ Slower than baseline: {', '.join(regressions)}")
+            sys.exit(1)
+        print("✅ No regressions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""Seeded synthetic corpora.
+
+Each label gets a random unit centre; a document is its label's centre plus
+Gaussian noise of standard deviation ``spread / sqrt(dim)`` (so ``spread``
+is roughly the distance from the centre independent of ``dim``), normalized
+like OpenAI embeddings are. The same ``seed`` always yields the same corpus.
+"""
+
+import json
+import os
+import zlib
+from typing import NamedTuple
+
+import numpy as np
+
+from ..predictions import write_predictions_csv
+from ..store import write_store
+
+WORDS = [
+    "invoice", "total", "amount", "due", "date", "payment", "tax", "net", "gross", "customer",
+    "service", "hours", "rate", "consulting", "repair", "materials", "labour", "patient",
+    "treatment", "clinic", "insurance", "freelance", "contract", "milestone", "platform",
+    "fee", "electricity", "water", "meter", "reading", "period", "discount", "balance",
+]
+
+
+class Corpus(NamedTuple):
+    filenames: list[str]
+    labels: list[str]
+    vectors: np.ndarray
+
+
+def make_corpus(n: int, dim: int = 1536, n_labels: int = 8, spread: float = 1.0, seed: int = 0) -> Corpus:
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((n_labels, dim)).astype(np.float32)
+    centers /= np.linalg.norm(centers, axis=1, keepdims=True)
+    codes = rng.integers(0, n_labels, size=n)
+    vectors = centers[codes] + rng.standard_normal((n, dim), dtype=np.float32) * (spread / np.sqrt(dim))
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    labels = [f"label_{c:02d}" for c in range(n_labels)]
+    return Corpus(
+        [f"invoice_{i:07d}.pdf" for i in range(n)],
+        [labels[c] for c in codes],
+        vectors,
+    )
+
+
+def write_embeddings_folder(folder: str, corpus: Corpus) -> None:
+    """One ``EmbeddingFileFormat`` JSON file per document, like the .NET cache of invoices to classify.
+
+    ``OpenAIEmbeddingService`` names the file after the invoice and leaves ``Label`` null.
+    """
+    os.makedirs(folder, exist_ok=True)
+    for name, vector in zip(corpus.filenames, corpus.vectors):
+        with open(os.path.join(folder, name + ".json"), "w", encoding="utf-8") as f:
+            json.dump({"Filename": name, "Label": None, "Vector": vector.tolist()}, f)
+
+
+def write_corpus_predictions(path: str, corpus: Corpus) -> int:
+    """``predictions.csv`` with every document predicted as its true label."""
+    return write_predictions_csv(path, (
+        (name, label, 1.0, "none") for name, label in zip(corpus.filenames, corpus.labels)
+    ))
+
+
+def invoice_text(label: str, number: int, seed: int = 0) -> str:
+    rng = np.random.default_rng(zlib.crc32(f"{seed}:{label}:{number}".encode()))
+    lines = [f"INVOICE {number:07d}", f"Category: {label}"]
+    for _ in range(int(rng.integers(8, 20))):
+        words = rng.choice(WORDS, size=int(rng.integers(3, 8)))
+        lines.append(f"{' '.join(words)} {rng.uniform(1, 5000):.2f} EUR")
+    lines.append(f"TOTAL {rng.uniform(100, 50000):.2f} EUR")
+    return "\n".join(lines)
+
+
+def _pdf_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(path: str, text: str) -> None:
+    """Write a one-page PDF with ``text`` in Helvetica, no dependencies needed."""
+    ops = ["BT", "/F1 10 Tf", "12 TL", "50 800 Td"]
+    for line in text.splitlines():
+        ops.append(f"({_pdf_escape(line)}) Tj T*")
+    ops.append("ET")
+    stream = "\n".join(ops).encode("latin-1", "replace")
+
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+        b"/Resources << /Font << /F1 4 0 R >> >> /Contents 5 0 R >>",
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+        b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream",
+    ]
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+def write_pdfs(folder: str, corpus: Corpus, count: int | None = None, seed: int = 0) -> int:
+    """Synthetic invoice PDFs for the first ``count`` documents, in ``<folder>/<label>/``."""
+    count = len(corpus.filenames) if count is None else min(count, len(corpus.filenames))
+    for i in range(count):
+        label_dir = os.path.join(folder, corpus.labels[i])
+        os.makedirs(label_dir, exist_ok=True)
+        write_pdf(os.path.join(label_dir, corpus.filenames[i]), invoice_text(corpus.labels[i], i, seed))
+    return count
+
+
+def write_corpus(out_dir: str, corpus: Corpus, pdfs: int = 0, seed: int = 0) -> dict[str, str]:
+    """Write every layout of ``corpus`` under ``out_dir``; returns the paths."""
+    paths = {
+        "store": os.path.join(out_dir, "embeddings.store"),
+        "embeddings": os.path.join(out_dir, "embeddings"),
+        "predictions": os.path.join(out_dir, "predictions.csv"),
+    }
+    os.makedirs(out_dir, exist_ok=True)
+    write_store(paths["store"], corpus.filenames, list(corpus.labels), corpus.vectors)
+    write_embeddings_folder(paths["embeddings"], corpus)
+    write_corpus_predictions(paths["predictions"], corpus)
+    if pdfs:
+        paths["pdfs"] = os.path.join(out_dir, "TrainData")
+        write_pdfs(paths["pdfs"], corpus, pdfs, seed)
+    return paths
@@ -0,0 +1,166 @@
+"""Offline stand-in for the OpenAI embeddings endpoint.
+
+Answers ``POST /v1/embeddings`` with the same JSON shape as the real API
+(``float`` or ``base64`` encoding, optional ``dimensions``) so clients can
+be benchmarked without network access or an API key. Vectors are
+deterministic feature hashes of the input's words: the same text always
+gets the same vector and texts sharing words are cosine-similar, which is
+all the classifier needs for a realistic workload. With ``max_in_flight``
+it answers requests beyond that many concurrent ones with ``429`` and a
+``retry-after-ms`` header, like the real endpoint does when rate limited.
+
+    python -m invoice_tools.bench serve --port 8765
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1 python my_client.py
+"""
+
+import base64
+import hashlib
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+MODEL_DIMS = {
+    "text-embedding-3-small": 1536,
+    "text-embedding-3-large": 3072,
+    "text-embedding-ada-002": 1536,
+}
+DEFAULT_MODEL = "text-embedding-3-large"
+MAX_INPUTS = 2048
+RETRY_AFTER_MS = 50
+# Vector coordinates each word is hashed onto.
+HASHES_PER_WORD = 8
+TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+def embed_text(text: str, dim: int) -> np.ndarray:
+    """Deterministic unit vector for ``text``."""
+    vector = np.zeros(dim, dtype=np.float32)
+    for word in TOKEN.findall(text.lower()):
+        digest = hashlib.blake2b(word.encode("utf-8"), digest_size=4 * HASHES_PER_WORD).digest()
+        for value in np.frombuffer(digest, dtype="<u4"):
+            vector[value % dim] += 1.0 if value & 0x80000000 else -1.0
+    norm = np.linalg.norm(vector)
+    if norm == 0:
+        vector[0] = 1.0
+        return vector
+    return vector / norm
+
+
+def embeddings_response(request: dict) -> dict:
+    """Build the API response for a parsed request body; raises ``ValueError`` on bad input."""
+    model = request.get("model") or DEFAULT_MODEL
+    if model not in MODEL_DIMS:
+        raise ValueError(f"Unknown model {model!r}")
+    dim = int(request.get("dimensions") or MODEL_DIMS[model])
+    if not 0 < dim <= MODEL_DIMS[model]:
+        raise ValueError(f"dimensions must be between 1 and {MODEL_DIMS[model]}")
+    inputs = request.get("input")
+    if isinstance(inputs, str):
+        inputs = [inputs]
+    if not isinstance(inputs, list) or not inputs or not all(isinstance(t, str) for t in inputs):
+        raise ValueError("input must be a string or a non-empty list of strings")
+    if len(inputs) > MAX_INPUTS:
+        raise ValueError(f"input must have at most {MAX_INPUTS} items")
+
+    as_base64 = request.get("encoding_format") == "base64"
+    data, tokens = [], 0
+    for i, text in enumerate(inputs):
+        vector = embed_text(text, dim)
+        tokens += len(TOKEN.findall(text))
+        data.append({
+            "object": "embedding",
+            "index": i,
+            "embedding": base64.b64encode(vector.astype("<f4").tobytes()).decode("ascii")
+            if as_base64 else vector.tolist(),
+        })
+    return {
+        "object": "list",
+        "data": data,
+        "model": model,
+        "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+    }
+
+
+class EmbeddingHandler(BaseHTTPRequestHandler):
+    latency = 0.0
+    max_in_flight = 0  # 0: unlimited
+    # Shared by every request of one server; set up by _handler().
+    in_flight = [0]
+    lock = threading.Lock()
+    throttled = [0]
+
+    def _reply(self, status: int, body: dict, headers: dict | None = None) -> None:
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_POST(self) -> None:
+        if self.path.rstrip("/") not in ("/v1/embeddings", "/embeddings"):
+            self._reply(404, {"error": {"message": f"Unknown path {self.path}", "type": "invalid_request_error"}})
+            return
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length)
+        with self.lock:
+            if self.max_in_flight and self.in_flight[0] >= self.max_in_flight:
+                self.throttled[0] += 1
+                limited = True
+            else:
+                self.in_flight[0] += 1
+                limited = False
+        if limited:
+            self._reply(429, {"error": {"message": "Rate limit reached", "type": "requests"}},
+                        {"retry-after-ms": str(RETRY_AFTER_MS)})
+            return
+        try:
+            try:
+                response = embeddings_response(json.loads(body or b"{}"))
+            except ValueError as e:
+                self._reply(400, {"error": {"message": str(e), "type": "invalid_request_error"}})
+                return
+            if self.latency:
+                time.sleep(self.latency)
+            self._reply(200, response)
+        finally:
+            with self.lock:
+                self.in_flight[0] -= 1
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+
+def _handler(latency: float, max_in_flight: int) -> type[EmbeddingHandler]:
+    return type("Handler", (EmbeddingHandler,), {
+        "latency": latency, "max_in_flight": max_in_flight,
+        "in_flight": [0], "lock": threading.Lock(), "throttled": [0],
+    })
+
+
+def start_server(host: str = "127.0.0.1", port: int = 0, latency: float = 0.0,
+                 max_in_flight: int = 0) -> ThreadingHTTPServer:
+    """Serve in a daemon thread; ``port=0`` picks a free port (see ``server.server_port``).
+
+    ``server.RequestHandlerClass.throttled[0]`` counts the requests answered with 429.
+    """
+    server = ThreadingHTTPServer((host, port), _handler(latency, max_in_flight))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def serve(host: str = "127.0.0.1", port: int = 8765, latency: float = 0.0, max_in_flight: int = 0) -> None:
+    server = ThreadingHTTPServer((host, port), _handler(latency, max_in_flight))
+    print(f"🚀 Fake embeddings endpoint on http://{host}:{server.server_port}/v1/embeddings")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -0,0 +1,300 @@
+"""Timed benchmark stages and the JSON result format.
+
+Every stage mirrors what one of the scripts does with the corpus. A stage
+whose optional dependency is missing (UMAP, Plotly) or whose input is over
+its size limit is recorded as skipped rather than failing the run. Each
+stage runs ``repeat`` times; the best time is the one compared.
+"""
+
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from collections.abc import Callable
+
+import numpy as np
+
+from .corpus import Corpus, invoice_text, make_corpus, write_corpus
+from .embed_server import start_server
+
+RESULT_VERSION = 1
+
+
+class Skip(Exception):
+    """Raised by a stage that cannot run in this environment."""
+
+
+def _git_commit() -> str | None:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return out.stdout.strip() or None
+
+
+def _stage_load_folder(ctx: dict) -> int:
+    from ..store import load_embeddings
+
+    return len(load_embeddings(ctx["paths"]["embeddings"]))
+
+
+def _stage_open_store(ctx: dict) -> int:
+    from ..store import EmbeddingStore
+
+    store = EmbeddingStore.open(ctx["paths"]["store"])
+    float(np.asarray(store.vectors).sum())
+    return len(store)
+
+
+def _stage_join_scan(ctx: dict) -> int:
+    """The per-file ``predictions_df[...]`` lookup the plotting scripts do."""
+    import pandas as pd
+
+    limit = ctx["scan_limit"]
+    names = ctx["corpus"].filenames[:limit]
+    predictions = pd.read_csv(ctx["paths"]["predictions"])
+    predictions["key"] = predictions["Filename"].str.replace(".pdf", "", case=False).str.strip()
+    found = 0
+    for name in names:
+        match = predictions[predictions["key"].str.lower() == name[: -len(".pdf")].lower()]
+        found += not match.empty
+    return found
+
+
+def _stage_join_index(ctx: dict) -> int:
+    import pandas as pd
+
+    from ..join import join_predictions
+
+    predictions = pd.read_csv(ctx["paths"]["predictions"])
+    return int(join_predictions(ctx["corpus"].filenames, predictions).frame["matched"].sum())
+
+
+def _stage_pca(ctx: dict) -> int:
+    from ..projection import _fit_pca
+
+    vectors = ctx["corpus"].vectors
+    ctx["points"] = _fit_pca(vectors, 2, 42).transform(vectors)
+    return len(vectors)
+
+
+def _stage_umap(ctx: dict) -> int:
+    try:
+        import umap  # noqa: F401
+    except ImportError:
+        raise Skip("umap-learn is not installed")
+    from ..projection import _fit_umap
+
+    vectors = ctx["corpus"].vectors[:ctx["umap_limit"]]
+    _fit_umap(vectors, 2, 42).embedding_
+    return len(vectors)
+
+
+def _stage_knn(ctx: dict) -> int:
+    from ..knn import KnnClassifier
+
+    corpus = ctx["corpus"]
+    split = int(len(corpus.filenames) * 0.8)
+    classifier = KnnClassifier(k=3).fit(corpus.vectors[:split], corpus.labels[:split], corpus.filenames[:split])
+    return len(classifier.predict_batch(corpus.vectors[split:]))
+
+
+def _stage_knn_int8(ctx: dict) -> int:
+    from ..knn import KnnClassifier
+    from ..quantize import QuantizedIndex
+
+    corpus = ctx["corpus"]
+    split = int(len(corpus.filenames) * 0.8)
+    index = QuantizedIndex.build(corpus.vectors, "int8", rows=np.arange(split))
+    classifier = KnnClassifier(k=3, index=index).fit(None, corpus.labels[:split], corpus.filenames[:split])
+    return len(classifier.predict_batch(corpus.vectors[split:]))
+
+
+def _stage_knn_prototypes(ctx: dict) -> int:
+    from ..prototypes import PrototypeClassifier
+
+    corpus = ctx["corpus"]
+    split = int(len(corpus.filenames) * 0.8)
+    classifier = PrototypeClassifier.fit(corpus.vectors[:split], corpus.labels[:split], corpus.filenames[:split])
+    return len(classifier.predict_batch(corpus.vectors[split:]))
+
+
+def _stage_cli_startup(ctx: dict) -> int:
+    # One fresh interpreter parsing a subcommand of python -m invoice_tools
+    from ..cli import STARTUP_COMMANDS, startup_times
+
+    startup_times(STARTUP_COMMANDS[:1], repeat=1)
+    return 1
+
+
+def _stage_similarity(ctx: dict) -> int:
+    from ..similarity import write_topk
+
+    corpus = ctx["corpus"]
+    n = min(len(corpus.filenames), ctx["similarity_limit"])
+    with tempfile.TemporaryDirectory() as tmp:
+        write_topk(corpus.vectors[:n], corpus.filenames[:n], os.path.join(tmp, "pairs"), 10)
+    return n
+
+
+def _stage_html(ctx: dict) -> int:
+    try:
+        import plotly.graph_objects as go
+    except ImportError:
+        raise Skip("plotly is not installed")
+    points = ctx.get("points")
+    if points is None:
+        raise Skip("needs the pca stage")
+    corpus = ctx["corpus"]
+    labels = np.asarray(corpus.labels)
+    fig = go.Figure()
+    for label in np.unique(labels):
+        mask = labels == label
+        fig.add_trace(go.Scatter(x=points[mask, 0], y=points[mask, 1], mode="markers", name=str(label),
+                                 customdata=np.asarray(corpus.filenames)[mask]))
+    with tempfile.TemporaryDirectory() as tmp:
+        fig.write_html(os.path.join(tmp, "plot.html"), include_plotlyjs="cdn")
+    return len(points)
+
+
+def _stage_html_webgl(ctx: dict) -> int:
+    from ..webplot import write_scatter_html
+
+    points = ctx.get("points")
+    if points is None:
+        raise Skip("needs the pca stage")
+    corpus = ctx["corpus"]
+    with tempfile.TemporaryDirectory() as tmp:
+        write_scatter_html(os.path.join(tmp, "plot.html"), points, corpus.labels,
+                           {"filename": corpus.filenames, "label": corpus.labels})
+    return len(points)
+
+
+def _stage_embed_requests(ctx: dict) -> int:
+    """Round trips to the local embedding server, one document per request like the .NET client."""
+    server = ctx["server"]
+    url = f"http://127.0.0.1:{server.server_port}/v1/embeddings"
+    count = ctx["embed_requests"]
+    corpus = ctx["corpus"]
+    for i in range(count):
+        body = json.dumps({"model": "text-embedding-3-large", "input": invoice_text(corpus.labels[i], i)})
+        request = urllib.request.Request(url, body.encode("utf-8"), {"Content-Type": "application/json"})
+        with urllib.request.urlopen(request) as response:
+            json.load(response)
+    return count
+
+
+def _stage_embed_batched(ctx: dict) -> int:
+    """The same documents through the batched, concurrent client."""
+    from ..embed import EmbeddingClient
+
+    server = ctx["server"]
+    corpus = ctx["corpus"]
+    count = ctx["embed_requests"]
+    client = EmbeddingClient(base_url=f"http://127.0.0.1:{server.server_port}/v1", api_key="bench")
+    client.embed([invoice_text(corpus.labels[i], i) for i in range(count)])
+    return count
+
+
+STAGES: dict[str, Callable[[dict], int]] = {
+    "load_embeddings_folder": _stage_load_folder,
+    "open_store": _stage_open_store,
+    "join_predictions_scan": _stage_join_scan,
+    "join_predictions_index": _stage_join_index,
+    "pca": _stage_pca,
+    "umap": _stage_umap,
+    "knn": _stage_knn,
+    "knn_int8": _stage_knn_int8,
+    "knn_prototypes": _stage_knn_prototypes,
+    "similarity_topk": _stage_similarity,
+    "html": _stage_html,
+    "html_webgl": _stage_html_webgl,
+    "cli_startup": _stage_cli_startup,
+    "embed_requests": _stage_embed_requests,
+    "embed_batched": _stage_embed_batched,
+}
+
+
+def run(n: int = 5000, dim: int = 1536, n_labels: int = 8, spread: float = 1.0, seed: int = 0,
+        repeat: int = 3, stages: list[str] | None = None, work_dir: str | None = None, scan_limit: int = 2000,
+        umap_limit: int = 20000, similarity_limit: int = 50000, embed_requests: int = 50) -> dict:
+    """Generate the corpus, time the selected stages and return the result document."""
+    unknown = set(stages or []) - set(STAGES)
+    if unknown:
+        raise ValueError(f"Unknown stages {sorted(unknown)}; expected some of {list(STAGES)}")
+    selected = [s for s in STAGES if stages is None or s in stages]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        out_dir = work_dir or tmp
+        corpus: Corpus = make_corpus(n, dim, n_labels, spread, seed)
+        started = time.perf_counter()
+        paths = write_corpus(out_dir, corpus, seed=seed)
+        print(f"📦 Wrote {n} x {dim} synthetic corpus in {time.perf_counter() - started:.2f}s")
+
+        server = start_server()
+        ctx = {
+            "corpus": corpus, "paths": paths, "server": server, "scan_limit": scan_limit,
+            "umap_limit": umap_limit, "similarity_limit": similarity_limit, "embed_requests": embed_requests,
+        }
+        results = {}
+        try:
+            for name in selected:
+                runs, rows = [], 0
+                try:
+                    for _ in range(repeat):
+                        t0 = time.perf_counter()
+                        rows = STAGES[name](ctx)
+                        runs.append(time.perf_counter() - t0)
+                except Skip as e:
+                    results[name] = {"skipped": str(e)}
+                    print(f"⏭️  {name}: skipped ({e})")
+                    continue
+                results[name] = {"seconds": min(runs), "runs": runs, "rows": rows}
+                print(f"⏱️  {name}: {min(runs):.4f}s ({rows} rows)")
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    return {
+        "version": RESULT_VERSION,
+        "commit": _git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "environment": {
+            "python": sys.version.split()[0],
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "config": {
+            "n": n, "dim": dim, "labels": n_labels, "spread": spread, "seed": seed, "repeat": repeat,
+            "scan_limit": scan_limit, "umap_limit": umap_limit, "similarity_limit": similarity_limit,
+            "embed_requests": embed_requests,
+        },
+        "stages": results,
+    }
+
+
+def compare(baseline: dict, current: dict, tolerance: float = 0.2) -> list[str]:
+    """Print stage timings side by side; returns the stages slower by more than ``tolerance``."""
+    if baseline.get("config") != current.get("config"):
+        print("⚠️ The runs used different configurations; timings are not directly comparable")
+    regressions = []
+    for name, stage in current["stages"].items():
+        before = baseline["stages"].get(name, {})
+        if "seconds" not in stage or "seconds" not in before:
+            print(f"{name:<24} {'-':>10} {'-':>10}")
+            continue
+        ratio = stage["seconds"] / before["seconds"] if before["seconds"] else float("inf")
+        flag = ""
+        if ratio > 1 + tolerance:
+            regressions.append(name)
+            flag = "  ❌ slower"
+        elif ratio < 1 - tolerance:
+            flag = "  ✅ faster"
+        print(f"{name:<24} {before['seconds']:>9.4f}s {stage['seconds']:>9.4f}s  x{ratio:.2f}{flag}")
+    return regressions
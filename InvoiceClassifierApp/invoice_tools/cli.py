@@ -0,0 +1,208 @@
+"""One entry point for the Python side of the invoice classifier.
+
+The plotting scripts, the Flask UI and the uploader each imported pandas,
+scikit-learn, plotly and (for UMAP) umap/numba at the top and hard-coded
+their own paths, so every run paid seconds of imports before doing any
+work. ``python -m invoice_tools`` parses its arguments with nothing but the
+standard library loaded; each subcommand imports what it needs once it
+runs, and every path comes from ``config.load_config``::
+
+    python -m invoice_tools plot pca|umap|3d|kmeans [-o plot.html] [--open]
+    python -m invoice_tools serve [--port 5000]
+    python -m invoice_tools upload
+    python -m invoice_tools similarity embeddings.store -o similarity.pairs --top-k 10
+    python -m invoice_tools startup --budget 0.5
+
+The other module CLIs (``knn``, ``audit``, ``sweep``, ...) are reachable
+the same way and take their usual arguments. ``startup`` times a fresh
+interpreter running ``<subcommand> --help`` through ``main`` - for the
+module CLIs that imports the module - and fails if it takes longer than
+the budget or loads any of ``HEAVY_MODULES`` the subcommand does not need
+(``EXPECTED_MODULES``).
+"""
+
+import argparse
+import importlib
+import os
+import subprocess
+import sys
+import time
+
+from .config import CONFIG_ENV, load_config
+
+PACKAGE_PARENT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+UPLOADER_SCRIPT = os.path.join(PACKAGE_PARENT, "PythonProject2", "ClassificationUI.py")
+STARTUP_BUDGET = 0.5  # seconds, interpreter start included
+HEAVY_MODULES = ("numpy", "pandas", "sklearn", "plotly", "umap", "numba", "flask", "streamlit", "pyarrow")
+STARTUP_COMMANDS = [["plot", "umap", "--help"], ["serve", "--help"], ["upload", "--help"], ["similarity", "--help"]]
+# Heavy modules a subcommand legitimately imports before it can do anything
+EXPECTED_MODULES = {"similarity": ("numpy",)}
+
+# Subcommands handed straight to a module's own main(argv).
+TOOLS = {
+    "similarity": ("similarity", "Tiled top-k / threshold similarity pairs of a store"),
+    "extract": ("extract", "Extract text from invoices and training documents"),
+    "embed": ("embed", "Embed an extracted corpus into a store"),
+    "store": ("store", "Convert embedding JSON to a store or inspect one"),
+    "knn": ("knn", "Classify a store of invoices against a training store"),
+    "audit": ("audit", "Leave-one-out label audit of a store"),
+    "sweep": ("sweep", "Cross-validated sweep over k and the voting rule"),
+    "ann": ("ann", "IVF index over a training store"),
+    "quantize": ("quantize", "int8 quantized copy of a training store"),
+    "prototypes": ("prototypes", "Per-label prototypes of a training store"),
+    "dedup": ("dedup", "Near-duplicate documents of a corpus"),
+    "keywords": ("keywords", "Evaluate the motherwords keyword pre-classifier"),
+    "watch": ("watch", "Classify invoices as they arrive in a folder"),
+    "resultsdb": ("resultsdb", "Query the indexed predictions table"),
+    "bench": ("bench.__main__", "Benchmarks"),
+}
+
+
+def build_parser() -> argparse.ArgumentParser:
+    # --config is accepted before and after the subcommand
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--config", default=argparse.SUPPRESS,
+                        help=f"JSON file of paths (default: ${CONFIG_ENV} or invoice_tools.json)")
+    parser = argparse.ArgumentParser(prog="python -m invoice_tools", parents=[common],
+                                     description="Python tools of the invoice classifier.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_plot = sub.add_parser("plot", parents=[common], help="Plot the embeddings coloured by predicted label")
+    p_plot.add_argument("kind", choices=["pca", "umap", "3d", "kmeans"])
+    p_plot.add_argument("--embeddings", help="Embedding store or JSON folder (default: embeddings_cache)")
+    p_plot.add_argument("--predictions", help="predictions.csv (default: predictions_csv)")
+    p_plot.add_argument("-o", "--out", help="Output HTML (default: embedding_plot_<kind>.html)")
+    p_plot.add_argument("--clusters", type=int, help="kmeans: number of clusters (default: one per label)")
+    p_plot.add_argument("--pairs", help="kmeans: similarity pair file for each document's nearest neighbour")
+    p_plot.add_argument("--out-2d", help="3d: also write the first two components as a 2-D plot")
+    p_plot.add_argument("--matched-csv", help="3d: write the matched predictions with their coordinates as CSV")
+    p_plot.add_argument("--open", action="store_true", help="Open the plot in a browser")
+
+    p_serve = sub.add_parser("serve", parents=[common], help="Run the Flask UI (plotclass.py)")
+    p_serve.add_argument("--host", default="127.0.0.1")
+    p_serve.add_argument("--port", type=int, default=5000)
+    p_serve.add_argument("--debug", action="store_true")
+
+    sub.add_parser("upload", parents=[common], help="Run the Streamlit uploader (needs streamlit)")
+
+    p_startup = sub.add_parser("startup", help="Time CLI startup and check that no heavy module is loaded")
+    p_startup.add_argument("--budget", type=float, default=STARTUP_BUDGET,
+                           help=f"Seconds allowed per subcommand (default: {STARTUP_BUDGET})")
+    p_startup.add_argument("--repeat", type=int, default=3)
+
+    for name, (_, help_text) in TOOLS.items():
+        p_tool = sub.add_parser(name, help=help_text, add_help=False)
+        p_tool.add_argument("args", nargs=argparse.REMAINDER)
+    return parser
+
+
+def run_plot(args, config) -> None:
+    from .plots import PLOTS, load_plot_data
+
+    data = load_plot_data(args.embeddings or config.embeddings_cache, args.predictions or config.predictions_csv,
+                          config.invoices, matched_only=args.kind == "kmeans")
+    if data.frame.empty:
+        sys.exit("❌ No embeddings to plot")
+    out = args.out or f"embedding_plot_{args.kind}.html"
+    extra = {}
+    if args.kind == "kmeans":
+        extra = {"clusters": args.clusters, "pairs": args.pairs}
+    elif args.kind == "3d":
+        extra = {"out_2d": args.out_2d, "matched_csv": args.matched_csv}
+    PLOTS[args.kind](data, out, config.projection_cache, **extra)
+    print(f"✅ Saved {args.kind} plot of {len(data.frame)} documents to {out}")
+    if args.open:
+        import webbrowser
+
+        webbrowser.open("file://" + os.path.abspath(out))
+
+
+def run_serve(args) -> None:
+    # plotclass.py sits next to the package and reads its paths from the same configuration
+    sys.path.insert(0, PACKAGE_PARENT)
+    from plotclass import app
+
+    app.run(host=args.host, port=args.port, debug=args.debug)
+
+
+def run_upload() -> int:
+    # Streamlit runs scripts through its own CLI; the configuration travels in the environment
+    return subprocess.call([sys.executable, "-m", "streamlit", "run", UPLOADER_SCRIPT])
+
+
+def startup_times(commands: list[list[str]], repeat: int = 3) -> list[tuple[str, float, list[str]]]:
+    """Best-of-``repeat`` seconds for a fresh interpreter to run each command through ``main``.
+
+    Also returns the heavy modules each run loaded beyond its ``EXPECTED_MODULES``.
+    """
+    probe = ("import sys\n"
+             "from invoice_tools.cli import HEAVY_MODULES, main\n"
+             "try:\n"
+             "    main(sys.argv[1:])\n"
+             "except SystemExit:\n"
+             "    pass\n"
+             "print('\\nloaded:', *(m for m in HEAVY_MODULES if m in sys.modules))\n")
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [PACKAGE_PARENT, os.environ.get("PYTHONPATH")])))
+    results = []
+    for command in commands:
+        best, loaded = float("inf"), []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            out = subprocess.run([sys.executable, "-c", probe, *command], env=env, check=True,
+                                 capture_output=True, text=True).stdout
+            best = min(best, time.perf_counter() - started)
+            loaded = out.rsplit("loaded:", 1)[-1].split()
+        expected = EXPECTED_MODULES.get(command[0], ())
+        results.append((" ".join(command), best, [m for m in loaded if m not in expected]))
+    return results
+
+
+def run_startup(args) -> int:
+    bare = min(_timed_call([sys.executable, "-c", "pass"]) for _ in range(args.repeat))
+    failed = 0
+    print(f"⏱️ Bare interpreter: {bare * 1000:.0f} ms")
+    for command, seconds, loaded in startup_times(STARTUP_COMMANDS, args.repeat):
+        ok = seconds <= args.budget and not loaded
+        failed += not ok
+        note = f", loaded {', '.join(loaded)}" if loaded else ""
+        print(f"{'✅' if ok else '❌'} {command}: {seconds * 1000:.0f} ms{note}")
+    if failed:
+        print(f"❌ {failed} subcommands over the {args.budget:.2f}s budget or loading heavy modules")
+    return 1 if failed else 0
+
+
+def _timed_call(command: list[str]) -> float:
+    started = time.perf_counter()
+    subprocess.run(command, check=True)
+    return time.perf_counter() - started
+
+
+def run_tool(name: str, argv: list[str]) -> int:
+    module = importlib.import_module(f".{TOOLS[name][0]}", __package__)
+    sys.argv[0] = f"python -m invoice_tools {name}"  # usage lines show the command that was typed
+    return module.main(argv) or 0
+
+
+def main(argv: list[str] | None = None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    if argv and argv[0] in TOOLS:
+        # Handed over untouched, so the tool's own --help and option order work
+        return run_tool(argv[0], argv[1:])
+    args = build_parser().parse_args(argv)
+    if args.command in TOOLS:
+        return run_tool(args.command, args.args)
+    if args.command == "startup":
+        return run_startup(args)
+
+    path = getattr(args, "config", None)
+    if path:
+        # Subprocesses (the uploader, jobs) resolve the same file
+        os.environ[CONFIG_ENV] = os.path.abspath(path)
+    config = load_config(path)
+    if args.command == "plot":
+        run_plot(args, config)
+    elif args.command == "serve":
+        run_serve(args)
+    elif args.command == "upload":
+        return run_upload()
+    return 0
@@ -0,0 +1,99 @@
+"""Folder layout shared by the Flask UI, the uploader and the plots.
+
+Every script used to hard-code its own paths, some of them absolute
+Windows paths of one machine (``C:\\Users\\...\\InvoiceClassifierApp``).
+``load_config`` derives them all from one application folder instead -
+the .NET project folder holding ``Invoices/``, ``TrainData/`` and
+``output/``, by default the folder this package sits in. Individual paths
+can be overridden in a JSON file; relative paths in it are resolved
+against ``app_dir``::
+
+    {"app_dir": "D:/invoices", "embeddings_cache": "bin/Release/net9.0/embeddings"}
+
+The file is ``--config`` of ``python -m invoice_tools``, else
+``$INVOICE_TOOLS_CONFIG``, else ``invoice_tools.json`` in the application
+folder if it exists. ``$INVOICE_APP_DIR`` overrides ``app_dir``.
+"""
+
+import json
+import os
+from typing import NamedTuple
+
+CONFIG_ENV = "INVOICE_TOOLS_CONFIG"
+APP_DIR_ENV = "INVOICE_APP_DIR"
+CONFIG_FILE = "invoice_tools.json"
+DEFAULT_APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class Config(NamedTuple):
+    app_dir: str
+    invoices: str            # invoices to classify (Program.cs input)
+    train_data: str          # TrainData/<label>/ training documents
+    output: str              # Program.cs output folder
+    predictions_csv: str
+    predictions_db: str      # indexed copy of predictions.csv behind /api/predictions
+    embeddings_cache: str    # per-file embedding JSON written by the .NET app
+    train_embeddings: str    # written by InvoiceProcessor.TrainAsync
+    train_store: str         # converted store, used instead of train_embeddings when present
+    uploads: str
+    training_snapshots: str
+    jobs: str                # job records and locks shared by the Flask worker processes
+    match_source: str
+    match_target: str
+    projection_cache: str
+
+
+# Default of every path but app_dir: (folder it is relative to, relative path).
+# A folder is app_dir (None) or an earlier key, so overriding "output" moves
+# the predictions with it.
+DEFAULTS: dict[str, tuple[str | None, str]] = {
+    "invoices": (None, "Invoices"),
+    "train_data": (None, "TrainData"),
+    "output": (None, "output"),
+    "predictions_csv": ("output", "predictions.csv"),
+    "predictions_db": ("output", "predictions.db"),
+    "embeddings_cache": (None, os.path.join("bin", "Debug", "net9.0", "embeddings")),
+    "train_embeddings": (None, os.path.join(os.pardir, "InvoiceClassifierApp.embeddings.json")),
+    "train_store": (None, "embeddings.store"),
+    "uploads": (None, "uploads"),
+    "training_snapshots": (None, "training_snapshots"),
+    "jobs": (None, "jobs"),
+    "match_source": (None, "source"),
+    "match_target": (None, os.path.join("bin", "output")),
+    "projection_cache": (None, "projection_cache"),
+}
+
+
+def config_path(path: str | None = None) -> str | None:
+    """The configuration file in effect, or ``None`` to use the defaults only."""
+    if path:
+        return path
+    if os.environ.get(CONFIG_ENV):
+        return os.environ[CONFIG_ENV]
+    default = os.path.join(os.environ.get(APP_DIR_ENV) or DEFAULT_APP_DIR, CONFIG_FILE)
+    return default if os.path.isfile(default) else None
+
+
+def load_config(path: str | None = None) -> Config:
+    """Paths from ``path`` (see ``config_path``) on top of the defaults."""
+    path = config_path(path)
+    values = {}
+    if path:
+        with open(path, "r", encoding="utf-8") as f:
+            values = json.load(f)
+        unknown = set(values) - set(Config._fields)
+        if unknown:
+            raise ValueError(f"Unknown keys in {path}: {sorted(unknown)}; expected some of {list(Config._fields)}")
+
+    app_dir = os.environ.get(APP_DIR_ENV) or values.get("app_dir")
+    if app_dir and path and not os.path.isabs(app_dir):
+        app_dir = os.path.join(os.path.dirname(os.path.abspath(path)), app_dir)
+    resolved = {"app_dir": os.path.abspath(app_dir or DEFAULT_APP_DIR)}
+    for key, (base, relative) in DEFAULTS.items():
+        folder = resolved[base] if base else resolved["app_dir"]
+        value = values.get(key)
+        if value is None:
+            resolved[key] = os.path.normpath(os.path.join(folder, relative))
+        else:
+            resolved[key] = os.path.normpath(os.path.join(resolved["app_dir"], os.path.expanduser(value)))
+    return Config(**resolved)
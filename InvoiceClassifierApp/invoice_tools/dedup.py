@@ -0,0 +1,207 @@
+"""Near-duplicate documents via shingling, MinHash and LSH banding.
+
+The corpus holds many near-copies: the same paper sits in two TrainData
+labels, split PDFs repeat pages of the file they were cut from, re-uploads
+differ only in a scanned header. Each copy costs a full multi-chunk
+embedding, and a copy filed under two labels casts contradicting KNN votes.
+
+Every document is reduced to its set of word ``SHINGLE_WORDS``-grams
+(after the same normalization as ``keywords``) and to a MinHash signature
+of ``NUM_PERM`` values; the share of equal signature values estimates the
+Jaccard similarity of two shingle sets. ``MinHashIndex`` splits signatures
+into ``BANDS`` bands and buckets documents by band, so only documents
+sharing a bucket are ever compared - near-linear instead of all pairs.
+
+``embed --dedup 0.9`` embeds one document per near-duplicate group and
+reuses its vector for the rest; the CLI lists the duplicate pairs and flags
+those filed under different labels::
+
+    python -m invoice_tools.dedup corpus.jsonl.gz --threshold 0.8 -o duplicates.csv
+    python -m invoice_tools.embed corpus.jsonl.gz -o train.store --dedup 0.9
+"""
+
+import argparse
+import csv
+import os
+import time
+import zlib
+from typing import NamedTuple
+
+import numpy as np
+
+from .keywords import normalize_text
+
+SHINGLE_WORDS = 3
+NUM_PERM = 128
+BANDS = 32
+DEFAULT_THRESHOLD = 0.8
+# Shingle hashes are reduced modulo a Mersenne prime so a * h + b stays within uint64.
+_PRIME = np.uint64((1 << 31) - 1)
+# Shingles hashed against all permutations at a time.
+_HASH_BLOCK = 4096
+
+
+class Duplicate(NamedTuple):
+    a: int
+    b: int
+    jaccard: float       # estimated from the signatures
+    containment: float   # estimated share of the smaller document found in the larger one
+
+
+def shingles(text: str, size: int = SHINGLE_WORDS) -> set[str]:
+    words = normalize_text(text).split()
+    if len(words) <= size:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+class MinHashIndex:
+    def __init__(self, num_perm: int = NUM_PERM, bands: int = BANDS, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be a multiple of bands ({bands})")
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, int(_PRIME), num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, int(_PRIME), num_perm, dtype=np.uint64)
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.keys: list = []
+        self.sizes: list[int] = []
+        self._signatures: list[np.ndarray] = []
+        self._buckets: list[dict[bytes, list[int]]] = [{} for _ in range(bands)]
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def signature(self, text: str) -> tuple[np.ndarray | None, int]:
+        """MinHash signature and shingle count of ``text`` (``None`` without any words)."""
+        found = shingles(text)
+        if not found:
+            return None, 0
+        hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in found), dtype=np.uint64, count=len(found))
+        hashes %= _PRIME
+        signature = np.full(len(self._a), np.iinfo(np.uint64).max, dtype=np.uint64)
+        for start in range(0, len(hashes), _HASH_BLOCK):
+            block = (hashes[start:start + _HASH_BLOCK, None] * self._a + self._b) % _PRIME
+            np.minimum(signature, block.min(axis=0), out=signature)
+        return signature, len(found)
+
+    def _bands(self, signature: np.ndarray):
+        for band in range(self.bands):
+            yield band, signature[band * self.rows:(band + 1) * self.rows].tobytes()
+
+    def add(self, key, text: str) -> int | None:
+        """Index ``text`` under ``key``; its id, or ``None`` if it has no words."""
+        signature, size = self.signature(text)
+        if signature is None:
+            return None
+        return self.add_signature(key, signature, size)
+
+    def add_signature(self, key, signature: np.ndarray, size: int) -> int:
+        doc = len(self.keys)
+        self.keys.append(key)
+        self.sizes.append(size)
+        self._signatures.append(signature)
+        for band, bucket in self._bands(signature):
+            self._buckets[band].setdefault(bucket, []).append(doc)
+        return doc
+
+    def _estimate(self, signature: np.ndarray, size: int, other: int) -> tuple[float, float]:
+        jaccard = float(np.mean(self._signatures[other] == signature))
+        shared = jaccard * (size + self.sizes[other]) / (1 + jaccard)
+        return jaccard, min(1.0, shared / max(1, min(size, self.sizes[other])))
+
+    def query(self, signature: np.ndarray, size: int, threshold: float = DEFAULT_THRESHOLD) -> list[tuple[int, float]]:
+        """Indexed documents with estimated Jaccard of at least ``threshold``, most similar first."""
+        candidates = set()
+        for band, bucket in self._bands(signature):
+            candidates.update(self._buckets[band].get(bucket, ()))
+        found = [(doc, self._estimate(signature, size, doc)[0]) for doc in candidates]
+        return sorted(((doc, j) for doc, j in found if j >= threshold), key=lambda item: -item[1])
+
+    def duplicates(self, threshold: float = DEFAULT_THRESHOLD) -> list[Duplicate]:
+        """Every pair of indexed documents sharing a bucket and reaching ``threshold``."""
+        seen: set[tuple[int, int]] = set()
+        pairs = []
+        for buckets in self._buckets:
+            for docs in buckets.values():
+                for i, a in enumerate(docs):
+                    for b in docs[i + 1:]:
+                        if (a, b) in seen:
+                            continue
+                        seen.add((a, b))
+                        jaccard, containment = self._estimate(self._signatures[a], self.sizes[a], b)
+                        if jaccard >= threshold:
+                            pairs.append(Duplicate(a, b, jaccard, containment))
+        return sorted(pairs, key=lambda d: (-d.jaccard, d.a, d.b))
+
+
+def representatives(texts: list[str], threshold: float = DEFAULT_THRESHOLD) -> list[int]:
+    """For every text, the group head whose vector it may reuse (itself if none).
+
+    Only group heads are indexed, so every text reaches ``threshold`` against
+    its own head - never merely against another member, which would let
+    chains of near-duplicates drift arbitrarily far from the head.
+    """
+    index = MinHashIndex()
+    rep = list(range(len(texts)))
+    for i, text in enumerate(texts):
+        signature, size = index.signature(text)
+        if signature is None:
+            continue
+        matches = index.query(signature, size, threshold)
+        if matches:
+            rep[i] = index.keys[matches[0][0]]
+        else:
+            index.add_signature(i, signature, size)
+    return rep
+
+
+def main(argv: list[str] | None = None) -> None:
+    from .extract import iter_corpus
+
+    parser = argparse.ArgumentParser(description="Find near-duplicate documents in an extracted corpus.")
+    parser.add_argument("corpus", help="JSON-lines corpus from invoice_tools.extract")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help=f"Minimum estimated Jaccard similarity (default: {DEFAULT_THRESHOLD})")
+    parser.add_argument("--bands", type=int, default=BANDS)
+    parser.add_argument("-o", "--out", help="Write the duplicate pairs as CSV")
+    args = parser.parse_args(argv)
+
+    records = list(iter_corpus(args.corpus))
+    started = time.perf_counter()
+    index = MinHashIndex(bands=args.bands)
+    for i, record in enumerate(records):
+        index.add(i, record["text"])
+    pairs = index.duplicates(args.threshold)
+    elapsed = time.perf_counter() - started
+    print(f"🔍 Indexed {len(index)} of {len(records)} documents in {elapsed:.2f}s; "
+          f"{len(pairs)} pairs with Jaccard >= {args.threshold}")
+
+    cross = 0
+    for d in pairs:
+        a, b = records[index.keys[d.a]], records[index.keys[d.b]]
+        conflict = a["label"] and b["label"] and a["label"] != b["label"]
+        cross += bool(conflict)
+        print(f"{'⚠️' if conflict else '📄'} {d.jaccard:.2f}  {a['filename']} ({a['label'] or 'invoice'})"
+              f"  ~  {b['filename']} ({b['label'] or 'invoice'})")
+    duplicated = {index.keys[d.b] for d in pairs}
+    print(f"✅ {len(duplicated)} documents duplicate an earlier one and need no embedding of their own")
+    if cross:
+        print(f"⚠️ {cross} pairs are filed under different labels and vote against each other in KNN")
+
+    if args.out:
+        tmp = args.out + ".tmp"
+        with open(tmp, "w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["FileA", "LabelA", "FileB", "LabelB", "Jaccard", "Containment", "CrossLabel"])
+            for d in pairs:
+                a, b = records[index.keys[d.a]], records[index.keys[d.b]]
+                writer.writerow([a["filename"], a["label"] or "", b["filename"], b["label"] or "",
+                                 f"{d.jaccard:.4f}", f"{d.containment:.4f}",
+                                 int(bool(a["label"] and b["label"] and a["label"] != b["label"]))])
+        os.replace(tmp, args.out)
+        print(f"📄 Pairs saved to: {args.out}")
+
+
+if __name__ == "__main__":
+    main()
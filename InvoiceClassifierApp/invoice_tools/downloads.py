@@ -0,0 +1,188 @@
+"""Per-label ZIP archives streamed on the fly.
+
+``Program.cs`` copies every classified invoice into ``output/<label>/`` and
+then zips each folder, so every invoice is written to disk twice more just
+to be downloadable. ``stream_zip`` builds the archive while it is being
+sent instead: members are read from the original invoice files in chunks
+and the ZIP is produced through a non-seekable sink (sizes and CRCs go in
+data descriptors), so memory stays constant however large the label is.
+
+PDFs hardly compress, so members are stored by default; ``deflate``
+compresses them as they stream. ``zip_etag`` identifies an archive by its
+members' names, sizes and modification times, so a client repeating a
+download of an unchanged label gets ``304 Not Modified`` without anything
+being read.
+
+Members are the rows of ``predictions.csv`` with that label, falling back
+to ``output/<label>/`` for invoices no longer in ``Invoices/``. The CSV
+lists names with spaces replaced by ``_`` (``Program.cs`` normalizes them
+before classifying) while ``Invoices/`` keeps the originals, so invoices
+are looked up by their normalized name. Both the label table and that
+index are cached until the CSV or the folder changes.
+"""
+
+import csv
+import hashlib
+import os
+import threading
+import unicodedata
+import urllib.parse
+import zipfile
+from typing import NamedTuple
+
+from .predictions import COLUMNS, normalize_filename
+
+CHUNK_SIZE = 1024 * 1024
+COMPRESSION = {"stored": zipfile.ZIP_STORED, "deflate": zipfile.ZIP_DEFLATED}
+
+
+class Member(NamedTuple):
+    arcname: str
+    path: str
+    size: int
+    mtime_ns: int
+
+
+# path -> (size and mtime it was read at, parsed value), for predicted_labels and _invoice_index
+_cache: dict[tuple[str, str], tuple[tuple[int, int], object]] = {}
+_cache_lock = threading.Lock()
+
+
+def _cached(kind: str, path: str, load):
+    """``load(path)``, re-run only when the size or mtime of ``path`` changed; ``None`` if it is missing."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    signature = (stat.st_size, stat.st_mtime_ns)
+    key = (kind, os.path.abspath(path))
+    with _cache_lock:
+        hit = _cache.get(key)
+    if hit is not None and hit[0] == signature:
+        return hit[1]
+    value = load(path)
+    with _cache_lock:
+        _cache[key] = (signature, value)
+    return value
+
+
+def predicted_labels(predictions_csv: str) -> dict[str, list[str]]:
+    """Filenames per predicted label, in file order (the last row wins for a repeated name).
+
+    Parsed once per version of the file; callers must not modify the result.
+    """
+    return _cached("labels", predictions_csv, _read_labels) or {}
+
+
+def _read_labels(predictions_csv: str) -> dict[str, list[str]]:
+    latest: dict[str, str] = {}
+    try:
+        with open(predictions_csv, "r", encoding="utf-8-sig", newline="") as f:
+            reader = csv.reader(f, skipinitialspace=True)
+            header = [c.strip() for c in next(reader, [])]
+            if header[:2] != COLUMNS[:2]:
+                return {}
+            for row in reader:
+                if len(row) >= 2 and row[0].strip():
+                    latest[row[0].strip()] = row[1].strip()
+    except OSError:
+        return {}
+    labels: dict[str, list[str]] = {}
+    for filename, label in latest.items():
+        labels.setdefault(label, []).append(filename)
+    return labels
+
+
+def label_members(label: str, predictions_csv: str, invoices_dir: str, output_dir: str) -> list[Member] | None:
+    """Files of one label's archive, or ``None`` if the label is unknown."""
+    if label in ("", ".", "..") or os.path.basename(label) != label:
+        return None
+    filenames = predicted_labels(predictions_csv).get(label)
+    folder = os.path.join(output_dir, label)
+    if filenames is None:
+        if not os.path.isdir(folder):
+            return None
+        filenames = sorted(os.listdir(folder))
+    invoices = _cached("invoices", invoices_dir, _invoice_index) or {}
+    members = []
+    for filename in filenames:
+        if os.path.basename(filename) != filename:
+            continue  # never follow a path out of the invoice folders
+        original = invoices.get(normalize_filename(filename), filename)
+        for path in (os.path.join(invoices_dir, original), os.path.join(folder, filename)):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            members.append(Member(filename, path, stat.st_size, stat.st_mtime_ns))
+            break
+    return members
+
+
+def _invoice_index(invoices_dir: str) -> dict[str, str]:
+    """Normalized name -> file name in ``Invoices/``, so ``a_b.pdf`` finds ``a b.pdf``."""
+    return {normalize_filename(name): name for name in sorted(os.listdir(invoices_dir))}
+
+
+def zip_etag(members: list[Member], compression: str = "stored") -> str:
+    digest = hashlib.sha1(compression.encode("ascii"))
+    for m in members:
+        digest.update(f"\0{m.arcname}\0{m.size}\0{m.mtime_ns}".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def attachment_filename(filename: str) -> dict[str, str]:
+    """``Content-Disposition`` parameters for ``filename``, built like ``flask.send_file``'s.
+
+    Pass them to ``Headers.set``, which quotes them, so a label holding
+    ``"`` or ``;`` cannot break the header; non-ASCII names also get an
+    RFC 5987 ``filename*``.
+    """
+    try:
+        filename.encode("ascii")
+    except UnicodeEncodeError:
+        simple = unicodedata.normalize("NFKD", filename).encode("ascii", "ignore").decode("ascii")
+        return {"filename": simple, "filename*": "UTF-8''" + urllib.parse.quote(filename, safe="!#$&+^`|~")}
+    return {"filename": filename}
+
+
+class _Sink:
+    """Write-only, non-seekable target that hands out what ``ZipFile`` wrote so far."""
+
+    def __init__(self):
+        self._parts: list[bytes] = []
+
+    def write(self, data) -> int:
+        self._parts.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def take(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts.clear()
+        return data
+
+
+def stream_zip(members: list[Member], compression: str = "stored", chunk_size: int = CHUNK_SIZE):
+    """Yield the bytes of a ZIP holding ``members``, reading each file in chunks."""
+    method = COMPRESSION[compression]
+    sink = _Sink()
+    with zipfile.ZipFile(sink, "w", method) as archive:
+        for m in members:
+            try:
+                src = open(m.path, "rb")
+            except OSError:
+                continue  # removed since the listing; leave it out
+            with src:
+                info = zipfile.ZipInfo.from_file(m.path, m.arcname, strict_timestamps=False)
+                info.compress_type = method
+                with archive.open(info, "w") as dst:
+                    while chunk := src.read(chunk_size):
+                        dst.write(chunk)
+                        if data := sink.take():
+                            yield data
+            if data := sink.take():
+                yield data
+    yield sink.take()
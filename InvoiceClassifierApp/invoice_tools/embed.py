@@ -0,0 +1,343 @@
+"""Batched, concurrent client for the OpenAI embeddings endpoint.
+
+``OpenAIEmbeddingService.GetEmbeddingAsync`` sends one request per
+6000-character chunk, one chunk and one document at a time, through a new
+``EmbeddingClient`` per call. ``EmbeddingClient.embed`` here
+
+* cuts every document into the same 6000-character chunks,
+* packs the chunks of many documents into requests of up to
+  ``max_inputs`` inputs and ``max_tokens`` (estimated) tokens,
+* keeps up to ``concurrency`` requests in flight with asyncio, halving
+  that limit and waiting out ``retry-after`` on every 429 and growing it
+  back by one per window of successful requests,
+* retries timeouts, connection errors and 5xx with jittered exponential
+  backoff,
+* averages each document's chunk vectors exactly like ``AverageVectors``
+  (float32, summed in chunk order, divided by the chunk count).
+
+Vectors are requested base64-encoded, so they arrive as the same float32
+values the .NET SDK sees. ``OPENAI_BASE_URL`` points the client at another
+endpoint, e.g. the offline one from ``python -m invoice_tools.bench serve``::
+
+    python -m invoice_tools.embed corpus.jsonl.gz -o train.store --cache-dir embeddings
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import os
+import random
+import time
+import urllib.error
+import urllib.request
+from collections.abc import Callable
+from typing import NamedTuple
+
+import numpy as np
+
+DEFAULT_MODEL = "text-embedding-3-large"
+DEFAULT_BASE_URL = "https://api.openai.com/v1"
+CHUNK_CHARS = 6000
+MAX_INPUTS = 2048
+# The endpoint accepts 300k tokens per request; the estimate below is conservative.
+MAX_REQUEST_TOKENS = 250_000
+RETRY_STATUSES = {408, 409, 429, 500, 502, 503, 504}
+
+
+class EmbeddingError(RuntimeError):
+    def __init__(self, message: str, status: int | None = None):
+        super().__init__(message)
+        self.status = status
+
+
+def chunk_text(text: str, size: int = CHUNK_CHARS) -> list[str]:
+    """Same chunks as ``OpenAIEmbeddingService.ChunkText``."""
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+def estimate_tokens(text: str) -> int:
+    # English averages ~4 characters per token; numbers and IDs in invoices run shorter.
+    return len(text) // 3 + 1
+
+
+def average_vectors(vectors: list[np.ndarray]) -> np.ndarray:
+    """Same float32 arithmetic as ``OpenAIEmbeddingService.AverageVectors``."""
+    average = np.zeros(len(vectors[0]), dtype=np.float32)
+    for vector in vectors:
+        average += vector
+    average /= np.float32(len(vectors))
+    return average
+
+
+class Chunk(NamedTuple):
+    document: int
+    index: int
+    text: str
+    tokens: int
+
+
+def pack_batches(chunks: list[Chunk], max_inputs: int = MAX_INPUTS,
+                 max_tokens: int = MAX_REQUEST_TOKENS) -> list[list[Chunk]]:
+    """Greedily fill requests in order without exceeding either limit."""
+    batches, batch, tokens = [], [], 0
+    for chunk in chunks:
+        if batch and (len(batch) >= max_inputs or tokens + chunk.tokens > max_tokens):
+            batches.append(batch)
+            batch, tokens = [], 0
+        batch.append(chunk)
+        tokens += chunk.tokens
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+class AdaptiveLimiter:
+    """Cap on requests in flight: halved on a 429, grown by one per ``limit`` successes."""
+
+    def __init__(self, limit: int):
+        self.max_limit = limit
+        self.limit = limit
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self._successes = 0
+        self._last_cut = 0.0
+        self._cond = asyncio.Condition()
+
+    async def acquire(self) -> float:
+        """Wait for a free slot and any pause; returns the start time to pass to ``release``."""
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.in_flight < self.limit)
+            self.in_flight += 1
+        delay = self.paused_until - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return time.monotonic()
+
+    async def release(self, started: float, retry_after: float | None = None) -> None:
+        """``retry_after`` is set when the request was throttled."""
+        async with self._cond:
+            self.in_flight -= 1
+            if retry_after is not None:
+                self.paused_until = max(self.paused_until, time.monotonic() + retry_after)
+                # Requests sent before the last cut were throttled under the old limit.
+                if started >= self._last_cut:
+                    self.limit = max(1, self.limit // 2)
+                    self._last_cut = time.monotonic()
+                    self._successes = 0
+            else:
+                self._successes += 1
+                if self._successes >= self.limit and self.limit < self.max_limit:
+                    self.limit += 1
+                    self._successes = 0
+            self._cond.notify_all()
+
+
+def _retry_after(headers) -> float | None:
+    if headers is None:
+        return None
+    for name, scale in (("retry-after-ms", 1000.0), ("retry-after", 1.0)):
+        value = headers.get(name)
+        if value:
+            try:
+                return float(value) / scale
+            except ValueError:
+                pass
+    return None
+
+
+class EmbeddingClient:
+    def __init__(self, model: str = DEFAULT_MODEL, api_key: str | None = None, base_url: str | None = None,
+                 concurrency: int = 8, max_inputs: int = MAX_INPUTS, max_tokens: int = MAX_REQUEST_TOKENS,
+                 max_retries: int = 6, timeout: float = 60.0, dimensions: int | None = None):
+        self.model = model
+        self.api_key = api_key or os.environ.get("OPENAI_API_KEY")
+        self.url = (base_url or os.environ.get("OPENAI_BASE_URL") or DEFAULT_BASE_URL).rstrip("/") + "/embeddings"
+        self.concurrency = concurrency
+        self.max_inputs = max_inputs
+        self.max_tokens = max_tokens
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.dimensions = dimensions
+        self.stats = {"requests": 0, "inputs": 0, "retries": 0, "throttled": 0}
+
+    def _post(self, texts: list[str]) -> list[np.ndarray]:
+        body = {"model": self.model, "input": texts, "encoding_format": "base64"}
+        if self.dimensions:
+            body["dimensions"] = self.dimensions
+        headers = {"Content-Type": "application/json"}
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+        request = urllib.request.Request(self.url, json.dumps(body).encode("utf-8"), headers)
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            data = json.load(response)["data"]
+        vectors = [None] * len(texts)
+        for item in data:
+            embedding = item["embedding"]
+            if isinstance(embedding, str):
+                vectors[item["index"]] = np.frombuffer(base64.b64decode(embedding), dtype="<f4")
+            else:
+                vectors[item["index"]] = np.asarray(embedding, dtype=np.float32)
+        if any(v is None for v in vectors):
+            raise EmbeddingError(f"Response is missing {sum(v is None for v in vectors)} embeddings")
+        return vectors
+
+    async def _request(self, limiter: AdaptiveLimiter, texts: list[str]) -> list[np.ndarray]:
+        for attempt in range(self.max_retries + 1):
+            started = await limiter.acquire()
+            retry_after = None
+            try:
+                vectors = await asyncio.to_thread(self._post, texts)
+            except urllib.error.HTTPError as e:
+                if e.code not in RETRY_STATUSES or attempt == self.max_retries:
+                    detail = e.read().decode("utf-8", "replace")[:500]
+                    await limiter.release(started)
+                    raise EmbeddingError(f"HTTP {e.code} from {self.url}: {detail}", e.code) from e
+                retry_after = _retry_after(e.headers)
+                if e.code == 429:
+                    self.stats["throttled"] += 1
+                    await limiter.release(started, retry_after if retry_after is not None else self._backoff(attempt))
+                    retry_after = 0.0  # the limiter now holds every request back
+                else:
+                    await limiter.release(started)
+            except (urllib.error.URLError, TimeoutError, ConnectionError) as e:
+                await limiter.release(started)
+                if attempt == self.max_retries:
+                    raise EmbeddingError(f"Request to {self.url} failed: {e}") from e
+            else:
+                await limiter.release(started)
+                self.stats["requests"] += 1
+                self.stats["inputs"] += len(texts)
+                return vectors
+            self.stats["retries"] += 1
+            await asyncio.sleep(retry_after if retry_after is not None else self._backoff(attempt))
+        raise AssertionError("unreachable")
+
+    @staticmethod
+    def _backoff(attempt: int) -> float:
+        return min(30.0, 0.5 * 2 ** attempt) * random.uniform(0.5, 1.0)
+
+    async def embed_async(self, texts: list[str],
+                          on_document: Callable[[int, np.ndarray], None] | None = None) -> list[np.ndarray | None]:
+        """One averaged vector per text (``None`` for empty texts, which have no chunks).
+
+        ``on_document(i, vector)`` is called as soon as every chunk of text
+        ``i`` is embedded, so callers can persist results while the rest run.
+        """
+        chunks = [Chunk(doc, i, piece, estimate_tokens(piece))
+                  for doc, text in enumerate(texts) for i, piece in enumerate(chunk_text(text))]
+        pieces: list[list] = [[None] * len(chunk_text(text)) for text in texts]
+        remaining = [len(p) for p in pieces]
+        results: list[np.ndarray | None] = [None] * len(texts)
+        limiter = AdaptiveLimiter(self.concurrency)
+
+        async def run(batch: list[Chunk]) -> None:
+            vectors = await self._request(limiter, [c.text for c in batch])
+            for chunk, vector in zip(batch, vectors):
+                pieces[chunk.document][chunk.index] = vector
+                remaining[chunk.document] -= 1
+                if remaining[chunk.document] == 0:
+                    results[chunk.document] = average_vectors(pieces[chunk.document])
+                    pieces[chunk.document] = None
+                    if on_document:
+                        on_document(chunk.document, results[chunk.document])
+
+        await asyncio.gather(*(run(b) for b in pack_batches(chunks, self.max_inputs, self.max_tokens)))
+        return results
+
+    def embed(self, texts: list[str],
+              on_document: Callable[[int, np.ndarray], None] | None = None) -> list[np.ndarray | None]:
+        return asyncio.run(self.embed_async(texts, on_document))
+
+
+def safe_name(identifier: str) -> str:
+    """File name stem ``OpenAIEmbeddingService`` uses for an identifier's cache file."""
+    return identifier.replace(" ", "_").replace("/", "_")
+
+
+def load_cached(folder: str, identifier: str) -> np.ndarray | None:
+    """Vector from the per-document JSON cache (any layout the .NET app writes)."""
+    try:
+        with open(os.path.join(folder, safe_name(identifier) + ".json"), "r", encoding="utf-8") as f:
+            value = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if isinstance(value, dict):
+        value = value.get("Vector") or value.get("Embedding")
+    return np.asarray(value, dtype=np.float32) if isinstance(value, list) and value else None
+
+
+def save_cached(folder: str, identifier: str, vector: np.ndarray, label: str | None = None) -> None:
+    """Write the cache file as an ``EmbeddingFileFormat`` object, the layout ``OpenAIEmbeddingService`` reads back."""
+    path = os.path.join(folder, safe_name(identifier) + ".json")
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"Filename": identifier, "Label": label, "Vector": vector.tolist()}, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def main(argv: list[str] | None = None) -> None:
+    from .extract import iter_corpus
+    from .store import write_store
+
+    parser = argparse.ArgumentParser(description="Embed a text corpus with batched, concurrent requests.")
+    parser.add_argument("corpus", help="JSON-lines corpus from invoice_tools.extract")
+    parser.add_argument("-o", "--out", required=True, help="Embedding store to write")
+    parser.add_argument("--cache-dir", help="Reuse and write the per-document {Filename, Label, Vector} JSON files of the .NET cache")
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--dimensions", type=int)
+    parser.add_argument("-c", "--concurrency", type=int, default=8, help="Requests in flight (default: 8)")
+    parser.add_argument("--max-inputs", type=int, default=MAX_INPUTS, help="Chunks per request")
+    parser.add_argument("--max-tokens", type=int, default=MAX_REQUEST_TOKENS, help="Estimated tokens per request")
+    parser.add_argument("--dedup", type=float, metavar="JACCARD",
+                        help="Embed one document per group of near-duplicates at this similarity and reuse its vector")
+    args = parser.parse_args(argv)
+
+    records = list(iter_corpus(args.corpus))
+    vectors: list[np.ndarray | None] = [None] * len(records)
+    if args.cache_dir:
+        os.makedirs(args.cache_dir, exist_ok=True)
+        vectors = [load_cached(args.cache_dir, r["filename"]) for r in records]
+    todo = [i for i, v in enumerate(vectors) if v is None]
+    rep = list(range(len(records)))
+    if args.dedup is not None:
+        from .dedup import representatives
+
+        rep = representatives([r["text"] for r in records], args.dedup)
+        # A duplicate is taken from its group's first document, cached or embedded below.
+        copies = [i for i in todo if rep[i] != i]
+        todo = [i for i in todo if rep[i] == i]
+        if copies:
+            print(f"🧬 {len(copies)} near-duplicates will reuse the embedding of an earlier document")
+    print(f"🔍 {len(records)} documents, {len(records) - len(todo)} cached or duplicated, {len(todo)} to embed")
+
+    client = EmbeddingClient(args.model, concurrency=args.concurrency, max_inputs=args.max_inputs,
+                             max_tokens=args.max_tokens, dimensions=args.dimensions)
+
+    def on_document(j: int, vector: np.ndarray) -> None:
+        vectors[todo[j]] = vector
+        if args.cache_dir:
+            save_cached(args.cache_dir, records[todo[j]]["filename"], vector, records[todo[j]]["label"])
+
+    started = time.perf_counter()
+    client.embed([records[i]["text"] for i in todo], on_document)
+    stats = client.stats
+    print(f"✅ Embedded in {time.perf_counter() - started:.2f}s: {stats['inputs']} chunks in "
+          f"{stats['requests']} requests, {stats['retries']} retries ({stats['throttled']} rate limited)")
+
+    for i, first in enumerate(rep):
+        if vectors[i] is None and vectors[first] is not None:
+            vectors[i] = vectors[first]
+            if args.cache_dir:
+                save_cached(args.cache_dir, records[i]["filename"], vectors[i], records[i]["label"])
+
+    kept = [i for i, v in enumerate(vectors) if v is not None]
+    if len(kept) < len(records):
+        print(f"⚠️ Skipped {len(records) - len(kept)} documents without text")
+    store = write_store(args.out, [records[i]["filename"] for i in kept], [records[i]["label"] for i in kept],
+                        np.stack([vectors[i] for i in kept]) if kept else np.zeros((0, 0), np.float32))
+    print(f"📦 Store with {len(store)} embeddings saved to: {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,337 @@
+"""Parallel PDF text pre-extraction with a content-addressed text cache.
+
+``InvoiceLoader`` re-parses every PDF in TrainData/ and Invoices/ on every
+``dotnet run``. This stage extracts them once, in a process pool, and keeps
+the page texts of every document under
+``<cache>/pages/<sha256[:2]>/<sha256>.json``, keyed by the SHA-256 of the
+whole file - a PDF is parsed as a whole, so a changed file is re-parsed
+entirely:
+
+* ``<cache>/manifest.json`` remembers size, mtime and SHA-256 of every
+  source path, so an unchanged file is neither re-hashed nor re-parsed,
+* a changed mtime with identical bytes (a copy, a touch, a re-upload) is
+  re-hashed but still served from the cache,
+* ``.txt`` files are read as-is, like ``InvoiceLoader`` does.
+
+The text comes from pypdf, which does not lay out text exactly like the
+iText ``PdfTextExtractor`` of ``InvoiceLoader`` (spacing, line breaks,
+reading order). Once ``--siblings`` are written ``InvoiceLoader`` embeds
+the pypdf text instead of its own, so the embeddings of a PDF can differ
+from those of a run without siblings; write them for TrainData/ and
+Invoices/ alike, and re-embed the training set when starting or stopping.
+
+The result is written as a gzip-compressed JSON-lines corpus, as a tree of
+``.txt`` files (``<out>/TrainData/<label>/<name>.pdf.txt``,
+``<out>/Invoices/<name>.pdf.txt``) and/or with ``--siblings`` as a
+``<name>.pdf.txt`` next to every PDF. ``InvoiceLoader`` loads such a
+sibling instead of its PDF while the text is at least as new as the PDF,
+so ``dotnet run`` skips the parsing without any change to its folders::
+
+    python -m invoice_tools.extract --train TrainData --invoices Invoices \
+        --cache text_cache -o corpus.jsonl.gz --siblings
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import NamedTuple
+
+CHUNK_SIZE = 1024 * 1024
+SOURCE_EXTENSIONS = (".pdf", ".txt")
+SIBLING_SUFFIX = ".txt"  # <name>.pdf.txt next to <name>.pdf
+
+
+class Source(NamedTuple):
+    path: str
+    label: str | None  # None for invoices to classify
+    filename: str
+
+
+class Document(NamedTuple):
+    path: str
+    label: str | None
+    filename: str
+    sha256: str
+    pages: list[str]
+    error: str | None = None
+
+    @property
+    def text(self) -> str:
+        # Same layout as InvoiceLoader.ExtractTextFromPdf: every page followed by a newline.
+        return "".join(page + "\n" for page in self.pages)
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def extract_pages(path: str) -> list[str]:
+    """Text of every page of a PDF, via pypdf."""
+    from pypdf import PdfReader
+
+    return [page.extract_text() or "" for page in PdfReader(path).pages]
+
+
+def _entry_path(cache_root: str, sha256: str) -> str:
+    return os.path.join(cache_root, "pages", sha256[:2], f"{sha256}.json")
+
+
+def _read_pages(cache_root: str, sha256: str) -> list[str] | None:
+    try:
+        with open(_entry_path(cache_root, sha256), "r", encoding="utf-8") as f:
+            return json.load(f)["pages"]
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def _write_pages(cache_root: str, sha256: str, pages: list[str]) -> None:
+    path = _entry_path(cache_root, sha256)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".page-")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump({"pages": pages}, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+class TextCache:
+    """Page texts of every parsed document by SHA-256 of the whole file, plus the path manifest."""
+
+    def __init__(self, root: str):
+        self.root = root
+        self.manifest_path = os.path.join(root, "manifest.json")
+        os.makedirs(root, exist_ok=True)
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                self.manifest: dict[str, dict] = json.load(f)
+        except (OSError, ValueError):
+            self.manifest = {}
+
+    def get(self, sha256: str) -> list[str] | None:
+        return _read_pages(self.root, sha256)
+
+    def known_sha(self, path: str, stat: os.stat_result) -> str | None:
+        """SHA-256 recorded for ``path`` if its size and mtime are unchanged."""
+        entry = self.manifest.get(os.path.abspath(path))
+        if entry and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+            return entry["sha256"]
+        return None
+
+    def remember(self, path: str, stat: os.stat_result, sha256: str) -> None:
+        self.manifest[os.path.abspath(path)] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": sha256}
+
+    def save(self) -> None:
+        fd, tmp = tempfile.mkstemp(dir=self.root, prefix=".manifest-", suffix=".json")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f, ensure_ascii=False, indent=1)
+        os.replace(tmp, self.manifest_path)
+
+
+class _Extracted(NamedTuple):
+    sha256: str
+    pages: list[str]
+    parsed: bool  # False if the bytes were already in the cache
+    error: str | None
+
+
+def _extract_worker(path: str, cache_root: str) -> _Extracted:
+    """Hash ``path`` and parse it unless the cache already holds its bytes."""
+    sha = file_sha256(path)
+    pages = _read_pages(cache_root, sha)
+    if pages is not None:
+        return _Extracted(sha, pages, False, None)
+    try:
+        pages = extract_pages(path)
+    except Exception as e:  # one broken PDF must not stop the batch
+        return _Extracted(sha, [], True, f"{type(e).__name__}: {e}")
+    _write_pages(cache_root, sha, pages)
+    return _Extracted(sha, pages, True, None)
+
+
+def source_filename(name: str) -> str:
+    """Name a document is reported under: a ``<name>.pdf.txt`` counts as its PDF, as in ``InvoiceLoader``."""
+    return name[:-len(SIBLING_SUFFIX)] if name.lower().endswith(".pdf" + SIBLING_SUFFIX) else name
+
+
+def _folder_sources(folder: str, label: str | None) -> list[Source]:
+    names = sorted(n for n in os.listdir(folder) if n.lower().endswith(SOURCE_EXTENSIONS))
+    present = set(names)
+    # A sibling written by write_text_siblings is output, not a source, while its PDF is there
+    return [Source(os.path.join(folder, name), label, source_filename(name)) for name in names
+            if source_filename(name) == name or source_filename(name) not in present]
+
+
+def scan_sources(train_root: str | None, invoices_root: str | None) -> list[Source]:
+    """The documents ``InvoiceLoader`` would read: TrainData/<label>/* and Invoices/*, PDFs and text."""
+    sources = []
+    if train_root and os.path.isdir(train_root):
+        for label in sorted(os.listdir(train_root)):
+            folder = os.path.join(train_root, label)
+            if os.path.isdir(folder):
+                sources.extend(_folder_sources(folder, label.lower()))
+    if invoices_root and os.path.isdir(invoices_root):
+        sources.extend(_folder_sources(invoices_root, None))
+    return sources
+
+
+def extract_all(sources: list[Source], cache: TextCache, workers: int | None = None) -> tuple[list[Document], dict]:
+    """Text of every source, parsing only PDFs whose bytes are not cached yet."""
+    documents: list[Document | None] = [None] * len(sources)
+    stats = {"cached": 0, "rehashed": 0, "parsed": 0, "text": 0, "failed": 0}
+    pending = []
+    for i, source in enumerate(sources):
+        if source.path.lower().endswith(".txt"):
+            with open(source.path, "r", encoding="utf-8", errors="replace") as f:
+                text = f.read()
+            documents[i] = Document(source.path, source.label, source.filename,
+                                    hashlib.sha256(text.encode("utf-8")).hexdigest(), [text])
+            stats["text"] += 1
+            continue
+        stat = os.stat(source.path)
+        sha = cache.known_sha(source.path, stat)
+        pages = cache.get(sha) if sha else None
+        if pages is not None:
+            documents[i] = Document(source.path, source.label, source.filename, sha, pages)
+            stats["cached"] += 1
+        else:
+            pending.append((i, stat))
+
+    if pending:
+        if workers == 1:
+            results = (_extract_worker(sources[i].path, cache.root) for i, _ in pending)
+        else:
+            pool = ProcessPoolExecutor(max_workers=workers)
+            futures = [pool.submit(_extract_worker, sources[i].path, cache.root) for i, _ in pending]
+            results = (future.result() for future in futures)
+        try:
+            for (i, stat), result in zip(pending, results):
+                source = sources[i]
+                documents[i] = Document(source.path, source.label, source.filename, result.sha256,
+                                        result.pages, result.error)
+                if result.error:
+                    print(f"⚠️ Failed to extract {source.path}: {result.error}")
+                    stats["failed"] += 1
+                    continue
+                cache.remember(source.path, stat, result.sha256)
+                stats["parsed" if result.parsed else "rehashed"] += 1
+        finally:
+            if workers != 1:
+                pool.shutdown()
+        cache.save()
+    return documents, stats
+
+
+def _open_text(path: str, mode: str, compressed: bool):
+    if compressed:
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def write_corpus(path: str, documents: list[Document]) -> int:
+    """One JSON object per line: filename, label, sha256, text. Failed documents are left out."""
+    count = 0
+    tmp = path + ".tmp"
+    with _open_text(tmp, "w", path.endswith(".gz")) as f:
+        for doc in documents:
+            if doc.error:
+                continue
+            f.write(json.dumps({"filename": doc.filename, "label": doc.label, "sha256": doc.sha256,
+                                "text": doc.text}, ensure_ascii=False) + "\n")
+            count += 1
+    os.replace(tmp, path)
+    return count
+
+
+def iter_corpus(path: str):
+    """Yield the records of a corpus written by ``write_corpus``."""
+    with _open_text(path, "r", path.endswith(".gz")) as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def _write_text(path: str, text: str, not_older_than: str | None = None) -> bool:
+    """Write ``text`` to ``path`` unless it already holds it; ``True`` if the file was written.
+
+    An unchanged file is still touched if it is older than ``not_older_than``.
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            unchanged = f.read() == text
+    except OSError:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        unchanged = False
+    if unchanged:
+        if not_older_than and os.stat(path).st_mtime_ns < os.stat(not_older_than).st_mtime_ns:
+            os.utime(path)
+        return False
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+    return True
+
+
+def write_text_tree(root: str, documents: list[Document]) -> int:
+    """``<root>/TrainData/<label>/<name>.txt`` and ``<root>/Invoices/<name>.txt``, rewritten only on change."""
+    count = 0
+    for doc in documents:
+        if doc.error:
+            continue
+        folder = os.path.join(root, "TrainData", doc.label) if doc.label else os.path.join(root, "Invoices")
+        name = doc.filename if doc.filename.lower().endswith(".txt") else doc.filename + SIBLING_SUFFIX
+        count += _write_text(os.path.join(folder, name), doc.text)
+    return count
+
+
+def write_text_siblings(documents: list[Document]) -> int:
+    """``<name>.pdf.txt`` next to every extracted PDF, at least as new as the PDF so ``InvoiceLoader`` uses it."""
+    count = 0
+    for doc in documents:
+        if not doc.error and doc.path.lower().endswith(".pdf"):
+            count += _write_text(doc.path + SIBLING_SUFFIX, doc.text, not_older_than=doc.path)
+    return count
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Extract PDF text from TrainData/ and Invoices/ in parallel.")
+    parser.add_argument("--train", help="TrainData folder (one subfolder per label)")
+    parser.add_argument("--invoices", help="Invoices folder")
+    parser.add_argument("--cache", default="text_cache", help="Text cache folder (default: text_cache)")
+    parser.add_argument("-o", "--out", help="Write a JSON-lines corpus (.gz to compress)")
+    parser.add_argument("--text-tree", help="Write a TrainData/ and Invoices/ tree of .txt files under this folder")
+    parser.add_argument("--siblings", action="store_true",
+                        help="Write <name>.pdf.txt next to every PDF; InvoiceLoader reads it instead of the PDF")
+    parser.add_argument("-j", "--workers", type=int, help="Worker processes (default: one per CPU)")
+    args = parser.parse_args(argv)
+    if not args.train and not args.invoices:
+        parser.error("give --train and/or --invoices")
+
+    started = time.perf_counter()
+    sources = scan_sources(args.train, args.invoices)
+    documents, stats = extract_all(sources, TextCache(args.cache), args.workers)
+    elapsed = time.perf_counter() - started
+    print(f"✅ {len(documents)} documents in {elapsed:.2f}s: {stats['parsed']} parsed, "
+          f"{stats['cached'] + stats['rehashed']} from cache, {stats['text']} text files, {stats['failed']} failed")
+
+    if args.out:
+        count = write_corpus(args.out, documents)
+        print(f"📄 Corpus with {count} documents saved to: {args.out}")
+    if args.text_tree:
+        count = write_text_tree(args.text_tree, documents)
+        print(f"📁 Text tree updated ({count} files written): {args.text_tree}")
+    if args.siblings:
+        count = write_text_siblings(documents)
+        print(f"📁 Text next to the PDFs updated ({count} files written)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,469 @@
+"""Background job queue for long-running pipeline commands.
+
+The Flask UI used to call ``subprocess.run`` inside the request handler, so
+the HTTP worker blocked for the whole compile + embed + classify run and two
+clicks ran two pipelines over the same output folder at once. ``JobQueue``
+runs commands on a bounded pool of worker threads instead:
+
+* ``submit`` returns immediately with a job id,
+* an identical job that is still queued or running is reused, not duplicated,
+* jobs sharing a ``lock`` (e.g. an output folder) never run concurrently,
+* stdout/stderr is captured line by line for status, progress and log views,
+* queued jobs can be cancelled and running ones are terminated.
+
+With a ``state_dir`` the queue also works across the worker processes of a
+multi-worker server: every job is recorded in ``<state_dir>/<id>.json``
+with its log in ``<id>.log``, so any worker can report, de-duplicate and
+cancel jobs another worker runs, and a ``lock`` is additionally held as a
+``locks.FileLock`` on ``<state_dir>/<lock>.lock`` while the job runs. A job
+whose owning process died is reported as failed.
+"""
+
+import itertools
+import json
+import os
+import signal
+import subprocess
+import threading
+import time
+import uuid
+from collections import deque
+from collections.abc import Callable
+
+from .locks import FileLock, pid_alive
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED_STATES = {SUCCEEDED, FAILED, CANCELLED}
+
+# Called with (job, output line); returns the new progress in [0, 1] or None.
+ProgressParser = Callable[["Job", str], float | None]
+# Seconds between record updates while a job runs (progress seen by other workers)
+SAVE_INTERVAL = 1.0
+
+
+class Job:
+    def __init__(self, kind: str, command: list[str], cwd: str | None, lock: str | None, progress: ProgressParser | None, max_log_lines: int):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.command = command
+        self.cwd = cwd
+        self.lock = lock
+        self.key = (kind, tuple(command), cwd)
+        self.status = QUEUED
+        self.progress = 0.0
+        self.returncode: int | None = None
+        self.error: str | None = None
+        self.created = time.time()
+        self.started: float | None = None
+        self.finished: float | None = None
+        self._progress_parser = progress
+        self._log: deque[str] = deque(maxlen=max_log_lines)
+        self._log_offset = 0  # number of lines dropped from the front of the log
+        self._process: subprocess.Popen | None = None
+        self._cancel_requested = False
+        self.owner = os.getpid()
+        self.pid: int | None = None  # process (group) id of the running command
+        self.state_dir: str | None = None
+        self._log_file = None
+
+    def cancel_requested(self) -> bool:
+        """Cancelled here, or by another worker through the ``.cancel`` marker."""
+        return self._cancel_requested or (self.state_dir is not None
+                                          and os.path.exists(_marker_path(self.state_dir, self.id)))
+
+    def append_log(self, line: str) -> None:
+        if len(self._log) == self._log.maxlen:
+            self._log_offset += 1
+        self._log.append(line)
+        if self._log_file is not None:
+            self._log_file.write(line + "\n")
+            self._log_file.flush()
+        if self._progress_parser is not None:
+            value = self._progress_parser(self, line)
+            if value is not None:
+                self.progress = max(0.0, min(1.0, value))
+
+    def log_since(self, since: int = 0) -> tuple[list[str], int]:
+        """Log lines from absolute line number ``since`` and the next cursor."""
+        lines = list(self._log)
+        start = max(0, since - self._log_offset)
+        return lines[start:], self._log_offset + len(lines)
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "progress": round(self.progress, 4),
+            "returncode": self.returncode,
+            "error": self.error,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+            "log_lines": self._log_offset + len(self._log),
+        }
+
+    def to_record(self) -> dict:
+        return dict(self.to_dict(), command=self.command, cwd=self.cwd, lock=self.lock, owner=self.owner,
+                    pid=self.pid)
+
+
+class StoredJob:
+    """Read-only view of a job from its record in ``state_dir``, typically run by another worker."""
+
+    def __init__(self, record: dict, state_dir: str):
+        self.record = record
+        self.state_dir = state_dir
+        self.id = record["id"]
+        self.kind = record["kind"]
+        self.key = (record["kind"], tuple(record["command"]), record["cwd"])
+        self.status = record["status"]
+        self.created = record["created"]
+        self.finished = record["finished"]
+        self.error = record["error"]
+        if self.status not in FINISHED_STATES and not pid_alive(record["owner"]):
+            self.status, self.error = FAILED, "worker process exited"
+
+    def to_dict(self) -> dict:
+        return dict({k: self.record[k] for k in ("id", "kind", "progress", "returncode", "created", "started",
+                                                 "finished")},
+                    status=self.status, error=self.error, log_lines=len(self._lines()))
+
+    def log_since(self, since: int = 0) -> tuple[list[str], int]:
+        lines = self._lines()
+        return lines[max(0, since):], len(lines)
+
+    def _lines(self) -> list[str]:
+        try:
+            with open(_log_path(self.state_dir, self.id), "r", encoding="utf-8", errors="replace") as f:
+                return f.read().splitlines()
+        except FileNotFoundError:
+            return []
+
+
+class JobQueue:
+    def __init__(self, workers: int = 2, max_log_lines: int = 2000, history: int = 100,
+                 state_dir: str | None = None):
+        self.max_log_lines = max_log_lines
+        self.history = history
+        self.state_dir = state_dir
+        if state_dir:
+            os.makedirs(state_dir, exist_ok=True)
+        self._jobs: dict[str, Job] = {}
+        self._pending: deque[Job] = deque()
+        self._held_locks: set[str] = set()
+        self._cond = threading.Condition()
+        self._stopping = False
+        self._threads = [
+            threading.Thread(target=self._worker, name=f"job-worker-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for t in self._threads:
+            t.start()
+
+    def submit(self, kind: str, command: list[str], cwd: str | None = None, lock: str | None = None,
+               progress: ProgressParser | None = None) -> tuple[Job, bool]:
+        """Queue ``command`` and return ``(job, created)``.
+
+        If an identical job is still queued or running - in any worker
+        sharing the ``state_dir`` - it is returned with ``created=False``
+        instead of starting another run.
+        """
+        key = (kind, tuple(command), cwd)
+        with self._cond, self._queue_lock():
+            for job in itertools.chain(self._pending, self._running(), self._stored_jobs()):
+                if job.key == key and job.status not in FINISHED_STATES and not self._cancelled(job):
+                    return job, False
+
+            job = Job(kind, command, cwd, lock, progress, self.max_log_lines)
+            job.state_dir = self.state_dir
+            self._jobs[job.id] = job
+            self._pending.append(job)
+            self._save(job)
+            self._trim_history()
+            self._cond.notify()
+            return job, True
+
+    def get(self, job_id: str) -> Job | StoredJob | None:
+        job = self._jobs.get(job_id)
+        if job is None and self.state_dir:
+            return self._load(job_id)
+        return job
+
+    def all_jobs(self) -> list[Job | StoredJob]:
+        with self._cond:
+            jobs = dict((j.id, j) for j in self._stored_jobs())
+            jobs.update(self._jobs)
+            return sorted(jobs.values(), key=lambda j: j.created, reverse=True)
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a queued job or terminate a running one."""
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return self._cancel_stored(job_id)
+            if job.status in FINISHED_STATES:
+                return False
+            job._cancel_requested = True
+            if job.status == QUEUED:
+                if job in self._pending:
+                    self._pending.remove(job)
+                    self._finish(job, CANCELLED)
+                # else it waits for another worker's lock and stops waiting itself
+                return True
+            process = job._process
+
+        if process is not None:
+            _terminate(process)
+        return True
+
+    def shutdown(self) -> None:
+        with self._cond:
+            self._stopping = True
+            for job in list(self._pending):
+                self._finish(job, CANCELLED)
+            self._pending.clear()
+            running = [j._process for j in self._running() if j._process is not None]
+            self._cond.notify_all()
+        for process in running:
+            _terminate(process)
+
+    def _running(self) -> list[Job]:
+        return [j for j in self._jobs.values() if j.status == RUNNING]
+
+    def _next_runnable(self) -> Job | None:
+        for job in list(self._pending):
+            if job.cancel_requested():
+                self._pending.remove(job)
+                self._finish(job, CANCELLED)
+            elif job.lock is None or job.lock not in self._held_locks:
+                self._pending.remove(job)
+                return job
+        return None
+
+    def _worker(self) -> None:
+        while True:
+            with self._cond:
+                job = None
+                while not self._stopping and (job := self._next_runnable()) is None:
+                    self._cond.wait()
+                if self._stopping:
+                    return
+                if job.lock is not None:
+                    self._held_locks.add(job.lock)
+            file_lock = self._acquire_file_lock(job)
+            try:
+                if file_lock is not None or job.lock is None or not self.state_dir:
+                    with self._cond:
+                        job.status = RUNNING
+                        job.started = time.time()
+                        self._save(job)
+                    self._run(job)
+            finally:
+                if file_lock is not None:
+                    file_lock.release()
+                with self._cond:
+                    if job.lock is not None:
+                        self._held_locks.discard(job.lock)
+                    self._cond.notify_all()
+
+    def _acquire_file_lock(self, job: Job) -> FileLock | None:
+        """Hold ``job.lock`` across processes; ``None`` if there is nothing to hold or the job was cancelled."""
+        if job.lock is None or not self.state_dir:
+            return None
+        lock = FileLock(os.path.join(self.state_dir, f"{job.lock}.lock"))
+        waiting = False
+        while not lock.acquire(timeout=0.5):
+            if not waiting:
+                job.append_log(f"⏳ Waiting for another worker's {job.lock} job to finish")
+                waiting = True
+            if job.cancel_requested() or self._stopping:
+                with self._cond:
+                    self._finish(job, CANCELLED)
+                return None
+        return lock
+
+    def _run(self, job: Job) -> None:
+        try:
+            process = subprocess.Popen(
+                job.command,
+                cwd=job.cwd,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                text=True,
+                encoding="utf-8",
+                errors="replace",
+                bufsize=1,
+                **_process_group_kwargs(),
+            )
+        except OSError as e:
+            with self._cond:
+                job.error = str(e)
+                self._finish(job, FAILED)
+            return
+
+        with self._cond:
+            job._process = process
+            job.pid = process.pid
+            self._save(job)
+            cancelled_early = job.cancel_requested()
+        if cancelled_early:
+            _terminate(process)
+
+        saved = time.monotonic()
+        for line in process.stdout:
+            job.append_log(line.rstrip("\r\n"))
+            if self.state_dir and time.monotonic() - saved > SAVE_INTERVAL:
+                with self._cond:
+                    self._save(job)
+                saved = time.monotonic()
+        process.wait()
+
+        with self._cond:
+            job.returncode = process.returncode
+            job._process = None
+            if job.cancel_requested():
+                self._finish(job, CANCELLED)
+            elif process.returncode == 0:
+                job.progress = 1.0
+                self._finish(job, SUCCEEDED)
+            else:
+                job.error = f"exited with code {process.returncode}"
+                self._finish(job, FAILED)
+
+    def _finish(self, job: Job, status: str) -> None:
+        job.status = status
+        job.finished = time.time()
+        if job._log_file is not None:
+            job._log_file.close()
+            job._log_file = None
+        self._save(job)
+
+    def _trim_history(self) -> None:
+        finished = [j for j in self.all_jobs() if j.status in FINISHED_STATES]
+        finished.sort(key=lambda j: j.finished or 0)
+        for job in finished[: max(0, len(finished) - self.history)]:
+            self._jobs.pop(job.id, None)
+            if self.state_dir:
+                for path in (_record_path(self.state_dir, job.id), _log_path(self.state_dir, job.id),
+                             _marker_path(self.state_dir, job.id)):
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+
+    # Shared state, all no-ops without a state_dir
+
+    def _queue_lock(self):
+        return FileLock(os.path.join(self.state_dir, "queue.lock")) if self.state_dir else _NoLock()
+
+    def _save(self, job: Job) -> None:
+        if not self.state_dir:
+            return
+        if job._log_file is None and job.status not in FINISHED_STATES:
+            job._log_file = open(_log_path(self.state_dir, job.id), "a", encoding="utf-8")
+        path = _record_path(self.state_dir, job.id)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(job.to_record(), f)
+        os.replace(tmp, path)
+
+    def _load(self, job_id: str) -> StoredJob | None:
+        try:
+            with open(_record_path(self.state_dir, job_id), "r", encoding="utf-8") as f:
+                return StoredJob(json.load(f), self.state_dir)
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _stored_jobs(self) -> list[StoredJob]:
+        if not self.state_dir:
+            return []
+        names = [n[:-len(".json")] for n in os.listdir(self.state_dir) if n.endswith(".json")]
+        return [job for job in map(self._load, names) if job is not None and job.id not in self._jobs]
+
+    def _cancelled(self, job: Job | StoredJob) -> bool:
+        if isinstance(job, Job):
+            return job.cancel_requested()
+        return os.path.exists(_marker_path(self.state_dir, job.id))
+
+    def _cancel_stored(self, job_id: str) -> bool:
+        """Ask the worker that owns ``job_id`` to cancel it; a running command is terminated from here."""
+        job = self._load(job_id) if self.state_dir else None
+        if job is None or job.status in FINISHED_STATES:
+            return False
+        with open(_marker_path(self.state_dir, job_id), "w", encoding="utf-8"):
+            pass
+        if job.status == RUNNING and job.record.get("pid"):
+            _terminate_pid(job.record["pid"])
+        return True
+
+
+class _NoLock:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+def _record_path(state_dir: str, job_id: str) -> str:
+    return os.path.join(state_dir, f"{job_id}.json")
+
+
+def _log_path(state_dir: str, job_id: str) -> str:
+    return os.path.join(state_dir, f"{job_id}.log")
+
+
+def _marker_path(state_dir: str, job_id: str) -> str:
+    return os.path.join(state_dir, f"{job_id}.cancel")
+
+
+def _process_group_kwargs() -> dict:
+    # Run each job in its own process group so cancelling also stops the
+    # children ``dotnet run`` spawns.
+    if os.name == "nt":
+        return {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP}
+    return {"start_new_session": True}
+
+
+def _terminate(process: subprocess.Popen, grace: float = 5.0) -> None:
+    if process.poll() is not None:
+        return
+    if os.name == "nt":
+        subprocess.run(["taskkill", "/T", "/F", "/PID", str(process.pid)], capture_output=True)
+        return
+    try:
+        os.killpg(process.pid, signal.SIGTERM)
+        process.wait(timeout=grace)
+    except subprocess.TimeoutExpired:
+        os.killpg(process.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+
+def _terminate_pid(pid: int) -> None:
+    """Terminate the process group of a command started by another worker process."""
+    if os.name == "nt":
+        subprocess.run(["taskkill", "/T", "/F", "/PID", str(pid)], capture_output=True)
+        return
+    try:
+        os.killpg(pid, signal.SIGTERM)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+def count_lines_progress(marker: str, total: int) -> ProgressParser:
+    """Progress parser counting output lines that contain ``marker``."""
+    seen = {"count": 0}
+
+    def parse(job: Job, line: str) -> float | None:
+        if total <= 0 or marker not in line:
+            return None
+        seen["count"] += 1
+        return seen["count"] / total
+
+    return parse
@@ -0,0 +1,110 @@
+"""Join ``predictions.csv`` rows to embeddings by filename.
+
+The .NET app names the same invoice several ways: ``Program.cs`` replaces
+spaces with underscores before classifying, the embedding cache appends
+``.json`` (with or without the ``.pdf``) and the PDFs on disk keep their
+original spaces. ``canonical_key`` maps all of them to one key, and
+``join_predictions`` looks every embedding up in a hash index over the
+prediction keys in a single vectorized pass instead of scanning the whole
+predictions column once per embedding file.
+"""
+
+import os
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from .predictions import read_predictions
+from .store import EmbeddingStore, load_embeddings
+
+MISSING_LABEL = "unlabeled"
+
+
+def canonical_key(name: str) -> str:
+    """``"Capital_Income part2.pdf.json"`` -> ``"capital income part2"``."""
+    return canonical_keys(pd.Series([name])).iloc[0]
+
+
+def canonical_keys(names) -> pd.Series:
+    """Vectorized ``canonical_key`` over a sequence of names."""
+    keys = pd.Series(names, dtype=object).astype(str)
+    return (
+        keys.str.replace(r"^.*[\\/]", "", regex=True)
+        .str.replace(r"(?i)\.json$", "", regex=True)
+        .str.replace(r"(?i)\.pdf$", "", regex=True)
+        .str.replace("_", " ", regex=False)
+        .str.replace(r"\s+", " ", regex=True)
+        .str.strip()
+        .str.casefold()
+    )
+
+
+class JoinResult(NamedTuple):
+    frame: pd.DataFrame
+    unmatched: list[str]
+    duplicates: int
+
+
+def join_predictions(names: list[str], predictions: pd.DataFrame, missing_label: str = MISSING_LABEL) -> JoinResult:
+    """One row per entry of ``names`` (same order) with its prediction.
+
+    ``frame`` has ``name`` (as given), ``key``, ``matched``, ``filename``
+    (the prediction's ``Filename``, or ``<name>.pdf`` when unmatched),
+    ``label`` (``PredictedLabel`` or ``missing_label``) and every other
+    prediction column. When several predictions share a key the first wins;
+    ``duplicates`` counts the ones ignored.
+    """
+    predictions = predictions.reset_index(drop=True)
+    pred_keys = canonical_keys(predictions["Filename"])
+    first = ~pred_keys.duplicated()
+    index = pd.Index(pred_keys[first])
+    rows = np.flatnonzero(first.to_numpy())
+
+    keys = canonical_keys(names)
+    positions = index.get_indexer(keys)
+    matched = positions >= 0
+    row_ids = np.full(len(positions), -1)
+    row_ids[matched] = rows[positions[matched]]
+
+    # Unmatched rows reindex to -1, which is not a label, and come back as NaN.
+    joined = predictions.reindex(row_ids).reset_index(drop=True)
+
+    frame = pd.DataFrame({"name": list(names), "key": keys.to_numpy(), "matched": matched})
+    fallback = pd.Series([n[: -len(".json")] if n.lower().endswith(".json") else n for n in names], dtype=object)
+    fallback = fallback.where(fallback.str.lower().str.endswith(".pdf"), fallback + ".pdf")
+    frame["filename"] = joined["Filename"].where(matched, fallback)
+    frame["label"] = joined["PredictedLabel"].where(matched, missing_label)
+    for column in joined.columns:
+        if column not in ("Filename", "PredictedLabel", "key"):
+            frame[column] = joined[column]
+
+    unmatched = [n for n, m in zip(names, matched) if not m]
+    return JoinResult(frame, unmatched, int((~first).sum()))
+
+
+def report_unmatched(result: JoinResult, limit: int = 10) -> None:
+    """Print one summary line (and a few examples) instead of one line per file."""
+    total = len(result.frame)
+    matched = total - len(result.unmatched)
+    print(f"🔗 Matched {matched} of {total} embeddings to predictions")
+    if result.duplicates:
+        print(f"⚠️ Ignored {result.duplicates} duplicate prediction rows")
+    if result.unmatched:
+        shown = ", ".join(result.unmatched[:limit])
+        more = f" (+{len(result.unmatched) - limit} more)" if len(result.unmatched) > limit else ""
+        print(f"❌ No prediction for {len(result.unmatched)} embeddings: {shown}{more}")
+
+
+def load_joined(embeddings_path: str, predictions_csv: str,
+                missing_label: str = MISSING_LABEL) -> tuple[EmbeddingStore, JoinResult]:
+    """Load embeddings (store or JSON folder) and join ``predictions_csv`` onto them."""
+    store = load_embeddings(embeddings_path)
+    predictions = read_predictions(predictions_csv)
+    result = join_predictions(store.filenames, predictions, missing_label)
+    report_unmatched(result)
+    return store, result
+
+
+def pdf_link(folder: str, filename: str) -> str:
+    return os.path.join(folder, filename).replace("\\", "/")
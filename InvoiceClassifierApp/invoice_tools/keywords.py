@@ -0,0 +1,203 @@
+"""Keyword pre-classifier built from the ``*motherwords.txt`` vocabularies.
+
+``TrainData/<label>/<label>motherwords.txt`` lists phrases typical of a
+label ("Hourly Labor Rate", "Parts Used", "CPT Code", ...). As ordinary
+training documents they only pull a single embedding towards the label,
+while an invoice that plainly contains several of them still costs an
+embedding request and a KNN scan.
+
+``KeywordMatcher`` compiles every label's phrases into one Aho-Corasick
+automaton and scans an invoice's text in a single pass, whatever the number
+of phrases. Text and phrases are compared case-insensitively on whole
+words, with punctuation treated as a space ("Co-pay" matches "co pay");
+alternatives written as ``Medicare / Medicaid`` count as one phrase.
+
+A label is decided without embedding when it matched at least ``min_hits``
+distinct phrases and ``margin`` more than any other label; everything else
+falls through to the embedding path. ``eval`` reports how many documents of
+an extracted corpus would be decided this way and how often that agrees
+with their training label::
+
+    python -m invoice_tools.keywords TrainData --corpus corpus.jsonl.gz
+    python -m invoice_tools.watch Invoices --train train.store --keywords TrainData
+"""
+
+import argparse
+import os
+import re
+import time
+from collections import deque
+from typing import NamedTuple
+
+from .knn import Prediction
+
+VOCABULARY_SUFFIX = "motherwords.txt"
+MIN_HITS = 3
+MARGIN = 2
+
+_NON_WORD = re.compile(r"[\W_]+")
+
+
+def normalize_text(text: str) -> str:
+    """Lower case, every run of punctuation and whitespace turned into one space."""
+    return _NON_WORD.sub(" ", text.lower()).strip()
+
+
+def load_vocabularies(train_root: str) -> dict[str, tuple[str, list[str]]]:
+    """``label -> (vocabulary file, phrases)`` for every ``TrainData/<label>/*motherwords.txt``."""
+    vocabularies = {}
+    for label in sorted(os.listdir(train_root)):
+        folder = os.path.join(train_root, label)
+        if not os.path.isdir(folder):
+            continue
+        for name in sorted(os.listdir(folder)):
+            if name.lower().endswith(VOCABULARY_SUFFIX):
+                with open(os.path.join(folder, name), "r", encoding="utf-8-sig") as f:
+                    phrases = [line.strip() for line in f if line.strip()]
+                source, known = vocabularies.get(label.lower(), (name, []))
+                vocabularies[label.lower()] = (source, known + phrases)
+    return vocabularies
+
+
+class KeywordMatch(NamedTuple):
+    label: str | None        # decided label, None to fall through to embeddings
+    confidence: float        # share of the matched phrases that belong to the best label
+    hits: dict[str, int]     # distinct phrases matched per label
+
+
+class KeywordMatcher:
+    def __init__(self, vocabularies: dict[str, tuple[str, list[str]]], min_hits: int = MIN_HITS,
+                 margin: int = MARGIN):
+        self.min_hits = min_hits
+        self.margin = margin
+        self.sources = {label: source for label, (source, _) in vocabularies.items()}
+        self.phrase_labels: list[str] = []   # label of every phrase id
+        self._goto: list[dict[str, int]] = [{}]
+        self._output: list[list[int]] = [[]]
+        for label, (_, phrases) in sorted(vocabularies.items()):
+            for phrase in phrases:
+                phrase_id = len(self.phrase_labels)
+                self.phrase_labels.append(label)
+                for alternative in phrase.split("/"):
+                    words = normalize_text(alternative)
+                    if words:
+                        # Padded with spaces so only whole words match.
+                        self._add(f" {words} ", phrase_id)
+        self._fail = self._link()
+
+    @classmethod
+    def from_train_dir(cls, train_root: str, **kwargs) -> "KeywordMatcher":
+        vocabularies = load_vocabularies(train_root)
+        if not vocabularies:
+            raise ValueError(f"no *{VOCABULARY_SUFFIX} files under {train_root}")
+        return cls(vocabularies, **kwargs)
+
+    def _add(self, pattern: str, phrase_id: int) -> None:
+        state = 0
+        for ch in pattern:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._output.append([])
+            state = nxt
+        if phrase_id not in self._output[state]:
+            self._output[state].append(phrase_id)
+
+    def _link(self) -> list[int]:
+        """Failure links, breadth first; every state also reports the matches of its suffixes."""
+        fail = [0] * len(self._goto)
+        queue = deque(self._goto[0].values())  # depth one: fail to the root
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                f = fail[state]
+                while f and ch not in self._goto[f]:
+                    f = fail[f]
+                fail[nxt] = self._goto[f].get(ch, 0)
+                self._output[nxt] += [p for p in self._output[fail[nxt]] if p not in self._output[nxt]]
+        return fail
+
+    def __len__(self) -> int:
+        return len(self.phrase_labels)
+
+    def scan(self, text: str) -> set[int]:
+        """Ids of the phrases occurring in ``text``."""
+        goto, fail, output = self._goto, self._fail, self._output
+        found: set[int] = set()
+        state = 0
+        for ch in f" {normalize_text(text)} ":
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if output[state]:
+                found.update(output[state])
+        return found
+
+    def match(self, text: str) -> KeywordMatch:
+        hits = dict.fromkeys(self.sources, 0)
+        for phrase_id in self.scan(text):
+            hits[self.phrase_labels[phrase_id]] += 1
+        ranked = sorted(hits.items(), key=lambda item: -item[1])
+        best, top = ranked[0] if ranked else (None, 0)
+        second = ranked[1][1] if len(ranked) > 1 else 0
+        confidence = top / (top + second) if top else 0.0
+        decided = top >= self.min_hits and top - second >= self.margin
+        return KeywordMatch(best if decided else None, confidence, hits)
+
+    def predict(self, text: str) -> Prediction | None:
+        """Prediction for a confident match; the label's vocabulary file stands in as top neighbour."""
+        match = self.match(text)
+        if match.label is None:
+            return None
+        return Prediction(match.label, match.confidence, self.sources[match.label])
+
+
+def main(argv: list[str] | None = None) -> None:
+    from .embed import chunk_text
+    from .extract import iter_corpus
+
+    parser = argparse.ArgumentParser(description="Evaluate the motherwords keyword pre-classifier on a corpus.")
+    parser.add_argument("train", help="TrainData folder with <label>/*motherwords.txt")
+    parser.add_argument("--corpus", required=True, help="Corpus written by invoice_tools.extract")
+    parser.add_argument("--min-hits", type=int, default=MIN_HITS)
+    parser.add_argument("--margin", type=int, default=MARGIN)
+    parser.add_argument("-v", "--verbose", action="store_true", help="Print every decided document")
+    args = parser.parse_args(argv)
+
+    matcher = KeywordMatcher.from_train_dir(args.train, min_hits=args.min_hits, margin=args.margin)
+    print(f"🔑 {len(matcher)} phrases for {len(matcher.sources)} labels: {', '.join(sorted(matcher.sources))}")
+
+    total = decided = labeled = correct = 0
+    saved_chunks = 0  # OpenAIEmbeddingService sends one request per chunk
+    scanned = 0
+    started = time.perf_counter()
+    for record in iter_corpus(args.corpus):
+        if record["filename"].lower().endswith(VOCABULARY_SUFFIX):
+            continue  # the vocabularies themselves
+        total += 1
+        scanned += len(record["text"])
+        match = matcher.match(record["text"])
+        if match.label is None:
+            continue
+        decided += 1
+        saved_chunks += len(chunk_text(record["text"]))
+        if record.get("label"):
+            labeled += 1
+            correct += match.label == record["label"]
+        if args.verbose:
+            print(f"[{record['filename']}] → {match.label} ({match.confidence:.2f}) hits {match.hits}"
+                  + (f" | labeled {record['label']}" if record.get("label") else ""))
+    elapsed = time.perf_counter() - started
+
+    print(f"✅ {decided} of {total} documents decided by keywords ({decided / max(1, total):.1%}), "
+          f"{saved_chunks} embedding requests ({decided} documents) saved; {total - decided} fall through")
+    if labeled:
+        print(f"🎯 {correct} of {labeled} labeled decisions match the training label ({correct / labeled:.1%})")
+    print(f"⏱️ Scanned {scanned / 1e6:.1f}M characters in {elapsed:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
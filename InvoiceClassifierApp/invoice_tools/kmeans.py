@@ -0,0 +1,96 @@
+"""Spherical k-means in plain numpy.
+
+Works on unit-length rows and assigns by cosine similarity, which is what
+every consumer in this package (IVF coarse quantizer, prototypes) needs.
+Assignment is blocked so memory stays bounded for large N; the mini-batch
+variant touches only a random sample per iteration, so its cost does not
+grow with N at all.
+"""
+
+import numpy as np
+
+ASSIGN_BLOCK = 4096
+
+
+def unit_rows(matrix: np.ndarray) -> np.ndarray:
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return matrix / norms
+
+
+def assign(vectors: np.ndarray, centroids: np.ndarray, block: int = ASSIGN_BLOCK) -> tuple[np.ndarray, np.ndarray]:
+    """Nearest centroid and its cosine similarity for every (unit) row."""
+    labels = np.empty(vectors.shape[0], dtype=np.int64)
+    scores = np.empty(vectors.shape[0], dtype=np.float32)
+    for start in range(0, vectors.shape[0], block):
+        sims = np.asarray(vectors[start:start + block], dtype=np.float32) @ centroids.T
+        labels[start:start + block] = sims.argmax(axis=1)
+        scores[start:start + block] = sims[np.arange(sims.shape[0]), labels[start:start + block]]
+    return labels, scores
+
+
+def spherical_kmeans(vectors: np.ndarray, n_clusters: int, iterations: int = 20, seed: int = 0,
+                     tol: float = 1e-4) -> np.ndarray:
+    """Fit ``n_clusters`` unit centroids to unit-length ``vectors`` (Lloyd's algorithm).
+
+    Empty clusters are re-seeded with the points that currently fit their
+    centroid worst.
+    """
+    n = vectors.shape[0]
+    if n == 0:
+        raise ValueError("cannot cluster an empty matrix")
+    n_clusters = min(n_clusters, n)
+    rng = np.random.default_rng(seed)
+    centroids = np.asarray(vectors[np.sort(rng.choice(n, n_clusters, replace=False))], dtype=np.float32)
+
+    previous = -np.inf
+    for _ in range(iterations):
+        labels, scores = assign(vectors, centroids)
+        sums = np.zeros_like(centroids)
+        for start in range(0, n, ASSIGN_BLOCK):
+            np.add.at(sums, labels[start:start + ASSIGN_BLOCK], np.asarray(vectors[start:start + ASSIGN_BLOCK], dtype=np.float32))
+        counts = np.bincount(labels, minlength=n_clusters)
+
+        empty = np.nonzero(counts == 0)[0]
+        if len(empty):
+            worst = np.argsort(scores)[: len(empty)]
+            sums[empty] = np.asarray(vectors[worst], dtype=np.float32)
+        centroids = unit_rows(sums)
+
+        objective = float(scores.mean())
+        if objective - previous < tol:
+            break
+        previous = objective
+    return centroids
+
+
+def minibatch_spherical_kmeans(vectors: np.ndarray, n_clusters: int, batch_size: int = 1024,
+                               iterations: int = 100, seed: int = 0) -> np.ndarray:
+    """Fit ``n_clusters`` unit centroids from random mini-batches of unit-length ``vectors``.
+
+    Every centroid moves towards the mean of its batch members with a step
+    of (members in this batch) / (members seen so far), as in Sculley's
+    web-scale k-means. Small inputs are clustered with full-batch Lloyd.
+    """
+    n = vectors.shape[0]
+    if n <= batch_size:
+        return spherical_kmeans(vectors, n_clusters, seed=seed)
+    n_clusters = min(n_clusters, n)
+    rng = np.random.default_rng(seed)
+    centroids = np.asarray(vectors[np.sort(rng.choice(n, n_clusters, replace=False))], dtype=np.float32)
+    seen = np.zeros(n_clusters, dtype=np.int64)
+    for _ in range(iterations):
+        batch = np.asarray(vectors[np.sort(rng.choice(n, batch_size, replace=False))], dtype=np.float32)
+        labels, _ = assign(batch, centroids)
+        # Per-centroid sums as one product with the batch's one-hot assignment (much faster than add.at).
+        onehot = np.zeros((batch_size, n_clusters), dtype=np.float32)
+        onehot[np.arange(batch_size), labels] = 1
+        sums = onehot.T @ batch
+        members = np.bincount(labels, minlength=n_clusters)
+        hit = members > 0
+        seen[hit] += members[hit]
+        step = (members[hit] / seen[hit])[:, None].astype(np.float32)
+        centroids[hit] = (1 - step) * centroids[hit] + step * sums[hit] / members[hit, None]
+        centroids = unit_rows(centroids)
+    return centroids
@@ -0,0 +1,288 @@
+"""Vectorized batch KNN classifier.
+
+Follows the voting rules of ``KnnClassifier.PredictLabelWithTopNeighbor``:
+the ``k`` most cosine-similar training documents vote, the label with the
+most votes wins, ties go to the label with the higher summed similarity and
+remaining ties to the label seen first in similarity order. The returned
+score and top neighbor are those of the single most similar document.
+
+Unlike the C# version, the training matrix is normalized once in ``fit``
+and a whole batch of invoices is scored with one matrix multiply, keeping
+only the top ``k`` per row with ``argpartition`` (ties at the cut are
+settled by a stable sort, as in LINQ).
+
+Classify an invoice store against a training store with::
+
+    python -m invoice_tools.knn --train train.store --invoices invoices.store \
+        -o output/predictions.csv
+"""
+
+import argparse
+import time
+from typing import NamedTuple
+
+import numpy as np
+
+from .predictions import normalize_filename, write_predictions_csv
+from .store import EmbeddingStore
+
+# Upper bound on the scores matrix held in memory for one batch.
+MAX_SCORE_BYTES = 256 * 1024 * 1024
+
+
+class Prediction(NamedTuple):
+    label: str
+    score: float
+    top_neighbor: str
+
+
+UNKNOWN = Prediction("unknown", 0.0, "none")
+
+
+def normalize_rows(vectors: np.ndarray, dtype=np.float32) -> np.ndarray:
+    """Return unit-length copies of the rows; zero rows stay zero."""
+    matrix = np.asarray(vectors, dtype=dtype)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return matrix / norms
+
+
+def top_positions(scores: np.ndarray, k: int, keys: np.ndarray | None = None) -> np.ndarray:
+    """Column positions of the ``k`` best scores per row, best first.
+
+    Equal scores go to the smaller ``keys`` entry (default: the column), like
+    LINQ's stable ``OrderByDescending`` - also when the tie straddles the
+    ``k``-th place. ``argpartition`` picks among such ties arbitrarily, so
+    the rows where it had to choose are redone with a stable sort.
+    """
+    n = scores.shape[1]
+    k = min(k, n)
+    if keys is None:
+        keys = np.broadcast_to(np.arange(n), scores.shape)
+    if k < n:
+        partitioned = np.argpartition(-scores, k - 1, axis=1)
+        candidates = partitioned[:, :k].copy()
+        kth = np.take_along_axis(scores, partitioned[:, k - 1:k], axis=1)
+        kept_ties = (np.take_along_axis(scores, candidates, axis=1) == kth).sum(axis=1)
+        rows = np.nonzero((scores == kth).sum(axis=1) > kept_ties)[0]
+        if len(rows):
+            candidates[rows] = np.lexsort((keys[rows], -scores[rows]), axis=1)[:, :k]
+    else:
+        candidates = np.broadcast_to(np.arange(n), scores.shape)
+    order = np.lexsort((np.take_along_axis(keys, candidates, axis=1),
+                        -np.take_along_axis(scores, candidates, axis=1)), axis=1)
+    return np.take_along_axis(candidates, order, axis=1)
+
+
+def top_k(scores: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+    """Indices and scores of the ``k`` best columns per row, best first; equal scores keep column order."""
+    indices = top_positions(scores, k)
+    return indices, np.take_along_axis(scores, indices, axis=1)
+
+
+def vote_majority(codes: np.ndarray, scores: np.ndarray, n_labels: int) -> np.ndarray:
+    """Winning label code per row: most votes, then highest summed score.
+
+    ``codes`` and ``scores`` are the neighbors' label codes and similarities
+    in similarity order. Remaining ties go to the label seen first.
+    Neighbors with a negative code (padding) don't vote.
+    """
+    rows = np.arange(codes.shape[0])
+    k = codes.shape[1]
+    counts = np.zeros((codes.shape[0], n_labels), dtype=np.int32)
+    totals = np.zeros((codes.shape[0], n_labels), dtype=np.float64)
+    first = np.full((codes.shape[0], n_labels), k, dtype=np.int32)
+    for j in range(k):
+        valid = codes[:, j] >= 0
+        r, col = rows[valid], codes[valid, j]
+        counts[r, col] += 1
+        totals[r, col] += scores[valid, j]
+        first[r, col] = np.minimum(first[r, col], j)
+
+    best = counts == counts.max(axis=1, keepdims=True)
+    totals = np.where(best, totals, -np.inf)
+    best &= totals == totals.max(axis=1, keepdims=True)
+    return np.where(best, first, k + 1).argmin(axis=1)
+
+
+def vote_weighted(codes: np.ndarray, scores: np.ndarray, n_labels: int) -> np.ndarray:
+    """Winning label code per row: highest summed similarity.
+
+    Same inputs as ``vote_majority``; remaining ties go to the label seen first.
+    """
+    rows = np.arange(codes.shape[0])
+    k = codes.shape[1]
+    totals = np.zeros((codes.shape[0], n_labels), dtype=np.float64)
+    first = np.full((codes.shape[0], n_labels), k, dtype=np.int32)
+    for j in range(k):
+        valid = codes[:, j] >= 0
+        r, col = rows[valid], codes[valid, j]
+        totals[r, col] += scores[valid, j]
+        first[r, col] = np.minimum(first[r, col], j)
+
+    seen = first < k
+    totals = np.where(seen, totals, -np.inf)
+    best = seen & (totals == totals.max(axis=1, keepdims=True))
+    return np.where(best, first, k + 1).argmin(axis=1)
+
+
+class KnnClassifier:
+    """Cosine KNN over an in-memory training matrix.
+
+    With an ``index`` (anything with ``search(queries, k)`` returning
+    training row indices and exact similarities, such as
+    ``ann.IVFIndex`` or ``quantize.QuantizedIndex``) neighbours come from the index instead of a
+    brute-force scan and the training matrix is not copied into memory.
+    """
+
+    def __init__(self, k: int = 3, dtype=np.float32, index=None):
+        self.k = k
+        self.dtype = np.dtype(dtype)
+        self.index = index
+        self.matrix = np.empty((0, 0), dtype=self.dtype)
+        self.dim = 0
+        self.classes = np.empty(0, dtype=object)
+        self.codes = np.empty(0, dtype=np.int32)
+        self.filenames: list[str] = []
+
+    def fit(self, vectors: np.ndarray | None, labels: list[str], filenames: list[str]) -> "KnnClassifier":
+        if len(labels) != len(filenames) or (vectors is not None and len(vectors) != len(labels)):
+            raise ValueError("vectors, labels and filenames must have the same length")
+        if self.index is not None:
+            if len(self.index) != len(labels):
+                raise ValueError(f"index holds {len(self.index)} vectors, got {len(labels)} labels")
+            self.dim = self.index.dim
+        elif len(labels):
+            self.matrix = normalize_rows(vectors, self.dtype)
+            self.dim = self.matrix.shape[1]
+        self.classes, self.codes = np.unique(np.asarray(labels, dtype=object), return_inverse=True)
+        self.filenames = list(filenames)
+        return self
+
+    @classmethod
+    def from_arrays(cls, matrix: np.ndarray, classes: np.ndarray, codes: np.ndarray, filenames,
+                    k: int = 3) -> "KnnClassifier":
+        """Wrap an already normalized training matrix without copying it.
+
+        ``matrix`` and ``codes`` may be memory-mapped (see ``snapshot``) and
+        ``filenames`` can be any sequence.
+        """
+        classifier = cls(k, matrix.dtype)
+        classifier.matrix = matrix
+        classifier.dim = matrix.shape[1]
+        classifier.classes = classes
+        classifier.codes = codes
+        classifier.filenames = filenames
+        return classifier
+
+    @classmethod
+    def from_store(cls, store: EmbeddingStore, k: int = 3, dtype=np.float32, index=None) -> "KnnClassifier":
+        """Fit on the labeled rows of ``store`` (the rows an index is built over)."""
+        rows = [i for i, label in enumerate(store.labels) if label is not None]
+        if index is not None:
+            vectors = None
+        else:
+            vectors = store.vectors[rows] if len(rows) != len(store) else store.vectors
+        return cls(k, dtype, index=index).fit(
+            vectors,
+            [store.labels[i] for i in rows],
+            [store.filenames[i] for i in rows],
+        )
+
+    def _batch_rows(self) -> int:
+        return max(1, MAX_SCORE_BYTES // (self.dtype.itemsize * max(1, self.matrix.shape[0])))
+
+    def kneighbors(self, queries: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Row indices and cosine similarities of the ``k`` nearest training documents."""
+        if self.index is not None:
+            return self.index.search(np.atleast_2d(queries), self.k)
+        queries = normalize_rows(np.atleast_2d(queries), self.dtype)
+        indices, scores = [], []
+        step = self._batch_rows()
+        for start in range(0, queries.shape[0], step):
+            block = queries[start:start + step] @ self.matrix.T
+            idx, sims = top_k(block, self.k)
+            indices.append(idx)
+            scores.append(sims)
+        return np.concatenate(indices), np.concatenate(scores)
+
+    def predict_batch(self, queries: np.ndarray) -> list[Prediction]:
+        queries = np.atleast_2d(queries)
+        if not self.filenames or queries.shape[1] != self.dim:
+            return [UNKNOWN] * queries.shape[0]
+
+        indices, scores = self.kneighbors(queries)
+        codes = np.where(indices >= 0, self.codes[indices], -1)
+        winners = vote_majority(codes, scores, len(self.classes))
+        return [
+            Prediction(self.classes[w], float(s[0]), self.filenames[i[0]]) if i[0] >= 0 else UNKNOWN
+            for w, s, i in zip(winners, scores, indices)
+        ]
+
+    def predict(self, query: np.ndarray) -> Prediction:
+        return self.predict_batch(np.atleast_2d(query))[0]
+
+
+def classify_store(classifier, invoices: EmbeddingStore, out_csv: str) -> list[Prediction]:
+    """Classify every row of ``invoices`` and write ``predictions.csv``.
+
+    ``classifier`` is a ``KnnClassifier`` or anything else with ``predict_batch``
+    (``prototypes.PrototypeClassifier``).
+    """
+    start = time.perf_counter()
+    predictions = classifier.predict_batch(invoices.vectors)
+    elapsed = time.perf_counter() - start
+
+    rows = (
+        (normalize_filename(name), p.label, p.score, p.top_neighbor)
+        for name, p in zip(invoices.filenames, predictions)
+    )
+    write_predictions_csv(out_csv, rows)
+
+    rate = len(predictions) / elapsed if elapsed > 0 else float("inf")
+    print(f"✅ Classified {len(predictions)} invoices in {elapsed:.3f}s ({rate:,.0f} invoices/s)")
+    print(f"📄 Predictions saved to: {out_csv}")
+    return predictions
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Batch KNN classification of an invoice embedding store.")
+    parser.add_argument("--train", required=True, help="Store with labeled training embeddings")
+    parser.add_argument("--invoices", required=True, help="Store with invoice embeddings to classify")
+    parser.add_argument("-k", type=int, default=3, help="Number of neighbors (default: 3, as in Program.cs)")
+    parser.add_argument("-o", "--out", default="predictions.csv", help="Output predictions.csv path")
+    parser.add_argument("--float64", action="store_true", help="Score in double precision like the C# classifier")
+    parser.add_argument("--ivf", action="store_true", help="Use the store's IVF index (python -m invoice_tools.ann build)")
+    parser.add_argument("--nprobe", type=int, help="Inverted lists probed per invoice (default: the index's)")
+    parser.add_argument("--quantized", choices=("int8", "float16"),
+                        help="Scan the store's quantized codes (python -m invoice_tools.quantize build)")
+    parser.add_argument("--prototypes", type=int, metavar="M",
+                        help="Score against M prototypes per label (python -m invoice_tools.prototypes build)")
+    args = parser.parse_args(argv)
+
+    train = EmbeddingStore.open(args.train)
+    if args.prototypes:
+        from .prototypes import PrototypeClassifier, prototypes_path
+
+        classify_store(PrototypeClassifier.load(prototypes_path(train, args.prototypes)),
+                       EmbeddingStore.open(args.invoices), args.out)
+        return
+    index = None
+    if args.ivf:
+        from .ann import IVFIndex, index_path
+
+        index = IVFIndex.load(index_path(train), train.vectors, train.generation)
+        if args.nprobe:
+            index.nprobe = args.nprobe
+    elif args.quantized:
+        from .quantize import QuantizedIndex, quantized_path
+
+        index = QuantizedIndex.load(quantized_path(train, args.quantized), train.vectors, train.generation)
+    classifier = KnnClassifier.from_store(
+        train, k=args.k, dtype=np.float64 if args.float64 else np.float32, index=index
+    )
+    classify_store(classifier, EmbeddingStore.open(args.invoices), args.out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""Embedding plots behind ``python -m invoice_tools plot``.
+
+``PCA2DPlot.py``, ``plot_embeddings_local.py`` and ``plot_all_embeddings.py``
+drew the same 2-D PCA, ``3dplot.py`` a 3-D one, ``plot_umap.py`` a UMAP
+projection and ``PlotLatest.py`` k-means clusters on the PCA plane - each
+importing pandas, scikit-learn, plotly and umap at the top whether the run
+needed them or not. Here every plot imports what it uses when it is drawn.
+
+All plots join the embeddings to ``predictions.csv`` with ``join``, project
+through the cached ``ProjectionCache`` models and color points by label;
+clicking a point opens its PDF. Above ``WEBGL_THRESHOLD`` points they are
+written with ``webplot.write_scatter_html`` instead of plotly express::
+
+    python -m invoice_tools plot pca -o embedding_plot.html --open
+    python -m invoice_tools plot kmeans --pairs similarity.pairs
+"""
+
+from typing import TYPE_CHECKING, NamedTuple
+
+import numpy as np
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+WEBGL_THRESHOLD = 20000  # above this many points, write WebGL plots with lazily loaded hover data
+HOVER_COLUMNS = ["filename", "label", "SimilarityScore", "TopNeighbor"]
+CLICK_SCRIPT = """
+document.getElementById('{div_id}').on('plotly_click', function(data) {{
+    const pdf = data.points[0].customdata[1];
+    if (pdf) {{
+        window.open(pdf, '_blank');
+    }}
+}});
+"""
+
+
+class PlotData(NamedTuple):
+    frame: "pd.DataFrame"   # filename, label, pdf_link and the other prediction columns
+    vectors: np.ndarray
+
+
+def load_plot_data(embeddings: str, predictions_csv: str, invoices_dir: str, matched_only: bool = False) -> PlotData:
+    """Embeddings joined to their predictions; unmatched ones are kept as ``unlabeled`` unless ``matched_only``."""
+    from .join import load_joined, pdf_link
+
+    store, joined = load_joined(embeddings, predictions_csv)
+    frame, vectors = joined.frame, store.vectors
+    if matched_only:
+        matched = frame["matched"].to_numpy()
+        frame, vectors = frame.loc[matched].reset_index(drop=True), vectors[matched]
+    frame = frame.copy()
+    frame["pdf_link"] = [pdf_link(invoices_dir, name) for name in frame["filename"]]
+    return PlotData(frame, np.asarray(vectors, dtype=np.float32))
+
+
+def _hover_columns(frame, extra: tuple[str, ...] = ()) -> list[str]:
+    return [c for c in HOVER_COLUMNS + list(extra) if c in frame.columns]
+
+
+def write_plot(path: str, frame, points: np.ndarray, color: str, title: str, axis_titles: tuple[str, ...],
+               extra_hover: tuple[str, ...] = ()) -> None:
+    """Scatter of 2-D or 3-D ``points`` colored by ``frame[color]``; a click opens ``pdf_link``."""
+    hover = _hover_columns(frame, extra_hover)
+    if len(frame) > WEBGL_THRESHOLD:
+        from .webplot import write_scatter_html
+
+        detail = {c: frame[c].tolist() for c in hover + ["pdf_link"]}
+        write_scatter_html(path, points, frame[color], detail, title=f"{title} ({len(frame)} documents)",
+                           axis_titles=axis_titles, link_column="pdf_link")
+        return
+
+    import plotly.express as px
+
+    frame = frame.assign(**{axis: points[:, i] for i, axis in enumerate("xyz"[:points.shape[1]])})
+    frame[color] = frame[color].astype(str)
+    common = dict(color=color, hover_name="filename", hover_data=hover, custom_data=["filename", "pdf_link"],
+                  title=title)
+    if points.shape[1] == 3:
+        fig = px.scatter_3d(frame, x="x", y="y", z="z", opacity=0.85, **common)
+        fig.update_layout(scene=dict(xaxis_title=axis_titles[0], yaxis_title=axis_titles[1],
+                                     zaxis_title=axis_titles[2]))
+    else:
+        fig = px.scatter(frame, x="x", y="y", **common)
+        fig.update_layout(xaxis_title=axis_titles[0], yaxis_title=axis_titles[1])
+    fig.update_traces(marker=dict(line=dict(width=1, color="DarkSlateGrey")))
+    fig.update_layout(margin=dict(l=0, r=0, b=0, t=40))
+    div_id = "plotly-div"
+    fig.write_html(path, include_plotlyjs="cdn", full_html=True, config={"responsive": True}, div_id=div_id,
+                   post_script=CLICK_SCRIPT.format(div_id=div_id))
+
+
+def project(data: PlotData, method: str, n_components: int, cache_dir: str, **params) -> np.ndarray:
+    from .projection import ProjectionCache
+
+    return ProjectionCache(cache_dir).fit_transform(method, data.vectors, data.frame["filename"].tolist(),
+                                                    n_components=n_components, **params)
+
+
+def plot_pca(data: PlotData, out: str, cache_dir: str) -> None:
+    points = project(data, "pca", 2, cache_dir)
+    write_plot(out, data.frame, points, "label", "📄 PCA of Invoice Embeddings by Label", ("PCA 1", "PCA 2"))
+
+
+def plot_3d(data: PlotData, out: str, cache_dir: str, out_2d: str | None = None,
+            matched_csv: str | None = None) -> None:
+    """3-D PCA plot; ``out_2d`` adds the plane of the first two components, ``matched_csv`` the coordinates."""
+    points = project(data, "pca", 3, cache_dir)
+    write_plot(out, data.frame, points, "label", "📊 3D Visualization of Invoice Embeddings",
+               ("PCA 1", "PCA 2", "PCA 3"))
+    if out_2d:
+        write_plot(out_2d, data.frame, points[:, :2], "label", "📊 2D Visualization of Invoice Embeddings (PCA)",
+                   ("PCA 1", "PCA 2"))
+        print(f"✅ 2D plot saved to: {out_2d}")
+    if matched_csv:
+        write_matched_csv(matched_csv, data.frame, points)
+
+
+def write_matched_csv(path: str, frame, points: np.ndarray) -> int:
+    """Predictions that matched an embedding, with the plot coordinates of each."""
+    matched = frame["matched"].to_numpy()
+    columns = {"filename": "Filename", "label": "PredictedLabel", "SimilarityScore": "SimilarityScore",
+               "TopNeighbor": "TopNeighbor"}
+    out = frame.loc[matched, [c for c in columns if c in frame.columns]].rename(columns=columns)
+    for i, axis in enumerate("xyz"[:points.shape[1]]):
+        out[axis] = points[matched, i]
+    out.to_csv(path, index=False)
+    print(f"📄 Matched data saved to: {path}")
+    return len(out)
+
+
+def report_misclassified(data: PlotData, k: int = 3) -> None:
+    """Print documents whose leave-one-out ``k``-NN prediction in the full embedding space disagrees."""
+    from .audit import leave_one_out, suspicious
+
+    loo = leave_one_out(data.vectors, data.frame["label"].tolist(), data.frame["filename"].tolist(), k=k)
+    print("\n🔍 Possible misclassified documents:")
+    for idx in suspicious(loo, top=len(data.frame)):
+        c = loo.conflict[idx]
+        print(f"- {loo.filenames[idx]} (label: {loo.classes[loo.codes[idx]]}, "
+              f"predicted: {loo.classes[loo.predicted[idx]]}) is near: "
+              f"{loo.filenames[c]} ({loo.classes[loo.codes[c]]}, {loo.conflict_score[idx]:.3f})")
+
+
+def plot_umap(data: PlotData, out: str, cache_dir: str, n_neighbors: int = 10, min_dist: float = 0.1) -> None:
+    points = project(data, "umap", 2, cache_dir, n_neighbors=n_neighbors, min_dist=min_dist)
+    report_misclassified(data)
+    write_plot(out, data.frame, points, "label", "📄 UMAP Visualization by Label (Click to Open PDF)",
+               ("UMAP 1", "UMAP 2"))
+
+
+def nearest_documents(pairs_path: str) -> dict[str, str]:
+    """``FileA -> "FileB (score)"`` for the most similar pair of every document in a pair file."""
+    from .similarity import iter_pairs
+
+    best_score, nearest = {}, {}
+    for chunk in iter_pairs(pairs_path):
+        top = chunk.sort_values("SimilarityScore", ascending=False).drop_duplicates("FileA")
+        for file_a, file_b, score in zip(top["FileA"], top["FileB"], top["SimilarityScore"]):
+            if score > best_score.get(file_a, -1.0):
+                best_score[file_a] = score
+                nearest[file_a] = f"{file_b} ({score:.4f})"
+    return nearest
+
+
+def plot_kmeans(data: PlotData, out: str, cache_dir: str, clusters: int | None = None,
+                pairs: str | None = None) -> None:
+    """K-means on the PCA plane, one cluster per predicted label unless ``clusters`` is given."""
+    from sklearn.cluster import KMeans
+
+    points = project(data, "pca", 2, cache_dir)
+    frame = data.frame
+    n_clusters = clusters or frame["label"].nunique()
+    frame = frame.assign(Cluster=KMeans(n_clusters=n_clusters, random_state=42).fit_predict(points))
+    extra = ("Cluster",)
+    if pairs:
+        nearest = nearest_documents(pairs)
+        frame["NearestDocument"] = frame["name"].map(nearest).fillna(frame["filename"].map(nearest)).fillna("n/a")
+        extra += ("NearestDocument",)
+    write_plot(out, frame, points, "Cluster", "KMeans Clustering on Document Embeddings (PCA 2D)",
+               ("PCA 1", "PCA 2"), extra)
+
+
+PLOTS = {"pca": plot_pca, "umap": plot_umap, "3d": plot_3d, "kmeans": plot_kmeans}
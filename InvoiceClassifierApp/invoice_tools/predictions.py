@@ -0,0 +1,147 @@
+"""Helpers for ``predictions.csv``.
+
+The file layout matches what ``Program.cs`` writes: a
+``Filename,PredictedLabel,SimilarityScore,TopNeighbor`` header, quoted text
+columns and the score formatted with four decimals in invariant culture.
+"""
+
+import csv
+import os
+from collections.abc import Iterable
+
+COLUMNS = ["Filename", "PredictedLabel", "SimilarityScore", "TopNeighbor"]
+
+
+def normalize_filename(filename: str) -> str:
+    """Apply the same normalization ``Program.cs`` does before classifying."""
+    return filename.replace(" ", "_")
+
+
+def format_row(filename: str, label: str, score: float, top_neighbor: str) -> str:
+    return f'"{filename}","{label}",{score:.4f},"{top_neighbor}"'
+
+
+def write_predictions_csv(path: str, rows: Iterable[tuple[str, str, float, str]]) -> int:
+    """Write ``(filename, label, score, top_neighbor)`` rows like ``Program.cs``.
+
+    Lines end with the platform newline, as ``StringBuilder.AppendLine`` does.
+    Returns the number of rows written.
+    """
+    count = 0
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        f.write(",".join(COLUMNS) + os.linesep)
+        for filename, label, score, top_neighbor in rows:
+            f.write(format_row(filename, label, score, top_neighbor) + os.linesep)
+            count += 1
+    return count
+
+
+# Rows read per chunk by ``iter_predictions``.
+CHUNK_ROWS = 200_000
+CACHE_VERSION = 1
+
+
+def _split_decimal_rows(chunk, columns: list[str]):
+    """Repair rows written with a comma decimal separator.
+
+    A ``.NET`` run under a German culture writes the score as ``0,9139``
+    unquoted, so those rows have one field more than the header: the score
+    is split over ``columns[2]`` and ``columns[3]`` and every later column
+    is shifted right into the spare ``_extra`` field.
+    """
+    import pandas as pd
+
+    values = chunk.to_numpy(dtype=object)
+    comma = chunk["_extra"].notna().to_numpy()
+    scores = values[:, 2].copy()
+    if comma.any():
+        scores[comma] = [f"{whole}.{frac}" for whole, frac in zip(values[comma, 2], values[comma, 3])]
+        values[comma, 3:-1] = values[comma, 4:]
+    frame = pd.DataFrame(values[:, :-1], columns=columns)
+    frame["SimilarityScore"] = pd.to_numeric(pd.Series(scores).str.strip(), errors="coerce").astype("float32")
+    return frame, int(comma.sum())
+
+
+def iter_predictions(path: str, chunk_rows: int = CHUNK_ROWS, start: int = 0):
+    """Stream ``predictions.csv`` as typed DataFrame chunks.
+
+    Every chunk has ``Filename``, ``PredictedLabel``, ``SimilarityScore``
+    (float32, NaN where unparsable) and ``TopNeighbor`` first, followed by
+    any extra header columns as strings. Files are parsed with pandas' C
+    parser; rows with a comma decimal score are detected and fixed one by
+    one, so a file mixing both layouts is read correctly.
+
+    A non-zero ``start`` (a byte offset at the beginning of a row) reads
+    only the rows from there on, e.g. those appended since an earlier read.
+    """
+    import pandas as pd
+
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        header = next(csv.reader(f), [])
+    if not header:
+        return
+    columns = [c.strip() for c in header]
+    if columns[:2] != COLUMNS[:2]:
+        raise ValueError(f"{path} does not look like predictions.csv: header {columns}")
+    columns += COLUMNS[len(columns):]
+
+    if start and os.path.getsize(path) <= start:
+        return
+    repaired = 0
+    with open(path, "rb") as f:
+        f.seek(start)
+        reader = pd.read_csv(
+            f, engine="c", encoding="utf-8-sig", header=None, skiprows=0 if start else 1,
+            names=columns + ["_extra"], dtype=str, keep_default_na=False, na_values={"_extra": [""]},
+            chunksize=chunk_rows, skipinitialspace=True,
+        )
+        for chunk in reader:
+            frame, fixed = _split_decimal_rows(chunk, columns)
+            repaired += fixed
+            for column in ("Filename", "PredictedLabel", "TopNeighbor"):
+                frame[column] = frame[column].str.strip()
+            yield frame
+    if repaired:
+        print(f"🔧 Repaired {repaired} comma-decimal scores in {path}")
+
+
+def _cache_path(path: str, cache_dir: str) -> str:
+    import hashlib
+
+    stat = os.stat(path)
+    key = f"{CACHE_VERSION}:{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}"
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(cache_dir, f"{stem}-{hashlib.sha1(key.encode()).hexdigest()[:16]}.parquet")
+
+
+def read_predictions(path: str, cache_dir: str | None = None, chunk_rows: int = CHUNK_ROWS):
+    """Read the whole of ``predictions.csv`` into one typed DataFrame.
+
+    With ``cache_dir`` (and pyarrow installed) the parsed frame is stored
+    as Parquet keyed by the CSV's path, size and modification time, so
+    later reads of an unchanged file skip CSV parsing entirely.
+    """
+    import pandas as pd
+
+    cached = None
+    if cache_dir:
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            cache_dir = None
+        else:
+            cached = _cache_path(path, cache_dir)
+            if os.path.isfile(cached):
+                return pd.read_parquet(cached)
+
+    chunks = list(iter_predictions(path, chunk_rows))
+    frame = pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame(
+        {c: pd.Series(dtype="float32" if c == "SimilarityScore" else object) for c in COLUMNS}
+    )
+
+    if cached:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp = cached + ".tmp"
+        frame.to_parquet(tmp, index=False)
+        os.replace(tmp, cached)
+    return frame
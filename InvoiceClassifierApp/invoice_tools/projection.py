@@ -0,0 +1,143 @@
+"""Persisted PCA/UMAP projections for the plotting scripts.
+
+Every plot used to refit ``PCA``/``umap.UMAP`` over the whole corpus on each
+run. ``ProjectionCache`` fits once, pickles the fitted model together with
+the set of rows it was fitted on and caches every projected coordinate:
+
+* a row is identified by a digest of its filename and vector bytes,
+* if every row the model was fitted on is still present and unchanged, the
+  model is reused and only rows without cached coordinates are transformed,
+* otherwise (rows changed or removed, or the corpus grew past
+  ``refit_growth``) the model is refitted and the coordinate cache reset.
+
+Large inputs are fitted with ``IncrementalPCA`` in batches so the full
+matrix never has to be copied into memory.
+"""
+
+import hashlib
+import json
+import os
+import pickle
+
+import numpy as np
+
+# Above this many matrix elements PCA is fitted incrementally.
+INCREMENTAL_PCA_ELEMENTS = 50_000_000
+BATCH_ROWS = 8192
+
+
+def row_digests(vectors: np.ndarray, names: list[str]) -> np.ndarray:
+    """16-byte digest of every (name, vector) pair."""
+    digests = np.empty(len(names), dtype="S16")
+    for start in range(0, len(names), BATCH_ROWS):
+        block = np.ascontiguousarray(vectors[start:start + BATCH_ROWS], dtype=np.float32)
+        for i, row in enumerate(block):
+            h = hashlib.blake2b(names[start + i].encode("utf-8"), digest_size=16)
+            h.update(row.tobytes())
+            digests[start + i] = h.digest()
+    return digests
+
+
+def fingerprint(digests: np.ndarray) -> str:
+    """Order-independent fingerprint of a set of rows."""
+    return hashlib.sha1(np.sort(digests).tobytes()).hexdigest()
+
+
+def _fit_pca(vectors: np.ndarray, n_components: int, seed: int):
+    from sklearn.decomposition import PCA, IncrementalPCA
+
+    if vectors.shape[0] * vectors.shape[1] <= INCREMENTAL_PCA_ELEMENTS:
+        return PCA(n_components=n_components, random_state=seed).fit(np.asarray(vectors, dtype=np.float32))
+
+    model = IncrementalPCA(n_components=n_components)
+    batch = max(BATCH_ROWS, 5 * n_components)
+    for start in range(0, vectors.shape[0], batch):
+        chunk = np.asarray(vectors[start:start + batch], dtype=np.float32)
+        if chunk.shape[0] >= n_components:
+            model.partial_fit(chunk)
+    return model
+
+
+def _fit_umap(vectors: np.ndarray, n_components: int, seed: int, n_neighbors: int = 10, min_dist: float = 0.1):
+    import umap
+
+    return umap.UMAP(n_components=n_components, n_neighbors=n_neighbors, min_dist=min_dist,
+                     random_state=seed).fit(np.asarray(vectors, dtype=np.float32))
+
+
+FITTERS = {"pca": _fit_pca, "umap": _fit_umap}
+
+
+class ProjectionCache:
+    def __init__(self, cache_dir: str, refit_growth: float = 1.0, seed: int = 42):
+        """``refit_growth``: refit once the corpus is this much larger than the fit set (1.0 = doubled)."""
+        self.cache_dir = cache_dir
+        self.refit_growth = refit_growth
+        self.seed = seed
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _paths(self, method: str, n_components: int, params: dict) -> tuple[str, str, str]:
+        key = f"{method}-{n_components}d"
+        if params:
+            key += "-" + hashlib.sha1(json.dumps(params, sort_keys=True).encode()).hexdigest()[:8]
+        base = os.path.join(self.cache_dir, key)
+        return base + ".model.pkl", base + ".meta.npz", base + ".coords.npz"
+
+    def fit_transform(self, method: str, vectors: np.ndarray, names: list[str], n_components: int = 2,
+                      **params) -> np.ndarray:
+        """Coordinates for every row, reusing the cached model and coordinates where possible."""
+        if method not in FITTERS:
+            raise ValueError(f"Unknown projection method {method!r}; expected one of {sorted(FITTERS)}")
+        model_path, meta_path, coords_path = self._paths(method, n_components, params)
+        digests = row_digests(vectors, names)
+
+        model = self._load_model(model_path, meta_path, digests)
+        if model is None:
+            print(f"🔄 Fitting {method.upper()} on {len(names)} documents...")
+            model = FITTERS[method](vectors, n_components, self.seed, **params)
+            with open(model_path + ".tmp", "wb") as f:
+                pickle.dump(model, f)
+            os.replace(model_path + ".tmp", model_path)
+            self._save_npz(meta_path, digests=digests, fingerprint=np.array(fingerprint(digests)))
+            cached = {}
+        else:
+            cached = self._load_coords(coords_path)
+
+        missing = np.array([i for i, d in enumerate(digests) if d not in cached], dtype=np.int64)
+        if len(missing):
+            for start in range(0, len(missing), BATCH_ROWS):
+                rows = missing[start:start + BATCH_ROWS]
+                projected = model.transform(np.asarray(vectors[rows], dtype=np.float32))
+                for row, coords in zip(rows, projected):
+                    cached[digests[row]] = coords
+            keys = np.array(list(cached.keys()), dtype="S16")
+            self._save_npz(coords_path, digests=keys, coords=np.array([cached[k] for k in keys], dtype=np.float32))
+        print(f"✅ {method.upper()}: reused {len(names) - len(missing)} cached coordinates, projected {len(missing)}")
+        return np.array([cached[d] for d in digests], dtype=np.float32).reshape(len(names), n_components)
+
+    def _load_model(self, model_path: str, meta_path: str, digests: np.ndarray):
+        if not (os.path.isfile(model_path) and os.path.isfile(meta_path)):
+            return None
+        with np.load(meta_path) as meta:
+            fitted = meta["digests"]
+        current = set(digests.tolist())
+        if not all(d in current for d in fitted.tolist()):
+            print("🔄 Training set changed since the projection was fitted")
+            return None
+        if len(digests) > len(fitted) * (1 + self.refit_growth):
+            print(f"🔄 Corpus grew from {len(fitted)} to {len(digests)} documents")
+            return None
+        with open(model_path, "rb") as f:
+            return pickle.load(f)
+
+    def _load_coords(self, coords_path: str) -> dict[bytes, np.ndarray]:
+        if not os.path.isfile(coords_path):
+            return {}
+        with np.load(coords_path) as data:
+            return dict(zip(data["digests"].tolist(), data["coords"]))
+
+    @staticmethod
+    def _save_npz(path: str, **arrays) -> None:
+        tmp = path + ".tmp.npz"
+        np.savez(tmp, **arrays)
+        os.replace(tmp, path)
@@ -0,0 +1,192 @@
+"""Per-label prototypes: the training set compressed to M centroids per label.
+
+``KnnClassifier`` keeps every training vector and scores each invoice
+against all N of them. ``PrototypeClassifier`` clusters every label's
+vectors with mini-batch spherical k-means in the full embedding space and
+keeps at most ``M`` unit centroids per label, each with its member count
+and the member closest to it. An invoice is then scored against labels x M
+prototypes instead of N documents: the ``k`` most similar prototypes vote
+with ``KnnClassifier``'s rules (1 by default: the nearest prototype wins).
+The score is the cosine similarity to that prototype and its closest
+member stands in as top neighbour. Labels with at most ``M`` documents
+keep them all, so for those nothing is approximated.
+
+Prototypes are saved next to the store (``prototypes_16.npz``)::
+
+    python -m invoice_tools.prototypes build train.store -m 16
+    python -m invoice_tools.prototypes eval train.store --queries invoices.store -m 16
+    python -m invoice_tools.knn --train train.store --invoices invoices.store --prototypes 16
+
+``eval`` without ``--queries`` holds out a share of the labeled training
+rows and reports the accuracy of both classifiers on them.
+"""
+
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+from .ann import labeled_rows
+from .kmeans import assign, minibatch_spherical_kmeans, unit_rows
+from .knn import UNKNOWN, KnnClassifier, Prediction, top_k, vote_majority
+from .store import EmbeddingStore
+
+DEFAULT_PER_LABEL = 16
+BATCH_SIZE = 1024
+ITERATIONS = 100
+
+
+class PrototypeClassifier:
+    def __init__(self, centroids: np.ndarray, codes: np.ndarray, counts: np.ndarray, classes: np.ndarray,
+                 representatives: list[str], k: int = 1):
+        self.centroids = centroids              # P x D unit prototypes
+        self.codes = codes                      # label code of every prototype
+        self.counts = counts                    # training documents behind every prototype
+        self.classes = classes
+        self.representatives = representatives  # member closest to every prototype
+        self.k = k
+
+    @property
+    def dim(self) -> int:
+        return self.centroids.shape[1]
+
+    def __len__(self) -> int:
+        return self.centroids.shape[0]
+
+    @classmethod
+    def fit(cls, vectors: np.ndarray, labels: list[str], filenames: list[str],
+            per_label: int = DEFAULT_PER_LABEL, k: int = 1, seed: int = 0) -> "PrototypeClassifier":
+        """Cluster each label's rows of ``vectors`` into at most ``per_label`` prototypes."""
+        classes, label_codes = np.unique(np.asarray(labels, dtype=object), return_inverse=True)
+        centroids, codes, counts, representatives = [], [], [], []
+        for code in range(len(classes)):
+            rows = np.nonzero(label_codes == code)[0]
+            members = unit_rows(vectors[rows])
+            if len(rows) <= per_label:
+                found = members
+            else:
+                found = minibatch_spherical_kmeans(members, per_label, BATCH_SIZE, ITERATIONS, seed)
+            assigned, sims = assign(members, found)
+            size = np.bincount(assigned, minlength=len(found))
+            for c in np.nonzero(size)[0]:
+                own = np.nonzero(assigned == c)[0]
+                centroids.append(found[c])
+                codes.append(code)
+                counts.append(size[c])
+                representatives.append(filenames[rows[own[np.argmax(sims[own])]]])
+        return cls(np.asarray(centroids, dtype=np.float32), np.asarray(codes, dtype=np.int32),
+                   np.asarray(counts, dtype=np.int64), classes, representatives, k)
+
+    @classmethod
+    def from_store(cls, store: EmbeddingStore, per_label: int = DEFAULT_PER_LABEL, k: int = 1,
+                   rows: np.ndarray | None = None) -> "PrototypeClassifier":
+        rows = labeled_rows(store) if rows is None else rows
+        return cls.fit(store.vectors[rows], [store.labels[i] for i in rows],
+                       [store.filenames[i] for i in rows], per_label, k)
+
+    def save(self, path: str) -> None:
+        tmp = path + ".tmp.npz"
+        np.savez(tmp, centroids=self.centroids, codes=self.codes, counts=self.counts,
+                 meta=np.array(json.dumps({"classes": [str(c) for c in self.classes],
+                                           "representatives": self.representatives})))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str, k: int = 1) -> "PrototypeClassifier":
+        with np.load(path) as data:
+            meta = json.loads(str(data["meta"]))
+            classes = np.empty(len(meta["classes"]), dtype=object)
+            classes[:] = meta["classes"]
+            return cls(data["centroids"], data["codes"], data["counts"], classes, meta["representatives"], k)
+
+    def predict_batch(self, queries: np.ndarray) -> list[Prediction]:
+        queries = np.atleast_2d(queries)
+        if len(self) == 0 or queries.shape[1] != self.dim:
+            return [UNKNOWN] * queries.shape[0]
+        indices, scores = top_k(unit_rows(queries) @ self.centroids.T, self.k)
+        winners = vote_majority(self.codes[indices], scores, len(self.classes))
+        return [Prediction(self.classes[w], float(s[0]), self.representatives[i[0]])
+                for w, s, i in zip(winners, scores, indices)]
+
+    def predict(self, query: np.ndarray) -> Prediction:
+        return self.predict_batch(np.atleast_2d(query))[0]
+
+
+def prototypes_path(store: EmbeddingStore, per_label: int) -> str:
+    return os.path.join(store.path, f"prototypes_{per_label}.npz")
+
+
+def _timed(classifier, queries: np.ndarray) -> tuple[list[Prediction], float]:
+    started = time.perf_counter()
+    predictions = classifier.predict_batch(queries)
+    return predictions, time.perf_counter() - started
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Compress a training store to per-label prototypes.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_build = sub.add_parser("build", help="Cluster every label of a store into prototypes")
+    p_build.add_argument("store")
+    p_build.add_argument("-m", "--per-label", type=int, default=DEFAULT_PER_LABEL,
+                         help=f"Prototypes per label (default: {DEFAULT_PER_LABEL})")
+
+    p_eval = sub.add_parser("eval", help="Accuracy and speed against full KNN")
+    p_eval.add_argument("store")
+    p_eval.add_argument("-m", "--per-label", type=int, default=DEFAULT_PER_LABEL)
+    p_eval.add_argument("--queries", help="Store of query embeddings (default: hold out training rows)")
+    p_eval.add_argument("--holdout", type=float, default=0.2, help="Share of labeled rows held out (default: 0.2)")
+    p_eval.add_argument("-k", type=int, default=3, help="Neighbours of the full KNN (default: 3)")
+    p_eval.add_argument("--vote", type=int, default=1, help="Prototypes that vote (default: 1)")
+    args = parser.parse_args(argv)
+
+    store = EmbeddingStore.open(args.store)
+    if args.command == "build":
+        started = time.perf_counter()
+        prototypes = PrototypeClassifier.from_store(store, args.per_label)
+        path = prototypes_path(store, args.per_label)
+        prototypes.save(path)
+        print(f"✅ {len(prototypes)} prototypes for {len(prototypes.classes)} labels from "
+              f"{int(prototypes.counts.sum())} documents in {time.perf_counter() - started:.2f}s")
+        print(f"📦 Saved to: {path}")
+        return
+
+    rows = labeled_rows(store)
+    if args.queries:
+        train_rows = rows
+        queries = EmbeddingStore.open(args.queries)
+        query_vectors, truth = queries.vectors, list(queries.labels)
+    else:
+        rng = np.random.default_rng(0)
+        shuffled = rng.permutation(rows)
+        cut = int(len(shuffled) * args.holdout)
+        held, train_rows = np.sort(shuffled[:cut]), np.sort(shuffled[cut:])
+        query_vectors, truth = store.vectors[held], [store.labels[i] for i in held]
+        print(f"🔍 Holding out {len(held)} of {len(rows)} labeled rows")
+
+    started = time.perf_counter()
+    prototypes = PrototypeClassifier.from_store(store, args.per_label, k=args.vote, rows=train_rows)
+    fit_time = time.perf_counter() - started
+    knn = KnnClassifier(args.k).fit(store.vectors[train_rows], [store.labels[i] for i in train_rows],
+                                    [store.filenames[i] for i in train_rows])
+
+    exact, exact_time = _timed(knn, query_vectors)
+    approx, approx_time = _timed(prototypes, query_vectors)
+    n = max(1, len(exact))
+    agree = sum(a.label == e.label for a, e in zip(approx, exact)) / n
+    print(f"{len(prototypes)} prototypes instead of {len(train_rows)} documents "
+          f"({len(train_rows) / max(1, len(prototypes)):.0f}x fewer), built in {fit_time:.2f}s")
+    print(f"full KNN {exact_time:.3f}s  prototypes {approx_time:.3f}s "
+          f"({exact_time / max(approx_time, 1e-9):.1f}x faster) on {len(exact)} queries")
+    labeled = [i for i, t in enumerate(truth) if t is not None]
+    if labeled:
+        knn_acc = sum(exact[i].label == truth[i] for i in labeled) / len(labeled)
+        proto_acc = sum(approx[i].label == truth[i] for i in labeled) / len(labeled)
+        print(f"accuracy on {len(labeled)} labeled queries: full KNN {knn_acc:.2%}  prototypes {proto_acc:.2%}")
+    print(f"✅ Prototypes agree with full KNN on {agree:.2%} of {len(exact)} queries")
+
+
+if __name__ == "__main__":
+    main()
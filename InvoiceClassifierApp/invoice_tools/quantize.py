@@ -0,0 +1,219 @@
+"""Quantized embedding codes with exact re-ranking.
+
+A brute-force cosine scan streams the whole float32 matrix for every batch
+of invoices. ``QuantizedIndex`` keeps a compact copy of the unit-length
+training vectors instead:
+
+* ``int8``    - each vector scaled by its own max-abs value to [-127, 127]
+  (4x smaller; the per-vector scale is applied to the scores),
+* ``float16`` - half precision (2x smaller).
+
+A query scores every code, keeps the best ``rerank * k`` candidates and
+re-ranks only those on the full-precision store rows, which stay
+memory-mapped and are paged in on demand. Similarities returned are exact,
+so KNN votes match the float32 path unless a true neighbour falls outside
+the candidate shortlist; ``eval`` reports how often that happens.
+
+The codes are saved next to the store (``quantized_int8/``) and are
+memory-mapped as well. Like ``ann``'s index they are tied to the store's
+``generation`` and have to be rebuilt after every write of the store::
+
+    python -m invoice_tools.quantize build train.store --kind int8
+    python -m invoice_tools.quantize eval train.store --queries invoices.store
+    python -m invoice_tools.knn --train train.store --invoices invoices.store --quantized int8
+"""
+
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+from .ann import _exact_order, _recall, check_source, labeled_rows
+from .kmeans import unit_rows
+from .store import EmbeddingStore
+
+KINDS = ("int8", "float16")
+CODES_FILE = "codes.npy"
+META_FILE = "meta.npz"
+# Training rows decoded to float32 at a time while scanning.
+SCAN_BLOCK = 4096
+# Upper bound on the approximate scores held for one batch of queries.
+MAX_SCORE_BYTES = 64 * 1024 * 1024
+DEFAULT_RERANK = 4
+# Queries whose candidates are gathered for the exact re-rank at a time.
+RERANK_BLOCK = 256
+
+
+def quantize(unit: np.ndarray, kind: str) -> tuple[np.ndarray, np.ndarray | None]:
+    """Codes (and per-row scales for ``int8``) of unit-length rows."""
+    if kind == "float16":
+        return unit.astype(np.float16), None
+    if kind != "int8":
+        raise ValueError(f"Unknown kind {kind!r}; expected one of {KINDS}")
+    scales = np.abs(unit).max(axis=1) / 127
+    scales[scales == 0] = 1
+    codes = np.rint(unit / scales[:, None]).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+class QuantizedIndex:
+    def __init__(self, vectors: np.ndarray, rows: np.ndarray, norms: np.ndarray, codes: np.ndarray,
+                 scales: np.ndarray | None, rerank: int = DEFAULT_RERANK):
+        self.vectors = vectors    # store matrix, full precision (usually memory-mapped)
+        self.rows = rows          # store row of every indexed item
+        self.norms = norms        # norm of every indexed item
+        self.codes = codes        # N x D int8 or float16 codes of the unit vectors
+        self.scales = scales      # per-item scale of the int8 codes
+        self.rerank = rerank      # candidates re-ranked per neighbour asked for
+
+    @property
+    def kind(self) -> str:
+        return "int8" if self.codes.dtype == np.int8 else "float16"
+
+    @property
+    def dim(self) -> int:
+        return self.codes.shape[1]
+
+    def __len__(self) -> int:
+        return self.codes.shape[0]
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    @classmethod
+    def build(cls, vectors: np.ndarray, kind: str = "int8", rows: np.ndarray | None = None,
+              rerank: int = DEFAULT_RERANK) -> "QuantizedIndex":
+        """Quantize ``vectors[rows]`` (all rows by default)."""
+        rows = np.arange(vectors.shape[0]) if rows is None else np.asarray(rows, dtype=np.int64)
+        n, dim = rows.shape[0], vectors.shape[1]
+        norms = np.empty(n, dtype=np.float32)
+        codes = np.empty((n, dim), dtype=np.int8 if kind == "int8" else np.float16)
+        scales = np.empty(n, dtype=np.float32) if kind == "int8" else None
+        for start in range(0, n, SCAN_BLOCK):
+            block = np.asarray(vectors[rows[start:start + SCAN_BLOCK]], dtype=np.float32)
+            norms[start:start + SCAN_BLOCK] = np.linalg.norm(block, axis=1)
+            block_codes, block_scales = quantize(unit_rows(block), kind)
+            codes[start:start + SCAN_BLOCK] = block_codes
+            if scales is not None:
+                scales[start:start + SCAN_BLOCK] = block_scales
+        norms[norms == 0] = 1
+        return cls(vectors, rows, norms, codes, scales, rerank)
+
+    def save(self, folder: str, generation: str | None = None) -> None:
+        """Write the codes; ``generation`` is that of the store they were built from."""
+        os.makedirs(folder, exist_ok=True)
+        tmp = os.path.join(folder, CODES_FILE + ".tmp.npy")
+        np.save(tmp, self.codes)
+        os.replace(tmp, os.path.join(folder, CODES_FILE))
+        tmp = os.path.join(folder, META_FILE + ".tmp.npz")
+        np.savez(tmp, rows=self.rows, norms=self.norms,
+                 scales=self.scales if self.scales is not None else np.empty(0, np.float32),
+                 meta=np.array(json.dumps({"rerank": self.rerank, "count": int(self.vectors.shape[0]),
+                                           "generation": generation})))
+        os.replace(tmp, os.path.join(folder, META_FILE))
+
+    @classmethod
+    def load(cls, folder: str, vectors: np.ndarray, generation: str | None = None) -> "QuantizedIndex":
+        codes = np.load(os.path.join(folder, CODES_FILE), mmap_mode="r")
+        with np.load(os.path.join(folder, META_FILE)) as data:
+            meta = json.loads(str(data["meta"]))
+            check_source(folder, meta, vectors, generation)
+            scales = data["scales"] if codes.dtype == np.int8 else None
+            return cls(vectors, data["rows"], data["norms"], codes, scales, meta["rerank"])
+
+    def _approximate(self, q: np.ndarray, c: int) -> np.ndarray:
+        """Items with the ``c`` best approximate scores per query."""
+        best = np.full((q.shape[0], c), -np.inf, dtype=np.float32)
+        best_idx = np.full((q.shape[0], c), -1, dtype=np.int64)
+        for start in range(0, len(self), SCAN_BLOCK):
+            scores = q @ np.asarray(self.codes[start:start + SCAN_BLOCK], dtype=np.float32).T
+            if self.scales is not None:
+                scores *= self.scales[start:start + SCAN_BLOCK]
+            ids = np.arange(start, start + scores.shape[1])
+            cand = np.concatenate([best, scores], axis=1)
+            cand_idx = np.concatenate([best_idx, np.broadcast_to(ids, scores.shape)], axis=1)
+            keep = np.argpartition(-cand, c - 1, axis=1)[:, :c]
+            best = np.take_along_axis(cand, keep, axis=1)
+            best_idx = np.take_along_axis(cand_idx, keep, axis=1)
+        return best_idx
+
+    def search(self, queries: np.ndarray, k: int, rerank: int | None = None) -> tuple[np.ndarray, np.ndarray]:
+        """Item indices and exact cosine similarities of the top ``k``, best first."""
+        q = unit_rows(np.atleast_2d(queries))
+        k = min(k, len(self))
+        c = min(len(self), k * (rerank or self.rerank))
+        step = max(1, MAX_SCORE_BYTES // (4 * (min(len(self), SCAN_BLOCK) + c)))
+        indices, scores = [], []
+        for start in range(0, q.shape[0], step):
+            qb = q[start:start + step]
+            candidates = self._approximate(qb, c)
+            # Each candidate row is read from the store once, however many queries share it.
+            items, inverse = np.unique(candidates, return_inverse=True)
+            inverse = inverse.reshape(candidates.shape)
+            exact_vectors = np.asarray(self.vectors[self.rows[items]], dtype=np.float32) / self.norms[items, None]
+            exact = np.empty(candidates.shape, dtype=np.float32)
+            for r in range(0, len(qb), RERANK_BLOCK):
+                exact[r:r + RERANK_BLOCK] = np.einsum(
+                    "qd,qcd->qc", qb[r:r + RERANK_BLOCK], exact_vectors[inverse[r:r + RERANK_BLOCK]])
+            idx, sims = _exact_order(candidates, exact)
+            indices.append(idx[:, :k])
+            scores.append(sims[:, :k])
+        return np.concatenate(indices), np.concatenate(scores)
+
+
+def quantized_path(store: EmbeddingStore, kind: str) -> str:
+    return os.path.join(store.path, f"quantized_{kind}")
+
+
+def main(argv: list[str] | None = None) -> None:
+    from .knn import KnnClassifier
+
+    parser = argparse.ArgumentParser(description="Build and evaluate quantized codes for a training store.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_build = sub.add_parser("build", help="Quantize the labeled rows of a store")
+    p_build.add_argument("store")
+    p_build.add_argument("--kind", choices=KINDS, default="int8")
+    p_build.add_argument("--rerank", type=int, default=DEFAULT_RERANK,
+                         help=f"Candidates re-ranked per neighbour (default: {DEFAULT_RERANK})")
+
+    p_eval = sub.add_parser("eval", help="Recall and agreement with float32 brute-force KNN")
+    p_eval.add_argument("store")
+    p_eval.add_argument("--queries", required=True, help="Store of query embeddings")
+    p_eval.add_argument("--kind", choices=KINDS, default="int8")
+    p_eval.add_argument("-k", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    store = EmbeddingStore.open(args.store)
+    folder = quantized_path(store, args.kind)
+    if args.command == "build":
+        started = time.perf_counter()
+        index = QuantizedIndex.build(store.vectors, args.kind, rows=labeled_rows(store), rerank=args.rerank)
+        index.save(folder, store.generation)
+        full = len(index) * index.dim * 4
+        print(f"✅ Quantized {len(index)} vectors to {args.kind} in {time.perf_counter() - started:.2f}s: "
+              f"{index.nbytes / 2**20:.1f} MB instead of {full / 2**20:.1f} MB ({full / max(1, index.nbytes):.1f}x)")
+        return
+
+    index = QuantizedIndex.load(folder, store.vectors, store.generation)
+    queries = EmbeddingStore.open(args.queries).vectors
+
+    started = time.perf_counter()
+    exact = KnnClassifier.from_store(store, k=args.k).predict_batch(queries)
+    exact_time = time.perf_counter() - started
+    started = time.perf_counter()
+    approx = KnnClassifier.from_store(store, k=args.k, index=index).predict_batch(queries)
+    approx_time = time.perf_counter() - started
+
+    brute = KnnClassifier.from_store(store, k=args.k)
+    recall = _recall(index.search(queries, args.k)[0], brute.kneighbors(queries)[0])
+    agree = sum(a.label == e.label for a, e in zip(approx, exact)) / max(1, len(exact))
+    print(f"recall@{args.k}={recall:.4f}  float32 {exact_time:.3f}s  {args.kind} {approx_time:.3f}s")
+    print(f"✅ {args.kind}: predictions agree with float32 on {agree:.2%} of {len(exact)} queries")
+
+
+if __name__ == "__main__":
+    main()
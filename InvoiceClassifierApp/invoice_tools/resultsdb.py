@@ -0,0 +1,311 @@
+"""Indexed SQLite copy of ``predictions.csv`` for paginated queries.
+
+Browsing results used to mean downloading the whole ``predictions.csv``.
+``ResultsDB`` keeps its rows in a SQLite table next to it
+(``output/predictions.db``) with indexes on ``(label, filename)``,
+``(label, score, filename)`` and ``(score, filename)``, so filtering by
+label, score range and filename prefix only touches the rows of one page:
+
+* pages are fetched with keyset pagination - the cursor holds the sort key
+  of the last row, so page 10 000 costs the same as page 1,
+* per-label counts are kept in their own table, refreshed at every import,
+* ``sync`` re-imports only when the CSV's size or mtime changed; rows
+  appended since the last import (``invoice_tools.watch``) are read from
+  the previous end of file instead of re-reading it whole.
+
+A filename listed twice keeps its last row, as it does in the downloads.
+Rows whose score could not be parsed are only listed in filename order::
+
+    python -m invoice_tools.resultsdb output/predictions.csv --label healthcare --min-score 0.8
+    python -m invoice_tools.resultsdb output/predictions.csv --counts
+"""
+
+import argparse
+import base64
+import hashlib
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from operator import itemgetter
+from typing import NamedTuple
+
+import numpy as np
+
+from .predictions import iter_predictions
+
+ORDERS = ("filename", "score", "-score")
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+# Bytes before the previous end of file that must be unchanged for the rest to count as appended.
+TAIL_BYTES = 4096
+
+TABLES = """
+CREATE TABLE IF NOT EXISTS predictions (
+    filename     TEXT PRIMARY KEY,
+    label        TEXT NOT NULL,
+    score        REAL,
+    top_neighbor TEXT
+);
+CREATE TABLE IF NOT EXISTS label_counts (label TEXT PRIMARY KEY, count INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS source (key TEXT PRIMARY KEY, value);
+"""
+INDEXES = {
+    "predictions_label": "predictions (label, filename)",
+    "predictions_label_score": "predictions (label, score, filename)",
+    "predictions_score": "predictions (score, filename)",
+}
+ORDER_BY = {
+    "filename": "filename",
+    "score": "score, filename",
+    "-score": "score DESC, filename DESC",
+}
+
+
+class Page(NamedTuple):
+    rows: list[dict]
+    next_cursor: str | None  # None on the last page
+
+
+def _encode_cursor(order: str, row: dict) -> str:
+    key = json.dumps([order, row["score"], row["filename"]], ensure_ascii=False)
+    return base64.urlsafe_b64encode(key.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(cursor: str, order: str) -> tuple[float | None, str]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        cursor_order, score, filename = json.loads(base64.urlsafe_b64decode(padded))
+    except (ValueError, TypeError) as e:
+        raise ValueError("invalid cursor") from e
+    if cursor_order != order:
+        raise ValueError(f"cursor belongs to order={cursor_order!r}, not {order!r}")
+    return score, filename
+
+
+def _prefix_bounds(prefix: str) -> tuple[str, str | None]:
+    """``[low, high)`` range of strings starting with ``prefix``, usable on an index.
+
+    ``high`` increments the last character that is not U+10FFFF, skipping
+    the surrogates, which SQLite cannot store; it is ``None`` (no upper
+    bound) only for a prefix made of U+10FFFF alone.
+    """
+    head = prefix.rstrip(chr(0x10FFFF))
+    if not head:
+        return prefix, None
+    following = ord(head[-1]) + 1
+    if 0xD800 <= following <= 0xDFFF:
+        following = 0xE000
+    return prefix, head[:-1] + chr(following)
+
+
+def _tail_digest(path: str, end: int) -> str:
+    start = max(0, end - TAIL_BYTES)
+    with open(path, "rb") as f:
+        f.seek(start)
+        return hashlib.sha1(f.read(end - start)).hexdigest()
+
+
+def _ends_with_newline(path: str, size: int) -> bool:
+    if size == 0:
+        return False
+    with open(path, "rb") as f:
+        f.seek(size - 1)
+        return f.read(1) == b"\n"
+
+
+class ResultsDB:
+    def __init__(self, path: str, csv_path: str):
+        self.path = path
+        self.csv_path = csv_path
+        self._lock = threading.Lock()
+        self._seen: tuple[int, int] | None = None  # CSV size and mtime at the last sync
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")  # readers keep going while an import runs
+            conn.executescript(TABLES)
+            self._create_indexes(conn)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @staticmethod
+    def _create_indexes(conn: sqlite3.Connection) -> None:
+        for name, target in INDEXES.items():
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {target}")
+
+    def sync(self) -> int | None:
+        """Import what changed in the CSV; the number of rows read, or ``None`` if it was current."""
+        try:
+            stat = os.stat(self.csv_path)
+        except OSError:
+            return None  # keep serving the last import
+        signature = (stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            if self._seen == signature:
+                return None
+            with closing(self._connect()) as conn:
+                # Serializes imports across worker processes; the check is repeated under the lock.
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    source = dict(conn.execute("SELECT key, value FROM source"))
+                    if (source.get("size"), source.get("mtime_ns")) == signature:
+                        conn.execute("COMMIT")
+                        self._seen = signature
+                        return None
+                    count = self._import(conn, source, stat.st_size)
+                    complete = _ends_with_newline(self.csv_path, stat.st_size)
+                    conn.executemany("INSERT OR REPLACE INTO source (key, value) VALUES (?, ?)", [
+                        ("size", stat.st_size), ("mtime_ns", stat.st_mtime_ns),
+                        # A last line without its newline may still be being written: import the
+                        # whole file again next time instead of appending from the middle of a row.
+                        ("offset", stat.st_size if complete else None),
+                        ("tail", _tail_digest(self.csv_path, stat.st_size) if complete else None),
+                    ])
+                    conn.execute("COMMIT")
+                except BaseException:
+                    conn.execute("ROLLBACK")
+                    raise
+            self._seen = signature
+            return count
+
+    def _append_offset(self, source: dict, size: int) -> int:
+        """Where the unread rows start: the previous end of file if rows were only appended, else 0."""
+        offset = source.get("offset")
+        if not offset or size <= offset:
+            return 0
+        try:
+            return offset if _tail_digest(self.csv_path, offset) == source.get("tail") else 0
+        except OSError:
+            return 0
+
+    def _import(self, conn: sqlite3.Connection, source: dict, size: int) -> int:
+        start = self._append_offset(source, size)
+        if start == 0:
+            # Bulk loads are much faster without the indexes; they are rebuilt once at the end.
+            conn.execute("DELETE FROM predictions")
+            for name in INDEXES:
+                conn.execute(f"DROP INDEX IF EXISTS {name}")
+        count = 0
+        for frame in iter_predictions(self.csv_path, start=start):
+            # Scores are parsed as float32; rounding restores the four decimals the CSV holds.
+            scores = np.round(frame["SimilarityScore"].to_numpy(dtype=np.float64), 6).tolist()
+            rows = [(f, label, None if math.isnan(score) else score, top) for f, label, score, top in zip(
+                frame["Filename"].tolist(), frame["PredictedLabel"].tolist(), scores, frame["TopNeighbor"].tolist()) if f]
+            # Inserting in key order keeps the primary-key B-tree appends sequential; the sort is
+            # stable, so of two rows for the same file the later one is still written last.
+            rows.sort(key=itemgetter(0))
+            conn.executemany(
+                "INSERT OR REPLACE INTO predictions (filename, label, score, top_neighbor) VALUES (?, ?, ?, ?)", rows)
+            count += len(rows)
+        if start == 0:
+            self._create_indexes(conn)
+        conn.execute("DELETE FROM label_counts")
+        conn.execute("INSERT INTO label_counts SELECT label, COUNT(*) FROM predictions GROUP BY label")
+        return count
+
+    @staticmethod
+    def _filters(label: str | None, min_score: float | None, max_score: float | None,
+                 prefix: str | None) -> tuple[list[str], list]:
+        where, params = [], []
+        if label is not None:
+            where.append("label = ?")
+            params.append(label)
+        if min_score is not None:
+            where.append("score >= ?")
+            params.append(min_score)
+        if max_score is not None:
+            where.append("score <= ?")
+            params.append(max_score)
+        if prefix:
+            low, high = _prefix_bounds(prefix)
+            where.append("filename >= ?")
+            params.append(low)
+            if high is not None:
+                where.append("filename < ?")
+                params.append(high)
+        return where, params
+
+    def query(self, label: str | None = None, min_score: float | None = None, max_score: float | None = None,
+              prefix: str | None = None, order: str = "filename", limit: int = DEFAULT_LIMIT,
+              cursor: str | None = None) -> Page:
+        """One page of predictions, starting after ``cursor`` (the previous page's ``next_cursor``)."""
+        if order not in ORDERS:
+            raise ValueError(f"order must be one of {ORDERS}")
+        limit = max(1, min(limit, MAX_LIMIT))
+        where, params = self._filters(label, min_score, max_score, prefix)
+        if order != "filename":
+            where.append("score IS NOT NULL")
+        if cursor:
+            score, filename = _decode_cursor(cursor, order)
+            if order == "filename":
+                where.append("filename > ?")
+                params.append(filename)
+            else:
+                where.append("(score, filename) > (?, ?)" if order == "score" else "(score, filename) < (?, ?)")
+                params += [score, filename]
+        sql = "SELECT filename, label, score, top_neighbor FROM predictions"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += f" ORDER BY {ORDER_BY[order]} LIMIT ?"
+        with closing(self._connect()) as conn:
+            fetched = conn.execute(sql, params + [limit + 1]).fetchall()
+        rows = [{"filename": f, "label": label, "score": score, "top_neighbor": top}
+                for f, label, score, top in fetched[:limit]]
+        return Page(rows, _encode_cursor(order, rows[-1]) if len(fetched) > limit else None)
+
+    def counts(self, min_score: float | None = None, max_score: float | None = None,
+               prefix: str | None = None) -> dict[str, int]:
+        """Rows per label, optionally among those matching the score range and filename prefix."""
+        with closing(self._connect()) as conn:
+            if min_score is None and max_score is None and not prefix:
+                return dict(conn.execute("SELECT label, count FROM label_counts ORDER BY label"))
+            where, params = self._filters(None, min_score, max_score, prefix)
+            return dict(conn.execute(
+                f"SELECT label, COUNT(*) FROM predictions WHERE {' AND '.join(where)} GROUP BY label ORDER BY label",
+                params))
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Query predictions.csv through an indexed SQLite copy.")
+    parser.add_argument("predictions", help="predictions.csv")
+    parser.add_argument("--db", help="SQLite file (default: predictions.db next to the CSV)")
+    parser.add_argument("--label")
+    parser.add_argument("--min-score", type=float)
+    parser.add_argument("--max-score", type=float)
+    parser.add_argument("--prefix", help="Filename prefix")
+    parser.add_argument("--order", choices=ORDERS, default="filename")
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--cursor", help="Continue after a page printed earlier")
+    parser.add_argument("--counts", action="store_true", help="Print rows per label instead")
+    args = parser.parse_args(argv)
+
+    db = ResultsDB(args.db or os.path.splitext(args.predictions)[0] + ".db", args.predictions)
+    started = time.perf_counter()
+    imported = db.sync()
+    if imported is not None:
+        print(f"📥 Imported {imported} rows from {args.predictions} in {time.perf_counter() - started:.2f}s")
+
+    started = time.perf_counter()
+    if args.counts:
+        counts = db.counts(args.min_score, args.max_score, args.prefix)
+        for label, count in counts.items():
+            print(f"{label:<20} {count}")
+        print(f"✅ {sum(counts.values())} rows in {len(counts)} labels ({(time.perf_counter() - started) * 1000:.1f} ms)")
+        return
+    page = db.query(args.label, args.min_score, args.max_score, args.prefix, args.order, args.limit, args.cursor)
+    for row in page.rows:
+        score = "" if row["score"] is None else f"{row['score']:.4f}"
+        print(f"{row['filename']:<40} {row['label']:<16} {score:>7}  {row['top_neighbor']}")
+    print(f"✅ {len(page.rows)} rows in {(time.perf_counter() - started) * 1000:.1f} ms"
+          + (f"; next page: --cursor {page.next_cursor}" if page.next_cursor else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+"""Resident classification service.
+
+Every ``dotnet run`` rebuilds the project, re-reads the TrainData PDFs,
+reloads every embedding and refits ``KnnClassifier`` before it classifies a
+single invoice. ``ClassificationService`` does that work once when the web
+app starts and then keeps the normalized training matrix and label index in
+memory, so classifying an invoice whose embedding is cached is a single
+in-process matrix product.
+
+Invoice embeddings are looked up in the .NET ``embeddings/`` cache by the
+same safe name ``OpenAIEmbeddingService.GetOrLoadEmbeddingAsync`` uses. An
+optional ``embed`` callable computes vectors for invoices that are not
+cached yet.
+
+With ``snapshot_dir`` the training set is published as a memory-mapped
+snapshot (see ``snapshot``) that every worker process of a multi-worker
+server attaches to, instead of each worker holding its own copy.
+"""
+
+import os
+import threading
+import time
+from collections.abc import Callable
+
+import numpy as np
+
+from .knn import UNKNOWN, KnnClassifier, Prediction
+from .predictions import normalize_filename
+from .snapshot import SnapshotStore, source_signature
+from .store import EmbeddingStore, load_embeddings, read_embedding_json
+
+# Computes an embedding for (filename, raw file bytes); returns None if it can't.
+EmbedFn = Callable[[str, bytes], np.ndarray | None]
+
+
+def safe_name(identifier: str) -> str:
+    """Cache file stem used by ``OpenAIEmbeddingService`` for ``identifier``."""
+    return identifier.replace(" ", "_").replace("/", "_")
+
+
+class ServiceNotReady(RuntimeError):
+    pass
+
+
+class ClassificationService:
+    def __init__(self, training_source: str, embeddings_dir: str | None = None, k: int = 3,
+                 embed: EmbedFn | None = None, snapshot_dir: str | None = None):
+        self.training_source = training_source
+        self.embeddings_dir = embeddings_dir
+        self.k = k
+        self.embed = embed
+        self.snapshots = SnapshotStore(snapshot_dir) if snapshot_dir else None
+        self.generation: str | None = None
+        self.error: str | None = None
+        self.loaded_at: float | None = None
+        self.load_seconds: float | None = None
+        self._classifier: KnnClassifier | None = None
+        self._vector_cache: dict[str, np.ndarray] = {}
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+
+    def start(self) -> "ClassificationService":
+        """Load the training data in the background and return immediately."""
+        threading.Thread(target=self.reload, name="classification-service-load", daemon=True).start()
+        return self
+
+    def reload(self) -> None:
+        """(Re)load the training set and swap it in atomically."""
+        started = time.perf_counter()
+        generation = None
+        try:
+            if self.snapshots is not None:
+                classifier, generation = self._load_snapshot()
+            else:
+                classifier = KnnClassifier.from_store(self._load_training(), k=self.k)
+        except (OSError, ValueError) as e:
+            self.error = f"Failed to load training data from {self.training_source}: {e}"
+            print(f"❌ {self.error}")
+            return
+
+        with self._lock:
+            self._classifier = classifier
+            self.generation = generation
+            self.error = None
+            self.loaded_at = time.time()
+            self.load_seconds = time.perf_counter() - started
+        self._ready.set()
+        print(f"✅ Classification service ready: {len(classifier.filenames)} training vectors "
+              f"in {self.load_seconds:.2f}s")
+
+    def _load_training(self) -> EmbeddingStore:
+        store = load_embeddings(self.training_source)
+        if len(store) == 0:
+            raise ValueError("no training embeddings found")
+        return store
+
+    def _load_snapshot(self) -> tuple[KnnClassifier, str]:
+        """Attach to the live snapshot, publishing a new one first if the training source changed."""
+        signature = source_signature(self.training_source)
+        name = self.snapshots.current()
+        if name is None or self.snapshots.meta(name).get("source") != signature:
+            with self.snapshots.build_lock():
+                # Another worker may have published it while we waited for the lock.
+                name = self.snapshots.current()
+                if name is None or self.snapshots.meta(name).get("source") != signature:
+                    name = self.snapshots.publish(self._load_training(), signature)
+        return self.snapshots.attach(name, self.k), name
+
+    def _follow_snapshot(self) -> None:
+        """Switch to the generation another worker published, if any."""
+        name = self.snapshots.current()
+        if name is None or name == self.generation:
+            return
+        try:
+            classifier = self.snapshots.attach(name, self.k)
+        except (OSError, ValueError):
+            return  # keep serving the generation we have
+        with self._lock:
+            self._classifier = classifier
+            self.generation = name
+            self.loaded_at = time.time()
+
+    @property
+    def ready(self) -> bool:
+        return self._ready.is_set()
+
+    def status(self) -> dict:
+        classifier = self._classifier
+        return {
+            "ready": self.ready,
+            "error": self.error,
+            "training_source": self.training_source,
+            "training_vectors": len(classifier.filenames) if classifier else 0,
+            "labels": [str(c) for c in classifier.classes] if classifier else [],
+            "k": self.k,
+            "generation": self.generation,
+            "loaded_at": self.loaded_at,
+            "load_seconds": self.load_seconds,
+            "cached_invoice_vectors": len(self._vector_cache),
+        }
+
+    def classifier(self, timeout: float | None = None) -> KnnClassifier:
+        if not self._ready.wait(timeout):
+            raise ServiceNotReady(self.error or "training data is still loading")
+        if self.snapshots is not None:
+            self._follow_snapshot()
+        with self._lock:
+            return self._classifier
+
+    def cached_embedding(self, filename: str) -> np.ndarray | None:
+        """Embedding of ``filename`` from memory or the .NET ``embeddings/`` cache."""
+        key = safe_name(normalize_filename(filename))
+        vector = self._vector_cache.get(key)
+        if vector is not None or not self.embeddings_dir:
+            return vector
+
+        path = os.path.join(self.embeddings_dir, key + ".json")
+        if not os.path.isfile(path):
+            return None
+        try:
+            records = read_embedding_json(path)
+        except (OSError, ValueError):
+            return None
+        if not records:
+            return None
+        vector = np.asarray(records[0][2], dtype=np.float32)
+        self._vector_cache[key] = vector
+        return vector
+
+    def classify_vectors(self, vectors: np.ndarray, timeout: float | None = None) -> list[Prediction]:
+        return self.classifier(timeout).predict_batch(vectors)
+
+    def classify_files(self, files: list[tuple[str, bytes]], timeout: float | None = None) -> dict:
+        """Classify uploaded ``(filename, content)`` pairs.
+
+        Invoices without a cached embedding (and no ``embed`` callable to
+        compute one) are reported under ``missing`` instead of failing the
+        whole request.
+        """
+        classifier = self.classifier(timeout)
+        started = time.perf_counter()
+
+        names, vectors, missing = [], [], []
+        for filename, content in files:
+            vector = self.cached_embedding(filename)
+            if vector is None and self.embed is not None:
+                vector = self.embed(filename, content)
+                if vector is not None:
+                    vector = np.asarray(vector, dtype=np.float32)
+                    self._vector_cache[safe_name(normalize_filename(filename))] = vector
+            if vector is None:
+                missing.append(filename)
+            else:
+                names.append(filename)
+                vectors.append(vector)
+
+        # Vectors from a different embedding model can't be compared; the C#
+        # classifier reports those as "unknown" too.
+        dim = classifier.dim
+        comparable = [i for i, v in enumerate(vectors) if v.shape[0] == dim]
+        predictions = [UNKNOWN] * len(vectors)
+        if comparable:
+            batch = classifier.predict_batch(np.vstack([vectors[i] for i in comparable]))
+            for i, p in zip(comparable, batch):
+                predictions[i] = p
+        return {
+            "predictions": [
+                {
+                    "Filename": normalize_filename(name),
+                    "PredictedLabel": p.label,
+                    "SimilarityScore": round(p.score, 4),
+                    "TopNeighbor": p.top_neighbor,
+                }
+                for name, p in zip(names, predictions)
+            ],
+            "missing": missing,
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 3),
+        }
@@ -0,0 +1,248 @@
+"""Tiled all-pairs cosine similarity with sparse output.
+
+``EmbeddingSimilarityAnalyzer`` compares every pair in a double loop, keeps
+all N²/2 results in a list and writes them as text; the matrix exporter then
+writes a dense N x N CSV on top. Here the similarity matrix is computed in
+cache-sized tiles with BLAS and only what is needed survives each tile:
+
+* the top ``k`` neighbors of every document, or
+* every pair at or above a similarity ``threshold``.
+
+Results go to a compact binary pair file (a folder with ``rows.i32``,
+``cols.i32``, ``scores.f32`` and an ``index.json``) or, if the output path
+ends in ``.parquet`` and pyarrow is installed, to Parquet. ``iter_pairs``
+streams either back as ``FileA, FileB, SimilarityScore`` DataFrame chunks.
+
+    python -m invoice_tools.similarity embeddings.store -o similarity.pairs --top-k 10
+"""
+
+import argparse
+import json
+import os
+from collections.abc import Iterator
+
+import numpy as np
+
+from .knn import top_positions
+from .store import load_embeddings
+
+TILE_ROWS = 1024
+TILE_COLS = 8192
+PAIRS_VERSION = 1
+
+
+def _row_norms(matrix: np.ndarray, chunk: int = TILE_COLS) -> np.ndarray:
+    norms = np.empty(matrix.shape[0], dtype=np.float32)
+    for start in range(0, matrix.shape[0], chunk):
+        norms[start:start + chunk] = np.linalg.norm(np.asarray(matrix[start:start + chunk], dtype=np.float32), axis=1)
+    norms[norms == 0] = 1
+    return norms
+
+
+def _normalized(matrix: np.ndarray, norms: np.ndarray, start: int, stop: int) -> np.ndarray:
+    return np.asarray(matrix[start:stop], dtype=np.float32) / norms[start:stop, None]
+
+
+def iter_topk(queries: np.ndarray, database: np.ndarray, k: int, self_index: np.ndarray | None = None,
+              tile_rows: int = TILE_ROWS, tile_cols: int = TILE_COLS,
+              groups: tuple[np.ndarray, np.ndarray] | None = None) -> Iterator[tuple[int, np.ndarray, np.ndarray]]:
+    """Yield ``(row_start, indices, scores)`` for each tile of query rows.
+
+    ``indices``/``scores`` hold the ``k`` most cosine-similar database rows
+    per query, best first; equal scores go to the lower row, as in
+    ``knn.top_k``. ``self_index[i]`` (if given) is a database row query
+    ``i`` must never match, e.g. itself in a leave-one-out search.
+    ``groups`` (query groups, database groups) excludes every database row
+    in the query's own group, e.g. its cross-validation fold; slots left
+    without a candidate score ``-inf``. Memory stays at O(tile_rows x tile_cols) no matter how large N is;
+    both inputs may be memory-mapped.
+    """
+    n_db = database.shape[0]
+    k = min(k, n_db - (1 if self_index is not None else 0))
+    q_norms = _row_norms(queries)
+    db_norms = _row_norms(database)
+
+    for r0 in range(0, queries.shape[0], tile_rows):
+        r1 = min(r0 + tile_rows, queries.shape[0])
+        q = _normalized(queries, q_norms, r0, r1)
+        best_idx = np.zeros((r1 - r0, max(k, 0)), dtype=np.int64)
+        best = np.full((r1 - r0, max(k, 0)), -np.inf, dtype=np.float32)
+        if k <= 0:
+            yield r0, best_idx, best
+            continue
+
+        for c0 in range(0, n_db, tile_cols):
+            c1 = min(c0 + tile_cols, n_db)
+            scores = q @ _normalized(database, db_norms, c0, c1).T
+            if self_index is not None:
+                own = self_index[r0:r1] - c0
+                hit = (own >= 0) & (own < c1 - c0)
+                scores[np.nonzero(hit)[0], own[hit]] = -np.inf
+            if groups is not None:
+                scores[groups[0][r0:r1, None] == groups[1][None, c0:c1]] = -np.inf
+
+            cand = np.concatenate([best, scores], axis=1)
+            cand_idx = np.concatenate([best_idx, np.broadcast_to(np.arange(c0, c1), scores.shape)], axis=1)
+            keep = top_positions(cand, k, cand_idx)
+            best = np.take_along_axis(cand, keep, axis=1)
+            best_idx = np.take_along_axis(cand_idx, keep, axis=1)
+
+        yield r0, best_idx, best
+
+
+def iter_threshold_pairs(vectors: np.ndarray, threshold: float, tile_rows: int = TILE_ROWS,
+                         tile_cols: int = TILE_COLS) -> Iterator[tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """Yield ``(rows, cols, scores)`` for every pair ``i < j`` with similarity >= ``threshold``."""
+    norms = _row_norms(vectors)
+    n = vectors.shape[0]
+    for r0 in range(0, n, tile_rows):
+        r1 = min(r0 + tile_rows, n)
+        q = _normalized(vectors, norms, r0, r1)
+        # Only the upper triangle is needed: start at the tile holding row r0.
+        for c0 in range(r0, n, tile_cols):
+            c1 = min(c0 + tile_cols, n)
+            scores = q @ _normalized(vectors, norms, c0, c1).T
+            rows, cols = np.nonzero(scores >= threshold)
+            rows = rows + r0
+            cols = cols + c0
+            upper = cols > rows
+            if upper.any():
+                yield rows[upper], cols[upper], scores[rows[upper] - r0, cols[upper] - c0]
+
+
+class PairWriter:
+    """Appends pair chunks to a binary pair folder."""
+
+    def __init__(self, path: str, names: list[str], meta: dict):
+        self.path = path
+        self.names = names
+        self.meta = meta
+        self.count = 0
+        os.makedirs(path, exist_ok=True)
+        self._files = {
+            name: open(os.path.join(path, f"{name}.tmp"), "wb")
+            for name in ("rows.i32", "cols.i32", "scores.f32")
+        }
+
+    def write(self, rows: np.ndarray, cols: np.ndarray, scores: np.ndarray) -> None:
+        self._files["rows.i32"].write(np.asarray(rows, dtype="<i4").tobytes())
+        self._files["cols.i32"].write(np.asarray(cols, dtype="<i4").tobytes())
+        self._files["scores.f32"].write(np.asarray(scores, dtype="<f4").tobytes())
+        self.count += len(rows)
+
+    def close(self) -> None:
+        for name, fh in self._files.items():
+            fh.close()
+            os.replace(os.path.join(self.path, f"{name}.tmp"), os.path.join(self.path, name))
+        index = dict(self.meta, version=PAIRS_VERSION, count=self.count, names=self.names)
+        tmp = os.path.join(self.path, "index.json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(index, f, ensure_ascii=False)
+        os.replace(tmp, os.path.join(self.path, "index.json"))
+
+
+class ParquetPairWriter:
+    """Same interface as ``PairWriter``, one Parquet row group per chunk."""
+
+    def __init__(self, path: str, names: list[str], meta: dict):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self._pa = pa
+        self.names = np.asarray(names, dtype=object)
+        self.count = 0
+        schema = pa.schema(
+            [("FileA", pa.string()), ("FileB", pa.string()), ("SimilarityScore", pa.float32())],
+            metadata={"invoice_tools": json.dumps(meta)},
+        )
+        self._writer = pq.ParquetWriter(path, schema, compression="zstd")
+
+    def write(self, rows: np.ndarray, cols: np.ndarray, scores: np.ndarray) -> None:
+        pa = self._pa
+        table = pa.table({
+            "FileA": pa.array(self.names[rows], type=pa.string()),
+            "FileB": pa.array(self.names[cols], type=pa.string()),
+            "SimilarityScore": pa.array(np.asarray(scores, dtype=np.float32)),
+        })
+        self._writer.write_table(table)
+        self.count += len(rows)
+
+    def close(self) -> None:
+        self._writer.close()
+
+
+def open_writer(path: str, names: list[str], meta: dict):
+    if path.lower().endswith(".parquet"):
+        return ParquetPairWriter(path, names, meta)
+    return PairWriter(path, names, meta)
+
+
+def write_topk(vectors: np.ndarray, names: list[str], out_path: str, k: int, **tiles) -> int:
+    writer = open_writer(out_path, names, {"mode": "topk", "k": k})
+    for r0, idx, scores in iter_topk(vectors, vectors, k, self_index=np.arange(vectors.shape[0]), **tiles):
+        rows = np.repeat(np.arange(r0, r0 + idx.shape[0]), idx.shape[1])
+        writer.write(rows, idx.ravel(), scores.ravel())
+    writer.close()
+    return writer.count
+
+
+def write_threshold(vectors: np.ndarray, names: list[str], out_path: str, threshold: float, **tiles) -> int:
+    writer = open_writer(out_path, names, {"mode": "threshold", "threshold": threshold})
+    for rows, cols, scores in iter_threshold_pairs(vectors, threshold, **tiles):
+        writer.write(rows, cols, scores)
+    writer.close()
+    return writer.count
+
+
+def iter_pairs(path: str, chunk_rows: int = 100_000):
+    """Stream a pair file as ``FileA, FileB, SimilarityScore`` DataFrames."""
+    import pandas as pd
+
+    if path.lower().endswith(".parquet"):
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows):
+            yield batch.to_pandas()
+        return
+
+    with open(os.path.join(path, "index.json"), "r", encoding="utf-8") as f:
+        index = json.load(f)
+    count = index["count"]
+    if count == 0:
+        return
+    names = pd.Categorical.from_codes(np.arange(len(index["names"])), categories=index["names"]) \
+        if len(set(index["names"])) == len(index["names"]) else np.asarray(index["names"], dtype=object)
+    rows = np.memmap(os.path.join(path, "rows.i32"), dtype="<i4", mode="r", shape=(count,))
+    cols = np.memmap(os.path.join(path, "cols.i32"), dtype="<i4", mode="r", shape=(count,))
+    scores = np.memmap(os.path.join(path, "scores.f32"), dtype="<f4", mode="r", shape=(count,))
+    for start in range(0, count, chunk_rows):
+        stop = min(start + chunk_rows, count)
+        yield pd.DataFrame({
+            "FileA": names[np.asarray(rows[start:stop])],
+            "FileB": names[np.asarray(cols[start:stop])],
+            "SimilarityScore": np.asarray(scores[start:stop]),
+        })
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Tiled all-pairs cosine similarity with sparse output.")
+    parser.add_argument("embeddings", help="Embedding store, embeddings/ folder or batch JSON file")
+    parser.add_argument("-o", "--out", required=True, help="Output pair folder, or a .parquet file")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--top-k", type=int, default=10, help="Keep the k most similar documents per document")
+    mode.add_argument("--threshold", type=float, help="Keep every pair at or above this similarity instead")
+    parser.add_argument("--tile-rows", type=int, default=TILE_ROWS)
+    parser.add_argument("--tile-cols", type=int, default=TILE_COLS)
+    args = parser.parse_args(argv)
+
+    store = load_embeddings(args.embeddings)
+    tiles = {"tile_rows": args.tile_rows, "tile_cols": args.tile_cols}
+    if args.threshold is not None:
+        count = write_threshold(store.vectors, store.filenames, args.out, args.threshold, **tiles)
+    else:
+        count = write_topk(store.vectors, store.filenames, args.out, args.top_k, **tiles)
+    print(f"✅ Wrote {count} similarity pairs for {len(store)} documents to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+"""Training data shared by every web worker through memory-mapped snapshots.
+
+Under a multi-worker server (``gunicorn -w 8 plotclass:app``) every worker
+process used to load the training embeddings and keep its own normalized
+copy of the matrix, so RAM grew with the worker count and each worker paid
+the full load on startup. A snapshot is the classifier's state written once
+as flat files::
+
+    <root>/gen-000003/matrix.npy     N x D unit-length float32 rows
+                      codes.npy      N label codes (int32)
+                      names.bin      filenames, UTF-8, back to back
+                      names.idx.npy  N + 1 offsets into names.bin (int64)
+                      meta.json      classes and the training source signature
+    <root>/CURRENT                   name of the live generation
+
+Workers ``np.load(..., mmap_mode="r")`` the arrays, so all of them share
+the same read-only page-cache pages and attaching is instant. A rebuild
+writes a complete new generation next to the live one and publishes it by
+atomically replacing ``CURRENT``; workers re-read ``CURRENT`` before each
+classification and switch whole, so a request never mixes two generations.
+Only one process builds at a time (a ``locks.FileLock`` on
+``<root>/build.lock``, released by the OS if the builder dies); the others
+wait and attach to its result. Old generations are removed at the next publish
+once no longer among the ``KEEP_GENERATIONS`` newest; workers still mapping
+them keep their pages until they switch.
+"""
+
+import json
+import os
+import shutil
+import time
+from collections.abc import Sequence
+from contextlib import contextmanager
+
+import numpy as np
+
+from .knn import KnnClassifier
+from .locks import FileLock
+from .store import EmbeddingStore, is_store, store_files
+
+CURRENT_FILE = "CURRENT"
+LOCK_FILE = "build.lock"
+KEEP_GENERATIONS = 2
+BUILD_LOCK_TIMEOUT = 30 * 60  # seconds to wait for another process's build
+NORMALIZE_BLOCK = 8192
+
+
+class StringTable(Sequence):
+    """Read-only list of strings backed by a UTF-8 blob and an offsets array."""
+
+    def __init__(self, blob: np.ndarray, offsets: np.ndarray):
+        self.blob = blob
+        self.offsets = offsets
+
+    @classmethod
+    def write(cls, folder: str, names: list[str]) -> None:
+        encoded = [name.encode("utf-8") for name in names]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(e) for e in encoded], out=offsets[1:])
+        with open(os.path.join(folder, "names.bin"), "wb") as f:
+            f.write(b"".join(encoded))
+        np.save(os.path.join(folder, "names.idx.npy"), offsets)
+
+    @classmethod
+    def open(cls, folder: str) -> "StringTable":
+        offsets = np.load(os.path.join(folder, "names.idx.npy"), mmap_mode="r")
+        path = os.path.join(folder, "names.bin")
+        blob = np.memmap(path, dtype=np.uint8, mode="r") if os.path.getsize(path) else np.empty(0, np.uint8)
+        return cls(blob, offsets)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        i = int(i)
+        if i < 0:
+            i += len(self)
+        return bytes(self.blob[self.offsets[i]:self.offsets[i + 1]]).decode("utf-8")
+
+
+def source_signature(path: str) -> dict:
+    """Size and mtime of the training source, to tell whether a snapshot is stale."""
+    if is_store(path):
+        files = store_files(path)
+    elif os.path.isdir(path):
+        files = sorted(os.path.join(path, f) for f in os.listdir(path) if f.endswith(".json"))
+    else:
+        files = [path]
+    stats = [os.stat(f) for f in files if os.path.exists(f)]
+    return {
+        "path": os.path.abspath(path),
+        "files": len(stats),
+        "size": sum(s.st_size for s in stats),
+        "mtime_ns": max((s.st_mtime_ns for s in stats), default=0),
+    }
+
+
+class SnapshotStore:
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def current(self) -> str | None:
+        """Name of the live generation, or ``None`` before the first publish."""
+        try:
+            with open(os.path.join(self.root, CURRENT_FILE), "r", encoding="utf-8") as f:
+                return f.read().strip() or None
+        except OSError:
+            return None
+
+    def meta(self, name: str) -> dict:
+        with open(os.path.join(self.root, name, "meta.json"), "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def generations(self) -> list[str]:
+        return sorted(n for n in os.listdir(self.root) if n.startswith("gen-"))
+
+    @contextmanager
+    def build_lock(self, timeout: float = BUILD_LOCK_TIMEOUT):
+        """Cross-process lock held while a generation is built and published.
+
+        The lock dies with its holder, so a crashed build never blocks the
+        next one and a long build is never mistaken for a stale one.
+        """
+        path = os.path.join(self.root, LOCK_FILE)
+        lock = FileLock(path, poll=0.2)
+        if not lock.acquire(timeout):
+            raise TimeoutError(f"{path} is held by another process")
+        try:
+            yield
+        finally:
+            lock.release()
+
+    def publish(self, store: EmbeddingStore, signature: dict | None = None) -> str:
+        """Write the labeled rows of ``store`` as a new generation and make it current.
+
+        Call with ``build_lock`` held.
+        """
+        rows = np.array([i for i, label in enumerate(store.labels) if label is not None], dtype=np.int64)
+        if len(rows) == 0:
+            raise ValueError("no labeled training embeddings")
+        existing = self.generations()
+        number = int(existing[-1][len("gen-"):]) + 1 if existing else 1
+        name = f"gen-{number:06d}"
+        tmp = os.path.join(self.root, f".{name}.tmp")
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+
+        classes, codes = np.unique(np.asarray([store.labels[i] for i in rows], dtype=object), return_inverse=True)
+        matrix = np.lib.format.open_memmap(os.path.join(tmp, "matrix.npy"), mode="w+", dtype=np.float32,
+                                           shape=(len(rows), store.dim))
+        for start in range(0, len(rows), NORMALIZE_BLOCK):
+            block = np.asarray(store.vectors[rows[start:start + NORMALIZE_BLOCK]], dtype=np.float32)
+            norms = np.linalg.norm(block, axis=1, keepdims=True)
+            norms[norms == 0] = 1
+            matrix[start:start + NORMALIZE_BLOCK] = block / norms
+        matrix.flush()
+        del matrix
+        np.save(os.path.join(tmp, "codes.npy"), codes.astype(np.int32))
+        StringTable.write(tmp, [store.filenames[i] for i in rows])
+        with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({"classes": [str(c) for c in classes], "count": len(rows), "dim": store.dim,
+                       "source": signature, "created": time.time()}, f, ensure_ascii=False)
+
+        os.replace(tmp, os.path.join(self.root, name))
+        pointer = os.path.join(self.root, CURRENT_FILE + ".tmp")
+        with open(pointer, "w", encoding="utf-8") as f:
+            f.write(name)
+        os.replace(pointer, os.path.join(self.root, CURRENT_FILE))
+        self.collect()
+        return name
+
+    def collect(self, keep: int = KEEP_GENERATIONS) -> None:
+        """Remove all but the ``keep`` newest generations."""
+        for name in self.generations()[:-keep]:
+            try:
+                shutil.rmtree(os.path.join(self.root, name))
+            except OSError:
+                pass  # still mapped by a worker on Windows; retried at the next publish
+
+    def attach(self, name: str, k: int = 3) -> KnnClassifier:
+        """Classifier over generation ``name``, memory-mapped read-only."""
+        folder = os.path.join(self.root, name)
+        meta = self.meta(name)
+        matrix = np.load(os.path.join(folder, "matrix.npy"), mmap_mode="r")
+        codes = np.load(os.path.join(folder, "codes.npy"), mmap_mode="r")
+        classes = np.empty(len(meta["classes"]), dtype=object)
+        classes[:] = meta["classes"]
+        return KnnClassifier.from_arrays(matrix, classes, codes, StringTable.open(folder), k=k)
@@ -0,0 +1,350 @@
+"""Columnar, memory-mapped embedding store.
+
+A store is a folder holding two files:
+
+* ``vectors-<id>.f32`` - every embedding packed row by row as one
+  contiguous little-endian float32 matrix (N x D, no header).
+* ``index.json``  - the sidecar index: dimension, row count, the name of
+  the matrix file and the filename / label of every row.
+
+Every write produces a new matrix file and then swaps ``index.json`` in one
+``os.replace``, so the index a reader opens always names a matrix of
+exactly its count and dim. Writers serialize the swap on ``store.lock``.
+Stores written before the matrix was named in the index use
+``vectors.f32``.
+
+Opening a store memory-maps the matrix, so scripts get the full N x D array
+as a zero-copy ``numpy`` view in milliseconds instead of ``json.load``-ing
+one text file per invoice.
+
+Convert the layouts the .NET app writes with::
+
+    python -m invoice_tools.store convert bin/Debug/net9.0/embeddings \
+        InvoiceClassifierApp.embeddings.json -o embeddings.store
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import uuid
+
+import numpy as np
+
+from .locks import FileLock
+
+VECTORS_FILE = "vectors.f32"   # matrix of stores whose index does not name one
+INDEX_FILE = "index.json"
+LOCK_FILE = "store.lock"
+STORE_VERSION = 1
+DTYPE = np.dtype("<f4")
+OPEN_ATTEMPTS = 5
+
+
+class EmbeddingStore:
+    """N x D float32 embeddings plus the filename/label of every row."""
+
+    def __init__(self, vectors: np.ndarray, filenames: list[str], labels: list[str | None], path: str | None = None,
+                 generation: str | None = None):
+        if vectors.ndim != 2 or vectors.shape[0] != len(filenames) or len(filenames) != len(labels):
+            raise ValueError(
+                f"Inconsistent store: vectors {vectors.shape}, "
+                f"{len(filenames)} filenames, {len(labels)} labels"
+            )
+        self.vectors = vectors
+        self.filenames = filenames
+        self.labels = labels
+        self.path = path
+        self.generation = generation  # matrix file the index named; changes with every write of the store
+        self._rows: dict[str, int] | None = None
+
+    @classmethod
+    def open(cls, path: str) -> "EmbeddingStore":
+        """Memory-map the store at ``path`` read-only."""
+        for attempt in range(OPEN_ATTEMPTS):
+            with open(os.path.join(path, INDEX_FILE), "r", encoding="utf-8") as f:
+                index = json.load(f)
+            if index.get("version") != STORE_VERSION:
+                raise ValueError(f"Unsupported store version in {path}: {index.get('version')}")
+
+            count, dim = index["count"], index["dim"]
+            matrix = index.get("vectors", VECTORS_FILE)
+            if count == 0:
+                return cls(np.empty((0, dim), dtype=DTYPE), index["filenames"], index["labels"], path=path,
+                           generation=matrix)
+            try:
+                vectors = np.memmap(os.path.join(path, matrix), dtype=DTYPE, mode="r", shape=(count, dim))
+            except FileNotFoundError:
+                if attempt == OPEN_ATTEMPTS - 1:
+                    raise
+                continue  # a writer replaced the store after we read the index; read the new one
+            return cls(vectors, index["filenames"], index["labels"], path=path, generation=matrix)
+
+    def __len__(self) -> int:
+        return self.vectors.shape[0]
+
+    @property
+    def dim(self) -> int:
+        return self.vectors.shape[1]
+
+    def row(self, filename: str) -> int | None:
+        """Row of ``filename``, or ``None`` if the store does not hold it."""
+        if self._rows is None:
+            self._rows = {}
+            for i, name in enumerate(self.filenames):
+                self._rows.setdefault(name, i)
+        return self._rows.get(filename)
+
+    def vector(self, filename: str) -> np.ndarray | None:
+        i = self.row(filename)
+        return None if i is None else self.vectors[i]
+
+    def label_array(self, missing: str = "unlabeled") -> np.ndarray:
+        """Labels as a numpy string array, with ``missing`` for unlabeled rows."""
+        return np.array([label if label is not None else missing for label in self.labels])
+
+
+class StoreWriter:
+    """Streams rows into a new store with constant memory.
+
+    The matrix goes to a new file that nothing references yet; ``close()``
+    then points ``index.json`` at it with a single ``os.replace``, so
+    readers see either the old store or the new one, never a mix. Matrix
+    files no longer referenced are removed afterwards (where the OS lets
+    us delete a file another process still maps). Concurrent writers take
+    turns on ``store.lock`` for the swap and the cleanup, so none deletes a
+    matrix another has moved into place but not yet indexed; the last one
+    to close wins.
+    """
+
+    def __init__(self, path: str, dim: int | None = None):
+        self.path = path
+        self.dim = dim
+        self.filenames: list[str] = []
+        self.labels: list[str | None] = []
+        os.makedirs(path, exist_ok=True)
+        self.vectors_file = f"vectors-{uuid.uuid4().hex[:12]}.f32"
+        self._tmp_vectors = os.path.join(path, self.vectors_file + ".tmp")
+        self._fh = open(self._tmp_vectors, "wb")
+
+    def add(self, filename: str, label: str | None, vector) -> None:
+        vec = np.asarray(vector, dtype=DTYPE)
+        if vec.ndim != 1:
+            raise ValueError(f"Expected a 1-D vector for {filename}, got shape {vec.shape}")
+        if self.dim is None:
+            self.dim = vec.shape[0]
+        elif vec.shape[0] != self.dim:
+            raise ValueError(f"Vector for {filename} has {vec.shape[0]} dims, store has {self.dim}")
+        self._fh.write(vec.tobytes())
+        self.filenames.append(filename)
+        self.labels.append(label)
+
+    def add_many(self, filenames: list[str], labels: list[str | None], vectors: np.ndarray) -> None:
+        vectors = np.ascontiguousarray(vectors, dtype=DTYPE)
+        if vectors.ndim != 2 or vectors.shape[0] != len(filenames):
+            raise ValueError(f"Expected {len(filenames)} rows, got shape {vectors.shape}")
+        if self.dim is None:
+            self.dim = vectors.shape[1]
+        elif vectors.shape[1] != self.dim:
+            raise ValueError(f"Vectors have {vectors.shape[1]} dims, store has {self.dim}")
+        self._fh.write(vectors.tobytes())
+        self.filenames.extend(filenames)
+        self.labels.extend(labels)
+
+    def close(self) -> EmbeddingStore:
+        self._fh.close()
+        index = {
+            "version": STORE_VERSION,
+            "dtype": DTYPE.str,
+            "dim": self.dim or 0,
+            "count": len(self.filenames),
+            "vectors": self.vectors_file,
+            "filenames": self.filenames,
+            "labels": self.labels,
+        }
+        fd, tmp_index = tempfile.mkstemp(prefix=INDEX_FILE + ".", suffix=".tmp", dir=self.path)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(index, f, ensure_ascii=False)
+        with FileLock(os.path.join(self.path, LOCK_FILE)):
+            os.replace(self._tmp_vectors, os.path.join(self.path, self.vectors_file))
+            os.replace(tmp_index, os.path.join(self.path, INDEX_FILE))
+            self._remove_stale_matrices()
+        return EmbeddingStore.open(self.path)
+
+    def _remove_stale_matrices(self) -> None:
+        for name in os.listdir(self.path):
+            if name.startswith("vectors") and name.endswith(".f32") and name != self.vectors_file:
+                try:
+                    os.remove(os.path.join(self.path, name))
+                except OSError:
+                    pass  # still mapped by a reader on Windows; the next write retries
+
+    def __enter__(self) -> "StoreWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self._fh.close()
+            os.remove(self._tmp_vectors)
+
+
+def write_store(path: str, filenames: list[str], labels: list[str | None], vectors: np.ndarray) -> EmbeddingStore:
+    """Write a complete store in one call."""
+    with StoreWriter(path) as writer:
+        writer.add_many(filenames, labels, vectors)
+    return EmbeddingStore.open(path)
+
+
+def is_store(path: str) -> bool:
+    return os.path.isfile(os.path.join(path, INDEX_FILE))
+
+
+def store_files(path: str) -> list[str]:
+    """The index and the matrix file it currently names."""
+    index_path = os.path.join(path, INDEX_FILE)
+    with open(index_path, "r", encoding="utf-8") as f:
+        vectors = json.load(f).get("vectors", VECTORS_FILE)
+    return [index_path, os.path.join(path, vectors)]
+
+
+def _is_vector(value) -> bool:
+    return isinstance(value, list) and len(value) > 0 and all(isinstance(x, (float, int)) for x in value)
+
+
+def read_embedding_json(path: str) -> list[tuple[str, str | None, list[float]]]:
+    """Read every ``(filename, label, vector)`` from one JSON file.
+
+    Understands all layouts the .NET app has written:
+
+    * ``{"Filename", "Label", "Vector"}`` (``EmbeddingFileFormat``, the
+      ``embeddings/<name>.json`` cache files),
+    * a bare ``[floats]`` list (older Python-written cache files),
+    * ``{"Identifier", "Label", "Embedding"}`` (individual export files),
+    * a list of the above (``InvoiceClassifierApp.embeddings.json``).
+
+    Entries without a usable vector are skipped.
+    """
+    with open(path, "r", encoding="utf-8-sig") as f:
+        data = json.load(f)
+
+    default_name = os.path.basename(path)
+    if default_name.lower().endswith(".json"):
+        default_name = default_name[: -len(".json")]
+
+    if _is_vector(data):
+        return [(default_name, None, data)]
+
+    entries = data if isinstance(data, list) else [data]
+    records = []
+    for entry in entries:
+        if not isinstance(entry, dict):
+            continue
+        vector = entry.get("Vector") or entry.get("Embedding")
+        if not _is_vector(vector):
+            continue
+        name = entry.get("Filename") or entry.get("Identifier") or default_name
+        records.append((name, entry.get("Label"), vector))
+    return records
+
+
+def _json_files(source: str) -> list[str]:
+    if os.path.isdir(source):
+        return sorted(
+            os.path.join(source, f)
+            for f in os.listdir(source)
+            if f.endswith(".json") and "Similarity" not in f
+        )
+    return [source]
+
+
+def convert(sources: list[str], out_path: str) -> EmbeddingStore:
+    """Pack embedding JSON files and/or folders of them into a store.
+
+    When the same filename shows up more than once the first occurrence
+    wins, so list the sources in order of preference.
+    """
+    seen = set()
+    skipped = 0
+    with StoreWriter(out_path) as writer:
+        for source in sources:
+            for path in _json_files(source):
+                try:
+                    records = read_embedding_json(path)
+                except (OSError, ValueError) as e:
+                    print(f"⚠️ Failed to read {path}: {e}")
+                    continue
+                for name, label, vector in records:
+                    if name in seen:
+                        skipped += 1
+                        continue
+                    if writer.dim is not None and len(vector) != writer.dim:
+                        print(f"⚠️ Skipped {name}: {len(vector)} dims, store has {writer.dim}")
+                        skipped += 1
+                        continue
+                    writer.add(name, label, vector)
+                    seen.add(name)
+
+    store = EmbeddingStore.open(out_path)
+    print(f"✅ Packed {len(store)} vectors ({store.dim} dims) into {out_path}, skipped {skipped}")
+    return store
+
+
+def load_embeddings(path: str) -> EmbeddingStore:
+    """Open ``path`` as a store, or read it as legacy JSON into memory.
+
+    Lets scripts accept either a converted store or the old
+    ``embeddings/`` folder while the corpus is migrated.
+    """
+    if is_store(path):
+        return EmbeddingStore.open(path)
+
+    filenames, labels, vectors = [], [], []
+    skipped = 0
+    for file in _json_files(path):
+        try:
+            records = read_embedding_json(file)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Failed to read {file}: {e}")
+            continue
+        for name, label, vector in records:
+            if vectors and len(vector) != len(vectors[0]):
+                skipped += 1
+                continue
+            filenames.append(name)
+            labels.append(label)
+            vectors.append(vector)
+
+    if skipped:
+        print(f"⚠️ Skipped {skipped} vectors in {path} whose dimension differs from {len(vectors[0])}")
+    matrix = np.asarray(vectors, dtype=DTYPE) if vectors else np.empty((0, 0), dtype=DTYPE)
+    return EmbeddingStore(matrix, filenames, labels, path=path)
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Build and inspect embedding stores.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_convert = sub.add_parser("convert", help="Pack embedding JSON files/folders into a store")
+    p_convert.add_argument("sources", nargs="+", help="embeddings/ folders or batch .embeddings.json files")
+    p_convert.add_argument("-o", "--out", required=True, help="Output store folder")
+
+    p_info = sub.add_parser("info", help="Print a summary of a store")
+    p_info.add_argument("store")
+
+    args = parser.parse_args(argv)
+    if args.command == "convert":
+        convert(args.sources, args.out)
+    else:
+        store = EmbeddingStore.open(args.store)
+        labels = {}
+        for label in store.labels:
+            labels[label] = labels.get(label, 0) + 1
+        print(f"{args.store}: {len(store)} vectors x {store.dim} dims")
+        for label, count in sorted(labels.items(), key=lambda kv: str(kv[0])):
+            print(f" - {label if label is not None else 'unlabeled'}: {count}")
+
+
+if __name__ == "__main__":
+    main()
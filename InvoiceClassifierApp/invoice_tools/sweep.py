@@ -0,0 +1,171 @@
+"""Cross-validated sweep over ``k`` and the KNN voting rule in one neighbour search.
+
+``Program.cs`` hard-codes ``new KnnClassifier(k: 3)``; trying another ``k``
+meant a full rerun with re-extraction and reclassification. The votes of
+every ``k`` up to ``K_max`` only need each document's ``K_max`` nearest
+neighbours, so those are searched once and every setting is scored from
+that single table.
+
+The labeled rows of a store are split into ``folds`` label-stratified
+folds; every row is classified by its ``K_max`` nearest rows of the *other*
+folds (``--folds 0`` is leave-one-out). The search is the tiled top-k of
+``similarity.iter_topk`` with the fold as exclusion group, so nothing
+larger than a tile is ever held besides the N x K_max table. Each
+``k <= K_max`` is then voted with both rules:
+
+* ``majority`` - ``KnnClassifier``'s rule: most votes, then summed score;
+* ``weighted`` - highest summed similarity.
+
+The table lists accuracy, balanced accuracy (mean per-label recall) and the
+voting time per query next to the one-off search time::
+
+    python -m invoice_tools.sweep train.store --max-k 15 --folds 5 -o sweep.json
+"""
+
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+from .knn import vote_majority, vote_weighted
+from .similarity import TILE_COLS, TILE_ROWS, iter_topk
+from .store import EmbeddingStore, load_embeddings
+
+DEFAULT_MAX_K = 15
+DEFAULT_FOLDS = 5
+RULES = {"majority": vote_majority, "weighted": vote_weighted}
+# Query rows voted at a time; bounds the rows x labels vote buffers.
+VOTE_ROWS = 65536
+
+
+def assign_folds(codes: np.ndarray, folds: int, seed: int = 0) -> np.ndarray:
+    """Fold id per row, every label spread evenly over the folds; ``folds < 2`` gives one row per fold."""
+    if folds < 2:
+        return np.arange(len(codes))
+    rng = np.random.default_rng(seed)
+    fold = np.empty(len(codes), dtype=np.int64)
+    for code in np.unique(codes):
+        rows = rng.permutation(np.nonzero(codes == code)[0])
+        fold[rows] = (np.arange(len(rows)) + rng.integers(folds)) % folds
+    return fold
+
+
+def neighbor_table(vectors: np.ndarray, fold: np.ndarray, max_k: int,
+                   tile_rows: int = TILE_ROWS, tile_cols: int = TILE_COLS) -> tuple[np.ndarray, np.ndarray]:
+    """Indices and scores of every row's ``max_k`` nearest rows outside its fold, best first."""
+    n = vectors.shape[0]
+    max_k = max(0, min(max_k, n - 1))
+    indices = np.full((n, max_k), -1, dtype=np.int64)
+    scores = np.full((n, max_k), -np.inf, dtype=np.float32)
+    for r0, idx, sims in iter_topk(vectors, vectors, max_k, tile_rows=tile_rows, tile_cols=tile_cols,
+                                   groups=(fold, fold)):
+        r1 = r0 + idx.shape[0]
+        indices[r0:r1, :idx.shape[1]] = np.where(np.isfinite(sims), idx, -1)
+        scores[r0:r1, :idx.shape[1]] = sims
+    return indices, scores
+
+
+def sweep(codes: np.ndarray, n_labels: int, indices: np.ndarray, scores: np.ndarray,
+          max_k: int | None = None) -> list[dict]:
+    """Accuracy and voting time of every ``k <= max_k`` and rule on a neighbour table."""
+    max_k = indices.shape[1] if max_k is None else min(max_k, indices.shape[1])
+    neighbor_codes = np.where(indices >= 0, codes[np.maximum(indices, 0)], -1).astype(np.int32)
+    support = np.bincount(codes, minlength=n_labels)
+    n = max(1, len(codes))
+    results = []
+    for k in range(1, max_k + 1):
+        for rule, vote in RULES.items():
+            hits = np.zeros(n_labels, dtype=np.int64)
+            elapsed = 0.0
+            for r0 in range(0, len(codes), VOTE_ROWS):
+                r1 = min(r0 + VOTE_ROWS, len(codes))
+                started = time.perf_counter()
+                winners = vote(neighbor_codes[r0:r1, :k], scores[r0:r1, :k], n_labels)
+                elapsed += time.perf_counter() - started
+                voted = neighbor_codes[r0:r1, 0] >= 0
+                correct = voted & (winners == codes[r0:r1])
+                hits += np.bincount(codes[r0:r1][correct], minlength=n_labels)
+            present = support > 0
+            results.append({
+                "k": k,
+                "rule": rule,
+                "accuracy": float(hits.sum() / n),
+                "balanced_accuracy": float(np.mean(hits[present] / support[present])) if present.any() else 0.0,
+                "vote_us_per_query": elapsed / n * 1e6,
+            })
+    return results
+
+
+def best_setting(results: list[dict]) -> dict | None:
+    """Highest accuracy; ties go to the smaller ``k``, then to ``majority``."""
+    order = list(RULES)
+    return min(results, key=lambda r: (-r["accuracy"], r["k"], order.index(r["rule"])), default=None)
+
+
+def sweep_store(store: EmbeddingStore, max_k: int = DEFAULT_MAX_K, folds: int = DEFAULT_FOLDS, seed: int = 0,
+                **tiles) -> dict:
+    rows = [i for i, label in enumerate(store.labels) if label is not None]
+    vectors = store.vectors[rows] if len(rows) != len(store) else store.vectors
+    classes, codes = np.unique(np.asarray([store.labels[i] for i in rows], dtype=object), return_inverse=True)
+    codes = codes.astype(np.int64)
+    fold = assign_folds(codes, folds, seed)
+
+    started = time.perf_counter()
+    indices, scores = neighbor_table(vectors, fold, max_k, **tiles)
+    search = time.perf_counter() - started
+    results = sweep(codes, len(classes), indices, scores)
+    return {
+        "documents": len(rows),
+        "labels": [str(label) for label in classes],
+        "folds": folds if folds >= 2 else "leave-one-out",
+        "max_k": indices.shape[1],
+        "search_seconds": search,
+        "search_us_per_query": search / max(1, len(rows)) * 1e6,
+        "results": results,
+        "best": best_setting(results),
+    }
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Sweep k and the voting rule of the KNN classifier in one search.")
+    parser.add_argument("embeddings", help="Embedding store, embeddings/ folder or batch JSON file")
+    parser.add_argument("--max-k", type=int, default=DEFAULT_MAX_K,
+                        help=f"Largest k to evaluate (default: {DEFAULT_MAX_K})")
+    parser.add_argument("--folds", type=int, default=DEFAULT_FOLDS,
+                        help=f"Cross-validation folds, 0 for leave-one-out (default: {DEFAULT_FOLDS})")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--out", help="Write the table as JSON")
+    parser.add_argument("--tile-rows", type=int, default=TILE_ROWS)
+    parser.add_argument("--tile-cols", type=int, default=TILE_COLS)
+    args = parser.parse_args(argv)
+
+    store = load_embeddings(args.embeddings)
+    report = sweep_store(store, args.max_k, args.folds, args.seed,
+                         tile_rows=args.tile_rows, tile_cols=args.tile_cols)
+    if report["best"] is None:
+        print(f"⚠️ Not enough labeled documents in {args.embeddings} to sweep")
+        return
+
+    print(f"🔍 Top-{report['max_k']} neighbours of {report['documents']} labeled documents "
+          f"({report['folds']} folds) in {report['search_seconds']:.2f}s, "
+          f"{report['search_us_per_query']:.1f}µs per query")
+    print(f"{'k':>3}  {'rule':<9} {'accuracy':>9} {'balanced':>9} {'vote µs/query':>14}")
+    for r in report["results"]:
+        print(f"{r['k']:>3}  {r['rule']:<9} {r['accuracy']:>9.2%} {r['balanced_accuracy']:>9.2%} "
+              f"{r['vote_us_per_query']:>14.2f}")
+    best = report["best"]
+    print(f"🎯 Best: k={best['k']} {best['rule']} with {best['accuracy']:.2%} "
+          f"(Program.cs uses k=3 majority)")
+
+    if args.out:
+        tmp = args.out + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, args.out)
+        print(f"📄 Table saved to: {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""IVF index: recall against brute force and staleness after a store rewrite."""
+
+import numpy as np
+import pytest
+
+from invoice_tools.ann import IVFIndex, index_path
+from invoice_tools.knn import KnnClassifier
+from invoice_tools.store import EmbeddingStore, write_store
+
+
+def clustered(n, dim=16, clusters=12, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim))
+    return (centers[rng.integers(0, clusters, size=n)] + rng.normal(scale=0.3, size=(n, dim))).astype(np.float32)
+
+
+def test_all_lists_probed_is_exact_and_few_lists_keep_recall():
+    vectors = clustered(2000)
+    queries = clustered(100, seed=1)
+    index = IVFIndex.build(vectors, nlist=32, seed=0)
+    labels = [str(i % 5) for i in range(len(vectors))]
+    filenames = [f"doc{i}.pdf" for i in range(len(vectors))]
+    exact = KnnClassifier(k=5).fit(vectors, labels, filenames).kneighbors(queries)[0]
+
+    np.testing.assert_array_equal(index.search(queries, 5, nprobe=index.nlist)[0], exact)
+    assert index.recall(queries, 5, nprobe=8) >= 0.9
+    nprobe, report = index.tune_nprobe(queries, 5, target_recall=0.99)
+    assert report[-1]["nprobe"] == nprobe and report[-1]["recall"] >= 0.99
+
+
+def test_index_of_an_earlier_write_of_the_store_is_refused(tmp_path):
+    path = str(tmp_path / "train.store")
+    vectors = clustered(300)
+    labels = [str(i % 3) for i in range(300)]
+    names = [f"doc{i}.pdf" for i in range(300)]
+    store = write_store(path, names, labels, vectors)
+    IVFIndex.build(store.vectors, nlist=8).save(index_path(store), store.generation)
+    assert len(IVFIndex.load(index_path(store), store.vectors, store.generation)) == 300
+
+    # Same row count, re-embedded documents
+    store = write_store(path, names, labels, clustered(300, seed=2))
+    with pytest.raises(ValueError, match="rebuild"):
+        IVFIndex.load(index_path(store), store.vectors, store.generation)
+    assert EmbeddingStore.open(path).generation == store.generation
@@ -0,0 +1,70 @@
+"""Leave-one-out audit of the labels in a store."""
+
+import csv
+import os
+
+import numpy as np
+import pytest
+
+from invoice_tools.audit import audit_store, build_report, confusion_matrix, leave_one_out, suspicious, write_loo_csv
+from invoice_tools.store import write_store
+
+MISLABELED = [3, 17]
+
+
+@pytest.fixture
+def labeled():
+    """Three tight clusters of ten documents each, with two wrong labels."""
+    rng = np.random.default_rng(1)
+    centers = np.eye(3, 8, dtype=np.float32) * 10
+    vectors = np.vstack([c + rng.normal(scale=0.1, size=(10, 8)) for c in centers]).astype(np.float32)
+    labels = [name for name in ("craftsman", "healthcare", "upwork") for _ in range(10)]
+    labels[3], labels[17] = "upwork", "craftsman"
+    filenames = [f"{i}.pdf" for i in range(30)]
+    return vectors, labels, filenames
+
+
+def test_mislabeled_documents_are_predicted_as_their_cluster(labeled):
+    vectors, labels, filenames = labeled
+    result = leave_one_out(vectors, labels, filenames, k=3, tile_rows=7, tile_cols=4)
+    predicted = [str(result.classes[p]) for p in result.predicted]
+    assert predicted == [name for name in ("craftsman", "healthcare", "upwork") for _ in range(10)]
+    assert not (result.top_neighbor == np.arange(30)).any()
+    assert set(suspicious(result, top=2)) == set(MISLABELED)
+
+
+def test_confusion_matrix_and_report_count_every_row(labeled):
+    vectors, labels, filenames = labeled
+    result = leave_one_out(vectors, labels, filenames, k=3)
+    matrix = confusion_matrix(result)
+    assert matrix.sum() == 30
+    assert matrix.sum(axis=1).tolist() == [10, 9, 11]  # support of the given labels
+    assert np.trace(matrix) == 28
+
+    report = build_report(result, k=3, top=5)
+    assert report["evaluated"] == 30 and report["accuracy"] == pytest.approx(28 / 30)
+    flagged = {entry["filename"]: entry for entry in report["suspicious"][:2]}
+    assert flagged["3.pdf"]["label"] == "upwork" and flagged["3.pdf"]["predicted"] == "craftsman"
+    assert flagged["17.pdf"]["conflicting_neighbor"]["label"] == "healthcare"
+
+
+def test_audit_store_skips_unlabeled_rows(labeled, tmp_path):
+    vectors, labels, filenames = labeled
+    labels = list(labels)
+    labels[0] = None
+    store = write_store(str(tmp_path / "train.store"), filenames, labels, vectors)
+    result = audit_store(store, k=3)
+    assert result.filenames == filenames[1:]
+
+    path = os.path.join(tmp_path, "loo.csv")
+    write_loo_csv(path, result)
+    with open(path, encoding="utf-8", newline="") as f:
+        rows = list(csv.DictReader(f))
+    assert len(rows) == 29
+    assert rows[2]["Filename"] == "3.pdf" and rows[2]["PredictedLabel"] == "craftsman"
+
+
+def test_mismatched_lengths_are_rejected(labeled):
+    vectors, labels, filenames = labeled
+    with pytest.raises(ValueError):
+        leave_one_out(vectors, labels[:-1], filenames)
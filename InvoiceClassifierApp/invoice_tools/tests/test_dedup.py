@@ -0,0 +1,62 @@
+"""MinHash grouping of near-duplicate documents."""
+
+import numpy as np
+import pytest
+
+from invoice_tools.dedup import MinHashIndex, representatives, shingles
+
+
+def words(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return [f"w{i}" for i in rng.integers(0, 5000, n)]
+
+
+def edit(text, start, prefix, every=25):
+    """Change every ``every``-th word from ``start`` on."""
+    return [prefix + w if i >= start and (i - start) % every == 0 else w for i, w in enumerate(text)]
+
+
+def jaccard(a, b):
+    a, b = shingles(" ".join(a)), shingles(" ".join(b))
+    return len(a & b) / len(a | b)
+
+
+def test_near_copies_share_a_head_and_unrelated_documents_do_not():
+    original = words(300)
+    texts = [
+        " ".join(original),
+        " ".join(words(300, seed=1)),
+        "Original " + " ".join(original).upper() + ".",  # normalized like keywords
+        "",
+        " ".join(edit(original, 0, "x", every=50)),
+    ]
+    assert representatives(texts, threshold=0.8) == [0, 1, 0, 3, 0]
+
+
+def test_members_are_compared_with_the_head_not_with_each_other():
+    head = words(300)
+    member = edit(head, 0, "x")
+    drifted = edit(member, 12, "y")
+    assert jaccard(head, member) > 0.75 and jaccard(member, drifted) > 0.75
+    assert jaccard(head, drifted) < 0.65
+    assert representatives([" ".join(t) for t in (head, member, drifted)], threshold=0.7) == [0, 0, 2]
+
+
+def test_duplicate_pairs_with_containment():
+    page = words(200)
+    index = MinHashIndex()
+    assert index.add("empty.pdf", "  ") is None
+    index.add("page.pdf", " ".join(page))
+    index.add("split.pdf", " ".join(page + words(40, seed=2)))
+    index.add("other.pdf", " ".join(words(200, seed=3)))
+    assert len(index) == 3
+
+    (pair,) = index.duplicates(threshold=0.7)
+    assert (index.keys[pair.a], index.keys[pair.b]) == ("page.pdf", "split.pdf")
+    assert pair.jaccard == pytest.approx(jaccard(page, page + words(40, seed=2)), abs=0.1)
+    assert pair.containment > 0.9
+
+
+def test_bands_must_divide_the_signature():
+    with pytest.raises(ValueError):
+        MinHashIndex(num_perm=100, bands=32)
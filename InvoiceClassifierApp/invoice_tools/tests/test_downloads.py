@@ -0,0 +1,67 @@
+"""Per-label ZIPs streamed from the invoice folders."""
+
+import io
+import os
+import zipfile
+
+from werkzeug.datastructures import Headers
+from werkzeug.http import parse_options_header
+
+from invoice_tools.downloads import attachment_filename, label_members, stream_zip, zip_etag
+
+
+def setup_folders(tmp_path):
+    invoices, output = tmp_path / "Invoices", tmp_path / "output"
+    invoices.mkdir()
+    (output / "upwork").mkdir(parents=True)
+    (invoices / "march invoice.pdf").write_bytes(b"%PDF march" * 1000)
+    (invoices / "other.pdf").write_bytes(b"%PDF other")
+    (output / "upwork" / "archived.pdf").write_bytes(b"%PDF archived")
+    csv_path = tmp_path / "predictions.csv"
+    csv_path.write_text("Filename,PredictedLabel,SimilarityScore,TopNeighbor\n"
+                        "march_invoice.pdf,upwork,0.9,a.pdf\n"
+                        "archived.pdf,upwork,0.8,b.pdf\n"
+                        "other.pdf,healthcare,0.7,c.pdf\n", encoding="utf-8")
+    return str(csv_path), str(invoices), str(output)
+
+
+def test_zip_holds_the_label_members_read_from_their_sources(tmp_path):
+    csv_path, invoices, output = setup_folders(tmp_path)
+    members = label_members("upwork", csv_path, invoices, output)
+    assert [(m.arcname, os.path.basename(m.path)) for m in members] == [
+        ("march_invoice.pdf", "march invoice.pdf"), ("archived.pdf", "archived.pdf")]
+
+    for compression in ("stored", "deflate"):
+        data = b"".join(stream_zip(members, compression, chunk_size=1024))
+        with zipfile.ZipFile(io.BytesIO(data)) as archive:
+            assert archive.testzip() is None
+            assert archive.read("march_invoice.pdf") == b"%PDF march" * 1000
+            assert archive.read("archived.pdf") == b"%PDF archived"
+
+
+def test_unknown_and_escaping_labels_are_refused(tmp_path):
+    csv_path, invoices, output = setup_folders(tmp_path)
+    assert label_members("missing", csv_path, invoices, output) is None
+    assert label_members("../Invoices", csv_path, invoices, output) is None
+    assert label_members("..", csv_path, invoices, output) is None
+
+
+def test_etag_follows_member_changes(tmp_path):
+    csv_path, invoices, output = setup_folders(tmp_path)
+    members = label_members("upwork", csv_path, invoices, output)
+    etag = zip_etag(members)
+    assert zip_etag(label_members("upwork", csv_path, invoices, output)) == etag
+    assert zip_etag(members, "deflate") != etag
+
+    with open(os.path.join(invoices, "march invoice.pdf"), "ab") as f:
+        f.write(b"amended")
+    assert zip_etag(label_members("upwork", csv_path, invoices, output)) != etag
+
+
+def test_attachment_filename_survives_quotes_and_non_ascii():
+    for name in ['a"b; filename=x.zip', "Rechnungen Müller.zip"]:
+        headers = Headers()
+        headers.set("Content-Disposition", "attachment", **attachment_filename(name))
+        value, options = parse_options_header(headers["Content-Disposition"])
+        assert value == "attachment"
+        assert options["filename"] == name or options.get("filename*") == name
@@ -0,0 +1,83 @@
+"""Text pre-extraction: the text cache and the ``.pdf.txt`` siblings."""
+
+import os
+
+import pytest
+
+from invoice_tools.extract import TextCache, extract_all, scan_sources, write_text_siblings
+
+pytest.importorskip("pypdf")
+
+
+def write_pdf(path, text):
+    """A one-page PDF showing ``text``."""
+    stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET".encode()
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents 4 0 R "
+        b"/Resources << /Font << /F1 5 0 R >> >> >>",
+        b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for i, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (i, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % o for o in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+@pytest.fixture
+def folders(tmp_path):
+    train, invoices = tmp_path / "TrainData", tmp_path / "Invoices"
+    (train / "Healthcare").mkdir(parents=True)
+    invoices.mkdir()
+    write_pdf(train / "Healthcare" / "clinic.pdf", "Clinic visit")
+    (train / "Healthcare" / "note.txt").write_text("Pharmacy receipt", encoding="utf-8")
+    write_pdf(invoices / "new.pdf", "Upwork contract")
+    return str(train), str(invoices)
+
+
+def test_unchanged_files_come_from_the_cache(folders, tmp_path):
+    train, invoices = folders
+    cache = str(tmp_path / "cache")
+    documents, stats = extract_all(scan_sources(train, invoices), TextCache(cache), workers=1)
+    assert (stats["parsed"], stats["text"], stats["failed"]) == (2, 1, 0)
+    by_name = {d.filename: d for d in documents}
+    assert by_name["clinic.pdf"].label == "healthcare" and "Clinic visit" in by_name["clinic.pdf"].text
+    assert by_name["new.pdf"].label is None
+
+    _, stats = extract_all(scan_sources(train, invoices), TextCache(cache), workers=1)
+    assert (stats["parsed"], stats["cached"]) == (0, 2)
+
+    pdf = os.path.join(invoices, "new.pdf")
+    os.utime(pdf, ns=(0, 0))  # same bytes, new mtime
+    _, stats = extract_all(scan_sources(train, invoices), TextCache(cache), workers=1)
+    assert (stats["parsed"], stats["rehashed"], stats["cached"]) == (0, 1, 1)
+
+    write_pdf(pdf, "Upwork invoice")
+    documents, stats = extract_all(scan_sources(train, invoices), TextCache(cache), workers=1)
+    assert stats["parsed"] == 1
+    assert "Upwork invoice" in {d.filename: d for d in documents}["new.pdf"].text
+
+
+def test_siblings_are_output_not_sources(folders, tmp_path):
+    train, invoices = folders
+    documents, _ = extract_all(scan_sources(train, invoices), TextCache(str(tmp_path / "cache")), workers=1)
+    assert write_text_siblings(documents) == 2
+    pdf = os.path.join(invoices, "new.pdf")
+    assert os.stat(pdf + ".txt").st_mtime_ns >= os.stat(pdf).st_mtime_ns
+
+    sources = scan_sources(train, invoices)
+    assert sorted(s.filename for s in sources) == ["clinic.pdf", "new.pdf", "note.txt"]
+    assert all(not s.path.endswith(".pdf.txt") for s in sources)
+    assert write_text_siblings(documents) == 0  # unchanged text is not rewritten
+
+    os.remove(pdf)  # a sibling without its PDF is an invoice of its own
+    assert [s.filename for s in scan_sources(None, invoices)] == ["new.pdf"]
@@ -0,0 +1,88 @@
+"""Background jobs, shared between queues the way Flask worker processes share them."""
+
+import sys
+import time
+
+import pytest
+
+from invoice_tools.jobs import CANCELLED, FINISHED_STATES, RUNNING, SUCCEEDED, JobQueue, count_lines_progress
+
+
+def python(code):
+    return [sys.executable, "-c", code]
+
+
+def wait_for(queue, job_id, states=FINISHED_STATES, timeout=20.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = queue.get(job_id)
+        if job is not None and job.status in states:
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f"job {job_id} did not reach {states}")
+
+
+@pytest.fixture
+def queues(tmp_path):
+    # Two queues on one state_dir stand in for two worker processes
+    first, second = JobQueue(workers=2, state_dir=str(tmp_path)), JobQueue(workers=2, state_dir=str(tmp_path))
+    yield first, second
+    first.shutdown()
+    second.shutdown()
+
+
+def test_job_reports_log_and_progress():
+    queue = JobQueue(workers=1)
+    try:
+        job, created = queue.submit("classify", python("for i in range(4): print('Classified', i)"),
+                                    progress=count_lines_progress("Classified", 4))
+        assert created
+        job = wait_for(queue, job.id)
+        assert job.status == SUCCEEDED and job.progress == 1.0
+        assert job.log_since(2) == (["Classified 2", "Classified 3"], 4)
+    finally:
+        queue.shutdown()
+
+
+def test_identical_job_is_reused_across_queues(queues):
+    first, second = queues
+    job, _ = first.submit("match", python("import time; time.sleep(1)"))
+    again, created = second.submit("match", python("import time; time.sleep(1)"))
+    assert not created and again.id == job.id
+    assert wait_for(second, job.id).status == SUCCEEDED
+    _, created = second.submit("match", python("import time; time.sleep(1)"))
+    assert created  # finished jobs are not reused
+
+
+def test_jobs_sharing_a_lock_never_overlap_across_queues(queues):
+    first, second = queues
+    a, _ = first.submit("classify", python("import time; time.sleep(0.8)"), lock="pipeline")
+    wait_for(first, a.id, {RUNNING})
+    b, _ = second.submit("match", python("print('done')"), lock="pipeline")
+    a, b = wait_for(first, a.id), wait_for(second, b.id)
+    assert (a.status, b.status) == (SUCCEEDED, SUCCEEDED)
+    assert b.started >= a.finished
+
+
+def test_cancel_from_another_queue_terminates_the_command(queues):
+    first, second = queues
+    job, _ = first.submit("classify", python("import time; print('started', flush=True); time.sleep(30)"))
+    wait_for(first, job.id, {RUNNING})
+    time.sleep(0.3)
+    started = time.monotonic()
+    assert second.cancel(job.id)
+    assert wait_for(first, job.id).status == CANCELLED
+    assert time.monotonic() - started < 10
+    assert second.get(job.id).status == CANCELLED
+
+
+def test_cancel_of_a_job_waiting_for_another_queues_lock(queues):
+    first, second = queues
+    holder, _ = first.submit("classify", python("import time; time.sleep(1.5)"), lock="pipeline")
+    wait_for(first, holder.id, {RUNNING})
+    waiting, _ = second.submit("match", python("print('never')"), lock="pipeline")
+    time.sleep(0.3)
+    assert first.cancel(waiting.id)
+    assert wait_for(second, waiting.id).status == CANCELLED
+    assert wait_for(first, holder.id).status == SUCCEEDED
+    assert second.get(waiting.id).returncode is None  # never started
@@ -0,0 +1,59 @@
+"""Parity of the vectorized KNN with the LINQ pipeline of ``KnnClassifier.cs``."""
+
+import numpy as np
+import pytest
+
+from invoice_tools.knn import KnnClassifier, top_k, vote_majority
+
+
+def linq_neighbors(scores, k):
+    """``OrderByDescending(x => x.Score).Take(k)``: a stable sort, ties keep training order."""
+    return sorted(range(len(scores)), key=lambda j: -scores[j])[:k]
+
+
+def linq_vote(labels, scores):
+    """``GroupBy(Label)`` in first-seen order, then ``OrderByDescending(Count).ThenByDescending(TotalScore)``."""
+    groups = {}
+    for label, score in zip(labels, scores):
+        count, total = groups.get(label, (0, 0.0))
+        groups[label] = (count + 1, total + score)
+    return sorted(groups, key=lambda label: (-groups[label][0], -groups[label][1]))[0]
+
+
+@pytest.mark.parametrize("k", [1, 3, 5, 8])
+def test_top_k_matches_stable_order_with_ties(k):
+    rng = np.random.default_rng(k)
+    # Few distinct values, so most rows have ties straddling the k-th place
+    scores = rng.integers(0, 4, size=(200, 12)).astype(np.float32)
+    indices, top = top_k(scores, k)
+    for row, idx, s in zip(scores, indices, top):
+        expected = linq_neighbors(row, k)
+        assert idx.tolist() == expected
+        assert s.tolist() == row[expected].tolist()
+
+
+def test_vote_majority_matches_linq_grouping():
+    rng = np.random.default_rng(0)
+    codes = rng.integers(0, 3, size=(500, 5))
+    scores = rng.integers(1, 4, size=(500, 5)).astype(np.float64) / 4
+    winners = vote_majority(codes, scores, 3)
+    for w, c, s in zip(winners, codes, scores):
+        assert w == linq_vote(c.tolist(), s.tolist())
+
+
+def test_classifier_matches_reference_on_duplicate_training_vectors():
+    rng = np.random.default_rng(1)
+    base = rng.normal(size=(6, 8))
+    # Every training vector appears several times under different labels: all neighbours tie
+    train = base[rng.integers(0, len(base), size=40)]
+    labels = [f"label{i}" for i in rng.integers(0, 4, size=len(train))]
+    filenames = [f"doc{i}.pdf" for i in range(len(train))]
+    queries = base[rng.integers(0, len(base), size=30)] + rng.normal(scale=0.05, size=(30, 8))
+    classifier = KnnClassifier(k=3, dtype=np.float64).fit(train, labels, filenames)
+
+    matrix = train / np.linalg.norm(train, axis=1, keepdims=True)
+    for query, prediction in zip(queries, classifier.predict_batch(queries)):
+        scores = matrix @ (query / np.linalg.norm(query))
+        neighbors = linq_neighbors(scores, 3)
+        assert prediction.top_neighbor == filenames[neighbors[0]]
+        assert prediction.label == linq_vote([labels[j] for j in neighbors], scores[neighbors].tolist())
@@ -0,0 +1,63 @@
+"""Reading ``predictions.csv`` as written by ``Program.cs``."""
+
+import os
+
+import numpy as np
+import pytest
+
+from invoice_tools.predictions import iter_predictions, read_predictions, write_predictions_csv
+
+
+def test_mixed_decimal_separators_are_repaired_row_by_row(tmp_path):
+    path = str(tmp_path / "predictions.csv")
+    write_predictions_csv(path, [("a.pdf", "upwork", 0.91394, "x.pdf"), ("b.pdf", "craftsman", 0.5, "y.pdf")])
+    with open(path, "a", encoding="utf-8", newline="") as f:
+        f.write('"c.pdf","healthcare",0,8125,"z.pdf"\n')
+        f.write('"d.pdf","upwork",n/a,"w.pdf"\n')
+
+    chunks = list(iter_predictions(path, chunk_rows=2))
+    assert len(chunks) == 2
+    frame = read_predictions(path, chunk_rows=3)
+    assert frame["Filename"].tolist() == ["a.pdf", "b.pdf", "c.pdf", "d.pdf"]
+    assert frame["TopNeighbor"].tolist() == ["x.pdf", "y.pdf", "z.pdf", "w.pdf"]
+    assert frame["SimilarityScore"].dtype == np.float32
+    np.testing.assert_allclose(frame["SimilarityScore"][:3], [0.9139, 0.5, 0.8125], rtol=1e-6)
+    assert np.isnan(frame["SimilarityScore"][3])
+
+
+def test_start_offset_reads_only_appended_rows(tmp_path):
+    path = str(tmp_path / "predictions.csv")
+    write_predictions_csv(path, [("a.pdf", "upwork", 0.9, "x.pdf")])
+    offset = os.path.getsize(path)
+    assert list(iter_predictions(path, start=offset)) == []
+    with open(path, "a", encoding="utf-8", newline="") as f:
+        f.write('"b.pdf","craftsman",0,75,"y.pdf"\n')
+    (frame,) = iter_predictions(path, start=offset)
+    assert frame["Filename"].tolist() == ["b.pdf"]
+    assert frame["SimilarityScore"].tolist() == [0.75]
+
+
+def test_header_only_and_foreign_files(tmp_path):
+    path = str(tmp_path / "predictions.csv")
+    write_predictions_csv(path, [])
+    frame = read_predictions(path)
+    assert len(frame) == 0 and list(frame.columns)[:4] == ["Filename", "PredictedLabel", "SimilarityScore", "TopNeighbor"]
+
+    other = tmp_path / "other.csv"
+    other.write_text("Name,Value\nx,1\n")
+    with pytest.raises(ValueError):
+        list(iter_predictions(str(other)))
+
+
+def test_parquet_cache_follows_the_csv(tmp_path):
+    pytest.importorskip("pyarrow")
+    path = str(tmp_path / "predictions.csv")
+    cache = str(tmp_path / "cache")
+    write_predictions_csv(path, [("a.pdf", "upwork", 0.9, "x.pdf")])
+    first = read_predictions(path, cache_dir=cache)
+    assert len(os.listdir(cache)) == 1
+    assert read_predictions(path, cache_dir=cache).equals(first)
+
+    write_predictions_csv(path, [("a.pdf", "upwork", 0.9, "x.pdf"), ("b.pdf", "craftsman", 0.8, "y.pdf")])
+    os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 1_000_000))
+    assert len(read_predictions(path, cache_dir=cache)) == 2
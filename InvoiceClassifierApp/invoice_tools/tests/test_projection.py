@@ -0,0 +1,50 @@
+"""Cached PCA projections: reuse, incremental transforms and refits."""
+
+import re
+
+import numpy as np
+import pytest
+
+from invoice_tools.projection import ProjectionCache
+
+pytest.importorskip("sklearn")
+
+
+def projected(capsys):
+    """(rows reused, rows projected, refitted) of the last fit_transform."""
+    out = capsys.readouterr().out
+    reused, new = map(int, re.search(r"reused (\d+) cached coordinates, projected (\d+)", out).groups())
+    return reused, new, "Fitting" in out
+
+
+def test_only_new_rows_are_projected_until_the_fit_set_changes(tmp_path, capsys):
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(120, 10)).astype(np.float32)
+    names = [f"doc{i}.pdf" for i in range(120)]
+    cache = ProjectionCache(str(tmp_path), refit_growth=0.5)
+
+    first = cache.fit_transform("pca", vectors[:100], names[:100])
+    assert projected(capsys) == (0, 100, True)
+    np.testing.assert_array_equal(cache.fit_transform("pca", vectors[:100], names[:100]), first)
+    assert projected(capsys) == (100, 0, False)
+
+    grown = cache.fit_transform("pca", vectors, names)
+    assert projected(capsys) == (100, 20, False)
+    np.testing.assert_array_equal(grown[:100], first)
+
+    changed = vectors.copy()
+    changed[3] += 1
+    cache.fit_transform("pca", changed, names)
+    assert projected(capsys) == (0, 120, True)
+
+
+def test_growth_past_the_limit_refits(tmp_path, capsys):
+    rng = np.random.default_rng(1)
+    vectors = rng.normal(size=(50, 6)).astype(np.float32)
+    names = [f"doc{i}.pdf" for i in range(50)]
+    cache = ProjectionCache(str(tmp_path), refit_growth=0.5)
+    cache.fit_transform("pca", vectors[:20], names[:20], n_components=3)
+    capsys.readouterr()
+    points = cache.fit_transform("pca", vectors, names, n_components=3)
+    assert points.shape == (50, 3)
+    assert projected(capsys) == (0, 50, True)
@@ -0,0 +1,58 @@
+"""Per-label prototypes against the full KNN classifier."""
+
+import numpy as np
+import pytest
+
+from invoice_tools.knn import UNKNOWN, KnnClassifier
+from invoice_tools.prototypes import PrototypeClassifier, prototypes_path
+from invoice_tools.store import write_store
+
+
+@pytest.fixture
+def training():
+    """Label "a" with 60 rows around three directions, label "b" with 5 rows."""
+    rng = np.random.default_rng(0)
+    centers = rng.normal(size=(4, 32))
+    big = np.vstack([centers[c] + rng.normal(scale=0.05, size=(20, 32)) for c in range(3)])
+    small = centers[3] + rng.normal(scale=0.3, size=(5, 32))
+    vectors = np.vstack([big, small]).astype(np.float32)
+    labels = ["a"] * 60 + ["b"] * 5
+    return vectors, labels, [f"{i}.pdf" for i in range(65)]
+
+
+def test_large_labels_are_compressed_and_small_ones_kept(training):
+    vectors, labels, filenames = training
+    prototypes = PrototypeClassifier.fit(vectors, labels, filenames, per_label=5)
+    codes = prototypes.codes.tolist()
+    assert codes.count(1) == 5 and 3 <= codes.count(0) <= 5
+    assert prototypes.counts[prototypes.codes == 0].sum() == 60
+    np.testing.assert_allclose(np.linalg.norm(prototypes.centroids, axis=1), 1, rtol=1e-5)
+    small = [r for r, c in zip(prototypes.representatives, codes) if c == 1]
+    assert sorted(small) == sorted(filenames[60:])
+
+
+def test_predictions_agree_with_knn(training):
+    vectors, labels, filenames = training
+    rng = np.random.default_rng(1)
+    queries = (vectors[rng.integers(0, 65, 40)] + rng.normal(scale=0.05, size=(40, 32))).astype(np.float32)
+    expected = KnnClassifier(k=1).fit(vectors, labels, filenames).predict_batch(queries)
+    predicted = PrototypeClassifier.fit(vectors, labels, filenames, per_label=5).predict_batch(queries)
+    assert [p.label for p in predicted] == [p.label for p in expected]
+    small = [i for i, p in enumerate(expected) if p.label == "b"]
+    assert small
+    # Labels with at most per_label documents keep all of them
+    assert [predicted[i].top_neighbor for i in small] == [expected[i].top_neighbor for i in small]
+    np.testing.assert_allclose([predicted[i].score for i in small], [expected[i].score for i in small], rtol=1e-5)
+
+
+def test_save_load_and_other_models(training, tmp_path):
+    vectors, labels, filenames = training
+    store = write_store(str(tmp_path / "train.store"), filenames + ["new.pdf"], labels + [None],
+                        np.vstack([vectors, vectors[:1]]))
+    prototypes = PrototypeClassifier.from_store(store, per_label=5)
+    path = prototypes_path(store, 5)
+    prototypes.save(path)
+    loaded = PrototypeClassifier.load(path)
+    np.testing.assert_array_equal(loaded.centroids, prototypes.centroids)
+    assert loaded.predict(vectors[62]) == prototypes.predict(vectors[62])
+    assert loaded.predict(np.ones(8, dtype=np.float32)) == UNKNOWN
@@ -0,0 +1,37 @@
+"""Quantized codes: recall of the re-ranked search and staleness after a store rewrite."""
+
+import numpy as np
+import pytest
+
+from invoice_tools.ann import _recall
+from invoice_tools.knn import KnnClassifier
+from invoice_tools.quantize import QuantizedIndex, quantized_path
+from invoice_tools.store import write_store
+
+
+@pytest.mark.parametrize("kind", ["int8", "float16"])
+def test_reranked_scores_are_exact_and_recall_is_high(kind):
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(3000, 32)).astype(np.float32)
+    queries = rng.normal(size=(50, 32)).astype(np.float32)
+    index = QuantizedIndex.build(vectors, kind)
+    brute = KnnClassifier(k=5).fit(vectors, ["x"] * len(vectors), [str(i) for i in range(len(vectors))])
+    exact_idx, exact_scores = brute.kneighbors(queries)
+
+    idx, scores = index.search(queries, 5)
+    assert _recall(idx, exact_idx) >= 0.95
+    found = idx == exact_idx
+    np.testing.assert_allclose(scores[found], exact_scores[found], rtol=1e-5)
+
+
+def test_codes_of_an_earlier_write_of_the_store_are_refused(tmp_path):
+    rng = np.random.default_rng(1)
+    path = str(tmp_path / "train.store")
+    names, labels = [f"doc{i}.pdf" for i in range(200)], ["a", "b"] * 100
+    store = write_store(path, names, labels, rng.normal(size=(200, 8)))
+    QuantizedIndex.build(store.vectors, "int8").save(quantized_path(store, "int8"), store.generation)
+    assert len(QuantizedIndex.load(quantized_path(store, "int8"), store.vectors, store.generation)) == 200
+
+    store = write_store(path, names, labels[::-1], rng.normal(size=(200, 8)))
+    with pytest.raises(ValueError, match="rebuild"):
+        QuantizedIndex.load(quantized_path(store, "int8"), store.vectors, store.generation)
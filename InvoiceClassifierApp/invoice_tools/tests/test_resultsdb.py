@@ -0,0 +1,74 @@
+"""Keyset pagination and filters of the indexed predictions table."""
+
+import pytest
+
+from invoice_tools.resultsdb import ResultsDB
+
+HEADER = "Filename,PredictedLabel,SimilarityScore,TopNeighbor\n"
+
+
+def rows_csv(rows):
+    return "".join(f"{f},{label},{score},{top}\n" for f, label, score, top in rows)
+
+
+@pytest.fixture
+def db(tmp_path):
+    rows = [(f"inv{i:03d}.pdf", ["upwork", "healthcare", "craftsman"][i % 3], f"0,{i % 10}5", "t.pdf")
+            for i in range(95)]
+    rows.append(("inv007.pdf", "craftsman", "0.99", "t.pdf"))  # listed twice: the last row wins
+    csv_path = tmp_path / "predictions.csv"
+    csv_path.write_text(HEADER + rows_csv(rows), encoding="utf-8")
+    results = ResultsDB(str(tmp_path / "predictions.db"), str(csv_path))
+    assert results.sync() == 96
+    assert results.sync() is None
+    return results, csv_path
+
+
+def all_pages(results, **query):
+    rows, cursor = [], None
+    while True:
+        page = results.query(limit=7, cursor=cursor, **query)
+        rows += page.rows
+        if page.next_cursor is None:
+            return rows
+        cursor = page.next_cursor
+
+
+@pytest.mark.parametrize("order", ["filename", "score", "-score"])
+def test_pages_cover_every_row_once_in_order(db, order):
+    results, _ = db
+    rows = all_pages(results, order=order)
+    assert len(rows) == 95 and len({r["filename"] for r in rows}) == 95
+    keys = [(r["score"], r["filename"]) if order != "filename" else r["filename"] for r in rows]
+    assert keys == sorted(keys, reverse=order == "-score")
+
+
+def test_filters_and_counts(db):
+    results, _ = db
+    row = all_pages(results, prefix="inv007")[0]
+    assert (row["label"], row["score"]) == ("craftsman", 0.99)
+    healthcare = all_pages(results, label="healthcare", min_score=0.5, order="-score")
+    assert healthcare and all(r["label"] == "healthcare" and r["score"] >= 0.5 for r in healthcare)
+    assert [r["filename"] for r in all_pages(results, prefix="inv09")] == [f"inv09{i}.pdf" for i in range(5)]
+    assert sum(results.counts().values()) == 95
+    assert results.counts(prefix="inv00") == {"craftsman": 4, "healthcare": 2, "upwork": 4}
+
+
+def test_appended_rows_are_imported_alone(db):
+    results, csv_path = db
+    with open(csv_path, "a", encoding="utf-8") as f:
+        f.write(rows_csv([("new.pdf", "upwork", "0.5", "t.pdf"), ("inv001.pdf", "upwork", "0.1", "t.pdf")]))
+    assert results.sync() == 2
+    assert len(all_pages(results)) == 96
+    assert all_pages(results, prefix="inv001")[0]["label"] == "upwork"
+
+
+@pytest.mark.parametrize("prefix", ["a\ud7ff", "a\U0010ffff", "\U0010ffff", "a\U0010ffff\U0010ffff", "b\uffff"])
+def test_prefixes_at_the_end_of_the_code_space(tmp_path, prefix):
+    names = sorted({"a", "a\ud7ff", "a\ud7ffx", "a\ue000", "a\U0010ffff", "a\U0010ffffz", "b", "b\uffff",
+                    "b\uffffq", "b\U00010000", "\U0010ffff", "\U0010ffffy", "c"})
+    csv_path = tmp_path / "predictions.csv"
+    csv_path.write_text(HEADER + rows_csv((n, "x", "0.5", "t") for n in names), encoding="utf-8")
+    results = ResultsDB(str(tmp_path / "predictions.db"), str(csv_path))
+    results.sync()
+    assert [r["filename"] for r in all_pages(results, prefix=prefix)] == [n for n in names if n.startswith(prefix)]
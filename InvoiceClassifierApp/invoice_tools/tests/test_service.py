@@ -0,0 +1,64 @@
+"""Resident classification service behind /api/classify."""
+
+import json
+
+import numpy as np
+import pytest
+
+from invoice_tools.service import ClassificationService, ServiceNotReady
+
+AXES = {"healthcare": [1.0, 0.0, 0.0], "upwork": [0.0, 1.0, 0.0], "craftsman": [0.0, 0.0, 1.0]}
+
+
+@pytest.fixture
+def folders(tmp_path):
+    train, cache = tmp_path / "train", tmp_path / "embeddings"
+    train.mkdir()
+    cache.mkdir()
+    for label, axis in AXES.items():
+        for i in range(3):
+            vector = (np.array(axis) + 0.05 * i).tolist()
+            (train / f"{label}{i}.pdf.json").write_text(
+                json.dumps({"Filename": f"{label}{i}.pdf", "Label": label, "Vector": vector}))
+    # Cached by the .NET app under the normalized, safe name
+    (cache / "march_invoice.pdf.json").write_text(json.dumps([0.1, 0.9, 0.0]))
+    return str(train), str(cache)
+
+
+def test_classifies_cached_computed_and_missing_invoices(folders):
+    train, cache = folders
+    computed = []
+
+    def embed(filename, content):
+        computed.append(filename)
+        return None if content == b"" else [0.0, 0.1, 0.9]
+
+    service = ClassificationService(train, embeddings_dir=cache, k=3, embed=embed)
+    with pytest.raises(ServiceNotReady):
+        service.classifier(timeout=0)
+    service.reload()
+    assert service.status()["training_vectors"] == 9
+
+    result = service.classify_files([("march invoice.pdf", b"%PDF"), ("new.pdf", b"%PDF"), ("empty.pdf", b"")])
+    assert [(p["Filename"], p["PredictedLabel"]) for p in result["predictions"]] == [
+        ("march_invoice.pdf", "upwork"), ("new.pdf", "craftsman")]
+    assert result["missing"] == ["empty.pdf"]
+
+    service.classify_files([("new.pdf", b"%PDF")])
+    assert computed == ["new.pdf", "empty.pdf"]  # the computed vector is kept in memory
+
+
+def test_vectors_of_another_model_are_unknown(folders):
+    train, _ = folders
+    service = ClassificationService(train, embed=lambda name, content: [1.0, 0.0])
+    service.reload()
+    prediction = service.classify_files([("a.pdf", b"%PDF")])["predictions"][0]
+    assert (prediction["PredictedLabel"], prediction["TopNeighbor"]) == ("unknown", "none")
+
+
+def test_missing_training_data_is_reported(tmp_path):
+    service = ClassificationService(str(tmp_path / "missing"))
+    service.reload()
+    assert not service.ready and "Failed to load" in service.status()["error"]
+    with pytest.raises(ServiceNotReady, match="Failed to load"):
+        service.classifier(timeout=0)
@@ -0,0 +1,54 @@
+"""Tiled top-k and threshold similarity against the dense matrix."""
+
+import numpy as np
+import pytest
+
+from invoice_tools.similarity import iter_pairs, iter_threshold_pairs, iter_topk, write_threshold, write_topk
+
+
+@pytest.fixture
+def vectors():
+    rng = np.random.default_rng(0)
+    base = rng.normal(size=(20, 16))
+    # Near-duplicates of a few documents give pairs above any sensible threshold
+    return np.vstack([base, base[:5] + rng.normal(scale=0.01, size=(5, 16))]).astype(np.float32)
+
+
+def dense(vectors):
+    unit = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    return unit @ unit.T
+
+
+def test_tiled_topk_matches_the_dense_matrix(vectors):
+    sims = dense(vectors)
+    np.fill_diagonal(sims, -np.inf)
+    expected = np.argsort(-sims, axis=1, kind="stable")[:, :4]
+    rows = np.arange(len(vectors))
+    for r0, idx, scores in iter_topk(vectors, vectors, 4, self_index=rows, tile_rows=3, tile_cols=7):
+        np.testing.assert_array_equal(idx, expected[r0:r0 + len(idx)])
+        np.testing.assert_allclose(scores, np.take_along_axis(sims[r0:r0 + len(idx)], idx, axis=1), rtol=1e-5)
+        assert not (idx == rows[r0:r0 + len(idx), None]).any()
+
+
+def test_threshold_pairs_are_the_upper_triangle_above_it(vectors):
+    sims = dense(vectors)
+    found = set()
+    for rows, cols, scores in iter_threshold_pairs(vectors, 0.5, tile_rows=4, tile_cols=6):
+        assert (cols > rows).all() and (scores >= 0.5).all()
+        found.update(zip(rows.tolist(), cols.tolist()))
+    i, j = np.nonzero(np.triu(sims >= 0.5, k=1))
+    assert found == set(zip(i.tolist(), j.tolist()))
+    assert {(i, i + 20) for i in range(5)} <= found
+
+
+def test_pair_files_stream_back_by_name(vectors, tmp_path):
+    names = [f"doc{i}.pdf" for i in range(len(vectors))]
+    assert write_topk(vectors, names, str(tmp_path / "top.pairs"), 2, tile_rows=8) == 2 * len(vectors)
+    top = next(iter_pairs(str(tmp_path / "top.pairs")))
+    assert top[top["FileA"] == "doc3.pdf"]["FileB"].iloc[0] == "doc23.pdf"
+
+    count = write_threshold(vectors, names, str(tmp_path / "near.pairs"), 0.99)
+    chunks = list(iter_pairs(str(tmp_path / "near.pairs"), chunk_rows=2))
+    assert sum(len(c) for c in chunks) == count == 5
+    pairs = {(a, b) for c in chunks for a, b in zip(c["FileA"], c["FileB"])}
+    assert pairs == {(f"doc{i}.pdf", f"doc{i + 20}.pdf") for i in range(5)}
@@ -0,0 +1,91 @@
+"""Memory-mapped training snapshots shared by several worker processes."""
+
+import json
+import threading
+
+import numpy as np
+import pytest
+
+from invoice_tools.service import ClassificationService
+from invoice_tools.snapshot import SnapshotStore, StringTable
+from invoice_tools.store import write_store
+
+AXES = {"healthcare": [1.0, 0.0, 0.0], "upwork": [0.0, 1.0, 0.0], "craftsman": [0.0, 0.0, 1.0]}
+
+
+def write_training(folder, labels=AXES):
+    folder.mkdir(exist_ok=True)
+    for label, axis in labels.items():
+        for i in range(2):
+            (folder / f"{label}{i}.pdf.json").write_text(json.dumps(
+                {"Filename": f"{label}{i}.pdf", "Label": label, "Vector": (np.array(axis) * (i + 1)).tolist()}))
+
+
+def test_publish_attach_and_collect(tmp_path):
+    store = write_store(str(tmp_path / "train.store"), ["a.pdf", "b.pdf", "c.pdf", "unlabeled.pdf"],
+                        ["upwork", "healthcare", "upwork", None],
+                        np.array([[0, 2, 0], [3, 0, 0], [0, 1, 1], [1, 1, 1]], dtype=np.float32))
+    snapshots = SnapshotStore(str(tmp_path / "snapshots"))
+    assert snapshots.current() is None
+
+    with snapshots.build_lock():
+        names = [snapshots.publish(store, {"run": i}) for i in range(3)]
+    assert names == ["gen-000001", "gen-000002", "gen-000003"]
+    assert snapshots.current() == "gen-000003"
+    assert snapshots.generations() == names[1:]  # KEEP_GENERATIONS
+    assert snapshots.meta("gen-000003")["source"] == {"run": 2}
+
+    classifier = snapshots.attach("gen-000003", k=1)
+    assert list(classifier.filenames) == ["a.pdf", "b.pdf", "c.pdf"]
+    np.testing.assert_allclose(np.linalg.norm(np.asarray(classifier.matrix), axis=1), 1, rtol=1e-6)
+    assert classifier.predict(np.array([0.1, 1.0, 0.0], dtype=np.float32))[::2] == ("upwork", "a.pdf")
+
+
+def test_string_table_round_trip(tmp_path):
+    names = ["Rechnung März.pdf", "", "b.pdf"]
+    StringTable.write(str(tmp_path), names)
+    table = StringTable.open(str(tmp_path))
+    assert list(table) == names and table[-1] == "b.pdf" and table[1:] == names[1:]
+
+
+def test_build_lock_excludes_another_process(tmp_path):
+    first, second = SnapshotStore(str(tmp_path)), SnapshotStore(str(tmp_path))
+    with first.build_lock():
+        with pytest.raises(TimeoutError):
+            with second.build_lock(timeout=0.3):
+                pass
+    with second.build_lock(timeout=0):
+        pass
+
+
+def test_workers_starting_together_publish_once(tmp_path):
+    write_training(tmp_path / "train")
+    workers = [ClassificationService(str(tmp_path / "train"), snapshot_dir=str(tmp_path / "snapshots"))
+               for _ in range(4)]
+    threads = [threading.Thread(target=w.reload) for w in workers]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert SnapshotStore(str(tmp_path / "snapshots")).generations() == ["gen-000001"]
+    assert {w.status()["generation"] for w in workers} == {"gen-000001"}
+
+
+def test_worker_follows_a_generation_published_by_another(tmp_path):
+    train, snapshot_dir = tmp_path / "train", str(tmp_path / "snapshots")
+    write_training(train)
+    serving = ClassificationService(str(train), snapshot_dir=snapshot_dir, k=1)
+    serving.reload()
+    query = np.array([[0.0, 0.0, 0.0, 1.0]], dtype=np.float32)
+    assert serving.classify_vectors(query)[0].label == "unknown"  # other embedding model
+
+    write_training(train, {label: axis + [0.0] for label, axis in AXES.items()} | {"freelance": [0, 0, 0, 1]})
+    for path in train.glob("*.pdf.json"):
+        if len(json.loads(path.read_text())["Vector"]) == 3:
+            path.unlink()
+    rebuilder = ClassificationService(str(train), snapshot_dir=snapshot_dir, k=1)
+    rebuilder.reload()
+    assert rebuilder.generation == "gen-000002"
+
+    assert serving.classify_vectors(query)[0].label == "freelance"
+    assert serving.status()["generation"] == "gen-000002"
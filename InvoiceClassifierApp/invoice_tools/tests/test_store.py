@@ -0,0 +1,69 @@
+"""Writing, swapping and reading embedding stores."""
+
+import json
+import os
+import threading
+
+import numpy as np
+
+from invoice_tools.store import EmbeddingStore, StoreWriter, load_embeddings, write_store
+
+
+def matrices(path):
+    return sorted(name for name in os.listdir(path) if name.startswith("vectors") and name.endswith(".f32"))
+
+
+def test_round_trip_and_rewrite_removes_old_matrix(tmp_path):
+    path = str(tmp_path / "store")
+    vectors = np.arange(12, dtype=np.float32).reshape(4, 3)
+    write_store(path, ["a", "b", "c", "d"], ["x", None, "y", "x"], vectors)
+    first = matrices(path)
+
+    store = write_store(path, ["e", "f"], ["z", "z"], vectors[:2] + 1)
+    assert len(store) == 2 and store.dim == 3
+    assert store.filenames == ["e", "f"]
+    np.testing.assert_array_equal(store.vectors, vectors[:2] + 1)
+    assert store.row("f") == 1 and store.row("a") is None
+    assert len(matrices(path)) == 1 and matrices(path) != first
+
+
+def test_concurrent_writers_never_leave_a_dangling_index(tmp_path):
+    path = str(tmp_path / "store")
+    write_store(path, ["seed"], [None], np.zeros((1, 4), dtype=np.float32))
+    writers = [StoreWriter(path) for _ in range(8)]
+    for i, writer in enumerate(writers):
+        writer.add_many([f"doc{i}"], [str(i)], np.full((1, 4), i, dtype=np.float32))
+
+    errors = []
+
+    def close(writer):
+        try:
+            writer.close()
+        except Exception as e:  # pragma: no cover - reported below
+            errors.append(e)
+
+    threads = [threading.Thread(target=close, args=(w,)) for w in writers]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert not errors
+    store = EmbeddingStore.open(path)
+    i = int(store.labels[0])
+    np.testing.assert_array_equal(store.vectors, np.full((1, 4), i, dtype=np.float32))
+    assert matrices(path) == [writers[i].vectors_file]
+    assert not [name for name in os.listdir(path) if name.endswith(".tmp")]
+
+
+def test_load_embeddings_skips_mismatched_dims(tmp_path):
+    folder = tmp_path / "embeddings"
+    folder.mkdir()
+    (folder / "a.pdf.json").write_text(json.dumps({"Filename": "a.pdf", "Label": "x", "Vector": [1.0, 2.0]}))
+    (folder / "b.pdf.json").write_text(json.dumps([3.0, 4.0, 5.0]))
+    (folder / "c.pdf.json").write_text(json.dumps({"Identifier": "c.pdf", "Label": "y", "Embedding": [6, 7]}))
+
+    store = load_embeddings(str(folder))
+    assert store.filenames == ["a.pdf", "c.pdf"]
+    assert store.labels == ["x", "y"]
+    assert store.vectors.shape == (2, 2)
@@ -0,0 +1,82 @@
+"""Cross-validated sweep of k and the voting rule."""
+
+import numpy as np
+import pytest
+
+from invoice_tools.store import write_store
+from invoice_tools.sweep import assign_folds, best_setting, neighbor_table, sweep, sweep_store
+
+
+@pytest.fixture
+def labeled():
+    rng = np.random.default_rng(0)
+    centers = rng.normal(size=(3, 16))
+    codes = np.repeat(np.arange(3), [23, 11, 6])
+    vectors = (centers[codes] + rng.normal(scale=0.6, size=(len(codes), 16))).astype(np.float32)
+    return vectors, codes
+
+
+def test_folds_spread_every_label_evenly(labeled):
+    _, codes = labeled
+    fold = assign_folds(codes, 5, seed=3)
+    for code in range(3):
+        per_fold = np.bincount(fold[codes == code], minlength=5)
+        assert per_fold.max() - per_fold.min() <= 1
+    np.testing.assert_array_equal(assign_folds(codes, 1), np.arange(len(codes)))
+
+
+@pytest.mark.parametrize("folds", [1, 4])
+def test_neighbor_table_matches_dense_search_outside_the_fold(labeled, folds):
+    vectors, codes = labeled
+    fold = assign_folds(codes, folds)
+    indices, scores = neighbor_table(vectors, fold, 5, tile_rows=7, tile_cols=9)
+
+    unit = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    sims = unit @ unit.T
+    sims[fold[:, None] == fold[None, :]] = -np.inf
+    expected = np.argsort(-sims, axis=1, kind="stable")[:, :5]
+    np.testing.assert_array_equal(indices, expected)
+    np.testing.assert_allclose(scores, np.take_along_axis(sims, expected, axis=1), rtol=1e-5)
+    assert not (fold[indices] == fold[:, None]).any()
+
+
+def test_rows_with_few_rows_outside_their_fold_are_padded():
+    vectors = np.eye(4, dtype=np.float32)
+    indices, scores = neighbor_table(vectors, np.array([0, 0, 0, 1]), 3)
+    assert indices[0].tolist() == [3, -1, -1] and np.isneginf(scores[0, 1:]).all()
+    assert sorted(indices[3].tolist()) == [0, 1, 2]
+
+
+def test_sweep_scores_every_setting(labeled):
+    vectors, codes = labeled
+    indices, scores = neighbor_table(vectors, assign_folds(codes, 5), 7)
+    results = sweep(codes, 3, indices, scores)
+    assert [(r["k"], r["rule"]) for r in results[:4]] == [(1, "majority"), (1, "weighted"), (2, "majority"),
+                                                          (2, "weighted")]
+    assert len(results) == 14
+    first = results[0]
+    assert first["accuracy"] == pytest.approx(np.mean(codes[indices[:, 0]] == codes))
+    per_label = [np.mean(codes[indices[codes == c, 0]] == c) for c in range(3)]
+    assert first["balanced_accuracy"] == pytest.approx(np.mean(per_label))
+
+
+def test_best_setting_prefers_small_k_and_majority():
+    results = [
+        {"k": 3, "rule": "weighted", "accuracy": 0.9},
+        {"k": 3, "rule": "majority", "accuracy": 0.9},
+        {"k": 5, "rule": "majority", "accuracy": 0.9},
+        {"k": 1, "rule": "majority", "accuracy": 0.8},
+    ]
+    assert best_setting(results) == results[1]
+    assert best_setting([]) is None
+
+
+def test_sweep_store_uses_labeled_rows(labeled, tmp_path):
+    vectors, codes = labeled
+    labels = [["alpha", "beta", "gamma"][c] for c in codes]
+    labels[0] = None
+    store = write_store(str(tmp_path / "train.store"), [f"{i}.pdf" for i in range(len(codes))], labels, vectors)
+    report = sweep_store(store, max_k=3, folds=0)
+    assert (report["documents"], report["folds"], report["max_k"]) == (len(codes) - 1, "leave-one-out", 3)
+    assert report["labels"] == ["alpha", "beta", "gamma"]
+    assert report["best"] in report["results"]
@@ -0,0 +1,73 @@
+"""Content-addressed uploads shared by several processes."""
+
+import io
+import json
+import os
+import threading
+
+from invoice_tools import uploads
+from invoice_tools.uploads import UploadStore
+
+
+def test_reupload_writes_nothing_and_names_share_one_object(tmp_path, monkeypatch):
+    store = UploadStore(str(tmp_path / "store"))
+    invoices = str(tmp_path / "Invoices")
+    first = store.save(io.BytesIO(b"%PDF invoice"), "a.pdf", invoices)
+    assert first.stored and first.linked
+
+    def no_disk_write(*args, **kwargs):
+        raise AssertionError("a known upload was written to disk")
+
+    monkeypatch.setattr(uploads.tempfile, "mkstemp", no_disk_write)
+    again = store.save(io.BytesIO(b"%PDF invoice"), "a.pdf", invoices)
+    assert (again.stored, again.linked) == (False, False)
+    monkeypatch.undo()  # a new name does update the manifest
+
+    copy = store.save(io.BytesIO(b"%PDF invoice"), "../b.pdf", invoices)
+    assert copy.path == os.path.join(invoices, "b.pdf")
+    assert not copy.stored and copy.linked
+    assert os.path.samefile(copy.path, store.object_path(first.sha256))
+    assert store.paths_for(first.sha256) == [first.path, copy.path]
+
+
+def test_large_stream_is_spooled_and_deduplicated(tmp_path):
+    store = UploadStore(str(tmp_path / "store"))
+    data = os.urandom(300_000)
+    sha, size, stored = store.put_stream(io.BytesIO(data), spool_limit=1000)
+    assert (size, stored) == (len(data), True)
+    assert store.put_stream(io.BytesIO(data), spool_limit=1000) == (sha, size, False)
+    with open(store.object_path(sha), "rb") as f:
+        assert f.read() == data
+    assert not [n for n in os.listdir(store.objects_dir) if n.startswith(".upload-")]
+
+
+def test_object_of_the_wrong_size_is_written_again(tmp_path):
+    store = UploadStore(str(tmp_path / "store"))
+    result = store.save(b"original", "a.pdf", str(tmp_path / "Invoices"))
+    with open(result.path, "ab") as f:  # edited in place through the link
+        f.write(b" edited")
+    again = store.save(b"original", "a.pdf", str(tmp_path / "Invoices"))
+    assert again.stored and again.linked
+    with open(again.path, "rb") as f:
+        assert f.read() == b"original"
+
+
+def test_stores_on_one_root_merge_their_manifest_entries(tmp_path):
+    root = str(tmp_path / "store")
+    workers = [UploadStore(root) for _ in range(4)]
+
+    def upload(i, store):
+        for j in range(10):
+            store.save(f"{i}-{j}".encode(), f"{i}-{j}.pdf", str(tmp_path / "Invoices"))
+
+    threads = [threading.Thread(target=upload, args=(i, s)) for i, s in enumerate(workers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    with open(os.path.join(root, "manifest.json"), encoding="utf-8") as f:
+        manifest = json.load(f)
+    assert len(manifest) == 40
+    assert workers[0].hash_for(str(tmp_path / "Invoices" / "3-9.pdf")) == workers[3].hash_for(
+        str(tmp_path / "Invoices" / "3-9.pdf"))
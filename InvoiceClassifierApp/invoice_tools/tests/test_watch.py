@@ -0,0 +1,115 @@
+"""Incremental classification of the Invoices/ folder."""
+
+import json
+import os
+import zipfile
+
+import numpy as np
+import pytest
+
+from invoice_tools.knn import KnnClassifier
+from invoice_tools.predictions import read_predictions, write_predictions_csv
+from invoice_tools.watch import NO_TEXT, STATE_FILE, InvoiceWatcher
+
+AXES = {"clinic": [1.0, 0.0, 0.0], "upwork": [0.0, 1.0, 0.0], "plumbing": [0.0, 0.0, 1.0]}
+LABELS = {"clinic": "healthcare", "upwork": "upwork", "plumbing": "craftsman"}
+
+
+class FakeClient:
+    """Embeds a text on the axis of the first keyword it contains."""
+
+    def __init__(self):
+        self.texts = []
+
+    def embed(self, texts):
+        self.texts += texts
+        return [next((np.array(v, dtype=np.float32) for w, v in AXES.items() if w in t), None) for t in texts]
+
+
+@pytest.fixture
+def classifier():
+    vectors = np.array(list(AXES.values()), dtype=np.float32)
+    return KnnClassifier(k=1).fit(vectors, list(LABELS.values()), [f"{w}.pdf" for w in AXES])
+
+
+@pytest.fixture
+def folders(tmp_path):
+    invoices, output = tmp_path / "Invoices", tmp_path / "output"
+    invoices.mkdir()
+    return invoices, output
+
+
+def run(watcher):
+    watcher.scan()
+    results = []
+    while batch := watcher.ready():
+        results += watcher.process(batch)
+    return {r.name: r.prediction.label for r in results}
+
+
+def zipped(output, label):
+    with zipfile.ZipFile(output / f"{label}.zip") as archive:
+        return sorted(archive.namelist())
+
+
+def listed(output):
+    frame = read_predictions(str(output / "predictions.csv"))
+    return dict(zip(frame["Filename"], frame["PredictedLabel"]))
+
+
+def test_new_changed_and_deleted_invoices(classifier, folders):
+    invoices, output = folders
+    client = FakeClient()
+    watcher = InvoiceWatcher(str(invoices), str(output), classifier, client=client, debounce=0)
+    (invoices / "march bill.txt").write_text("upwork contract")
+    (invoices / "visit.txt").write_text("clinic visit")
+
+    assert run(watcher) == {"march bill.txt": "upwork", "visit.txt": "healthcare"}
+    assert listed(output) == {"march_bill.txt": "upwork", "visit.txt": "healthcare"}
+    assert (output / "upwork" / "march_bill.txt").read_text() == "upwork contract"
+    assert zipped(output, "upwork") == ["march_bill.txt"]
+    assert run(watcher) == {} and len(client.texts) == 2
+
+    (invoices / "march bill.txt").write_text("plumbing repair")
+    assert run(watcher) == {"march bill.txt": "craftsman"}
+    assert not (output / "upwork" / "march_bill.txt").exists()
+    assert zipped(output, "upwork") == [] and zipped(output, "craftsman") == ["march_bill.txt"]
+
+    (invoices / "visit.txt").unlink()
+    assert run(watcher) == {}
+    assert listed(output) == {"march_bill.txt": "craftsman"}
+    assert zipped(output, "healthcare") == []
+    assert "visit.txt" not in json.loads((output / STATE_FILE).read_text())
+
+
+def test_unclassifiable_invoice_is_retried_only_once_changed(classifier, folders):
+    invoices, output = folders
+    client = FakeClient()
+    watcher = InvoiceWatcher(str(invoices), str(output), classifier, client=client, debounce=0)
+    (invoices / "blank.txt").write_text(" \n")
+    assert run(watcher) == {}
+    assert watcher.state["blank.txt"]["error"] == NO_TEXT
+    assert not (output / "predictions.csv").exists()
+
+    assert run(watcher) == {}
+    (invoices / "blank.txt").write_text("clinic invoice")
+    assert run(watcher) == {"blank.txt": "healthcare"}
+    assert "error" not in watcher.state["blank.txt"]
+
+
+def test_restart_adopts_rows_and_resumes_from_state(classifier, folders):
+    invoices, output = folders
+    output.mkdir()
+    (invoices / "old.txt").write_text("plumbing")
+    os.utime(invoices / "old.txt", ns=(0, 10**9))
+    write_predictions_csv(str(output / "predictions.csv"), [("old.txt", "craftsman", 0.9, "plumbing.pdf")])
+
+    client = FakeClient()
+    watcher = InvoiceWatcher(str(invoices), str(output), classifier, client=client, debounce=0)
+    (invoices / "new.txt").write_text("upwork")
+    assert run(watcher) == {"new.txt": "upwork"}
+    assert client.texts == ["upwork\n"]  # old.txt was adopted from dotnet run's row
+    assert listed(output) == {"old.txt": "craftsman", "new.txt": "upwork"}
+
+    restarted = InvoiceWatcher(str(invoices), str(output), classifier, client=client, debounce=0)
+    assert run(restarted) == {} and len(client.texts) == 1
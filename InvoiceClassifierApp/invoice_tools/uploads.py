@@ -0,0 +1,189 @@
+"""Content-addressed upload store.
+
+Uploads are hashed while they are buffered in memory (up to
+``SPOOL_LIMIT``; larger ones are spooled to a temporary file) and kept once
+per SHA-256 under ``<root>/objects/``, so content that is already stored is
+never written again. The file the .NET app reads (``Invoices/<name>``,
+``TrainData/<label>/<name>``) is a hard link to that object, falling back
+to a copy where links aren't possible. A link shares the object's inode:
+an upload edited in place rewrites the object too, so an object whose size
+no longer matches its hash is written again on the next upload of that
+content.
+
+``<root>/manifest.json`` maps every destination path to its content hash,
+so re-uploading the same bytes - or Streamlit re-running its script on every
+widget change - is detected without touching the disk, and embedding
+lookups can key on content instead of on the client-supplied filename.
+The Flask workers and the Streamlit uploader share the manifest: every
+update re-reads it under ``<root>/manifest.lock`` and merges its entry, so
+no process overwrites another's.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+from typing import BinaryIO, NamedTuple
+
+from .locks import FileLock
+
+CHUNK_SIZE = 1024 * 1024
+SPOOL_LIMIT = 64 * 1024 * 1024  # uploads up to this size are hashed in memory before anything is written
+
+
+class UploadResult(NamedTuple):
+    name: str
+    path: str
+    sha256: str
+    size: int
+    stored: bool  # a new object was written
+    linked: bool  # the destination file was (re)written
+
+
+class UploadStore:
+    def __init__(self, root: str):
+        self.root = root
+        self.objects_dir = os.path.join(root, "objects")
+        self.manifest_path = os.path.join(root, "manifest.json")
+        os.makedirs(self.objects_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._manifest_lock = FileLock(os.path.join(root, "manifest.lock"))
+        self._manifest_mtime: int | None = None
+        self._manifest: dict[str, dict] = {}
+        self._refresh_manifest()
+
+    def _refresh_manifest(self, force: bool = False) -> dict[str, dict]:
+        """The manifest as other processes last saved it; re-read when the file changed or ``force``."""
+        try:
+            mtime = os.stat(self.manifest_path).st_mtime_ns
+        except OSError:
+            mtime = None
+        if force or mtime != self._manifest_mtime:
+            try:
+                with open(self.manifest_path, "r", encoding="utf-8") as f:
+                    self._manifest = json.load(f)
+            except (OSError, ValueError):
+                self._manifest = {}
+            self._manifest_mtime = mtime
+        return self._manifest
+
+    def _save_manifest(self) -> None:
+        fd, tmp = tempfile.mkstemp(dir=self.root, prefix=".manifest-", suffix=".json")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(self._manifest, f, ensure_ascii=False, indent=1)
+        os.replace(tmp, self.manifest_path)
+        self._manifest_mtime = os.stat(self.manifest_path).st_mtime_ns
+
+    def object_path(self, sha256: str) -> str:
+        return os.path.join(self.objects_dir, sha256[:2], sha256)
+
+    def has_object(self, sha256: str, size: int | None = None) -> bool:
+        """Whether the object exists (with ``size`` bytes, if given)."""
+        try:
+            return size is None or os.path.getsize(self.object_path(sha256)) == size
+        except OSError:
+            return False
+
+    def put_stream(self, stream: BinaryIO, spool_limit: int = SPOOL_LIMIT) -> tuple[str, int, bool]:
+        """Store ``stream``; returns ``(sha256, size, stored)``.
+
+        Up to ``spool_limit`` bytes are read into memory and handed to
+        ``put_bytes``, so a known upload costs no disk write. Only a larger
+        stream is written to a temporary file while it is hashed, which is
+        dropped if an object with the same hash already exists.
+        """
+        buffer = bytearray()
+        while len(buffer) <= spool_limit:
+            chunk = stream.read(CHUNK_SIZE)
+            if not chunk:
+                return self.put_bytes(buffer)
+            buffer += chunk
+
+        digest = hashlib.sha256(buffer)
+        size = len(buffer)
+        fd, tmp = tempfile.mkstemp(dir=self.objects_dir, prefix=".upload-")
+        try:
+            with os.fdopen(fd, "wb") as out:
+                out.write(buffer)
+                del buffer
+                while chunk := stream.read(CHUNK_SIZE):
+                    digest.update(chunk)
+                    out.write(chunk)
+                    size += len(chunk)
+            sha = digest.hexdigest()
+            if self.has_object(sha, size):
+                os.remove(tmp)
+                return sha, size, False
+            os.makedirs(os.path.dirname(self.object_path(sha)), exist_ok=True)
+            os.replace(tmp, self.object_path(sha))
+            return sha, size, True
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+    def put_bytes(self, data: bytes | memoryview) -> tuple[str, int, bool]:
+        """Store in-memory ``data``; hashes first so known content is never written."""
+        sha = hashlib.sha256(data).hexdigest()
+        if self.has_object(sha, len(data)):
+            return sha, len(data), False
+        path = self.object_path(sha)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".upload-")
+        with os.fdopen(fd, "wb") as out:
+            out.write(data)
+        os.replace(tmp, path)
+        return sha, len(data), True
+
+    def save(self, data: BinaryIO | bytes | memoryview, name: str, target_dir: str) -> UploadResult:
+        """Store an upload and expose it as ``target_dir/<name>``."""
+        name = os.path.basename(name.replace("\\", "/")).strip()
+        if not name or name in {".", ".."}:
+            raise ValueError(f"Invalid upload filename: {name!r}")
+        dest = os.path.normpath(os.path.join(target_dir, name))
+
+        if isinstance(data, (bytes, bytearray, memoryview)):
+            sha, size, stored = self.put_bytes(data)
+        else:
+            sha, size, stored = self.put_stream(data)
+
+        with self._lock, self._manifest_lock:
+            entry = self._refresh_manifest(force=True).get(dest)
+            if entry and entry["sha256"] == sha and not stored and _has_size(dest, size):
+                return UploadResult(name, dest, sha, size, stored, False)
+            os.makedirs(target_dir, exist_ok=True)
+            self._link(sha, dest)
+            self._manifest[dest] = {"sha256": sha, "size": size, "name": name}
+            self._save_manifest()
+        return UploadResult(name, dest, sha, size, stored, True)
+
+    def hash_for(self, path: str) -> str | None:
+        """Content hash recorded for a destination path."""
+        with self._lock:
+            entry = self._refresh_manifest().get(os.path.normpath(path))
+        return entry["sha256"] if entry else None
+
+    def paths_for(self, sha256: str) -> list[str]:
+        """Every destination path currently holding the content ``sha256``."""
+        with self._lock:
+            manifest = self._refresh_manifest()
+        return [path for path, entry in manifest.items() if entry["sha256"] == sha256]
+
+    def _link(self, sha256: str, dest: str) -> None:
+        tmp = f"{dest}.{sha256[:8]}.{os.getpid()}.tmp"
+        if os.path.lexists(tmp):
+            os.remove(tmp)
+        try:
+            os.link(self.object_path(sha256), tmp)
+        except OSError:
+            shutil.copyfile(self.object_path(sha256), tmp)
+        os.replace(tmp, dest)
+
+
+def _has_size(path: str, size: int) -> bool:
+    try:
+        return os.path.getsize(path) == size
+    except OSError:
+        return False
@@ -0,0 +1,485 @@
+"""Incremental classification of invoices as they arrive.
+
+Every ``dotnet run`` re-extracts and re-classifies the whole Invoices/
+folder, re-copies every file to ``output/<label>/`` and re-zips every
+label. ``InvoiceWatcher`` keeps a state file (``output/.watch_state.json``)
+with the size, mtime, content hash and label of every invoice it has
+classified and only touches what changed:
+
+* Invoices/ is watched with ``watchdog`` (inotify, FSEvents or
+  ReadDirectoryChangesW) when it is installed and polled otherwise,
+* a file is picked up once it has not changed for ``debounce`` seconds,
+  so bursts of arrivals and half-copied files form one micro-batch,
+* a micro-batch is extracted (``extract``); with ``--keywords`` invoices
+  the motherwords vocabularies decide confidently (``keywords``) skip the
+  embedding step, the rest are embedded in batched requests (``embed``;
+  vectors already in the .NET ``embeddings/`` cache are reused) and
+  classified with one matrix product,
+* its rows are appended to ``output/predictions.csv`` (the file is only
+  rewritten, keeping every other row, when an invoice already listed
+  changes), the files are copied to their label folders and only the
+  affected labels' zips are updated - appended to in place for new files,
+  rebuilt when a file moved away,
+* an invoice deleted from Invoices/ loses its row, its label-folder copy
+  and its zip entry; one that cannot be classified (no text, no embedding)
+  is recorded with its signature and only retried once it changes.
+
+On the first scan, invoices that ``predictions.csv`` already lists (e.g.
+from ``dotnet run``) and that have not changed since it was written are
+adopted with their listed label instead of being classified again.
+
+::
+
+    python -m invoice_tools.watch Invoices --train train.store --output output \
+        --embeddings bin/Debug/net9.0/embeddings
+"""
+
+import argparse
+import itertools
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import zipfile
+from typing import NamedTuple
+
+import numpy as np
+
+from .embed import EmbeddingClient, EmbeddingError, chunk_text, load_cached, save_cached
+from .extract import TextCache, Source, extract_all, file_sha256, source_filename
+from .keywords import KeywordMatcher
+from .knn import KnnClassifier, Prediction
+from .predictions import COLUMNS, format_row, iter_predictions, normalize_filename
+from .store import load_embeddings
+
+STATE_FILE = ".watch_state.json"
+INVOICE_EXTENSIONS = (".pdf", ".txt")
+DEBOUNCE_SECONDS = 2.0
+POLL_SECONDS = 2.0
+BATCH_SIZE = 64
+RETRY_SECONDS = 30.0
+# Recorded failures worth retrying when a watcher with an embedding client starts
+NO_EMBEDDING = "no embedding"
+NO_TEXT = "no text"
+
+
+class Classified(NamedTuple):
+    name: str
+    prediction: Prediction
+
+
+def _signature(path: str) -> tuple[int, int] | None:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+class InvoiceWatcher:
+    def __init__(self, invoices_dir: str, output_dir: str, classifier: KnnClassifier,
+                 embeddings_dir: str | None = None, client: EmbeddingClient | None = None,
+                 text_cache: str | None = None, debounce: float = DEBOUNCE_SECONDS, batch_size: int = BATCH_SIZE,
+                 keywords: KeywordMatcher | None = None):
+        self.invoices_dir = invoices_dir
+        self.output_dir = output_dir
+        self.classifier = classifier
+        self.embeddings_dir = embeddings_dir
+        self.client = client
+        self.text_cache = TextCache(text_cache or os.path.join(output_dir, ".text_cache"))
+        self.debounce = debounce
+        self.batch_size = batch_size
+        self.keywords = keywords
+        # Invoices decided by keyword matching, the embedding requests (chunks) that saved,
+        # and invoices that went through embeddings.
+        self.stats = {"keywords": 0, "saved_chunks": 0, "embedded": 0}
+        self.state_path = os.path.join(output_dir, STATE_FILE)
+        self.predictions_path = os.path.join(output_dir, "predictions.csv")
+        # name -> (signature when last seen, time it was last seen changing)
+        self.pending: dict[str, tuple[tuple[int, int] | None, float]] = {}
+        self._pending_lock = threading.Lock()
+        self._stop = threading.Event()
+        # predictions.csv rows by filename, in file order, and the file signature they were read at
+        self._rows: dict[str, tuple[str, float, str]] = {}
+        self._rows_signature: tuple[int, int] | None = None
+        self._seeded = False
+        os.makedirs(output_dir, exist_ok=True)
+        if embeddings_dir:
+            os.makedirs(embeddings_dir, exist_ok=True)
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                self.state: dict[str, dict] = json.load(f)
+        except (OSError, ValueError):
+            self.state = {}
+        if client is not None:
+            self.state = {n: e for n, e in self.state.items() if e.get("error") != NO_EMBEDDING}
+
+    def _save_state(self) -> None:
+        fd, tmp = tempfile.mkstemp(dir=self.output_dir, prefix=".watch-state-", suffix=".json")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(self.state, f, ensure_ascii=False)
+        os.replace(tmp, self.state_path)
+
+    def is_current(self, name: str, signature: tuple[int, int] | None) -> bool:
+        entry = self.state.get(name)
+        return entry is not None and signature is not None and (entry["size"], entry["mtime_ns"]) == signature
+
+    def is_invoice(self, name: str) -> bool:
+        """Invoice file name; a ``<name>.pdf.txt`` written by ``extract --siblings`` next to its PDF is not."""
+        if not name.lower().endswith(INVOICE_EXTENSIONS):
+            return False
+        pdf = source_filename(name)
+        return pdf == name or not os.path.isfile(os.path.join(self.invoices_dir, pdf))
+
+    def notify(self, name: str) -> None:
+        """Mark ``name`` (in Invoices/) as possibly new, changed or deleted."""
+        if not self.is_invoice(name) and name not in self.state:
+            return
+        with self._pending_lock:
+            previous = self.pending.get(name)
+            signature = _signature(os.path.join(self.invoices_dir, name))
+            if previous is None or previous[0] != signature:
+                self.pending[name] = (signature, time.monotonic())
+
+    def scan(self) -> None:
+        """Queue every file whose size or mtime differs from the state and every known file that is gone.
+
+        A directory listing, no reads.
+        """
+        present = {}
+        with os.scandir(self.invoices_dir) as entries:
+            for entry in entries:
+                if entry.is_file() and self.is_invoice(entry.name):
+                    stat = entry.stat()
+                    present[entry.name] = (stat.st_size, stat.st_mtime_ns)
+        if not self._seeded:
+            self._seed_from_predictions(present)
+            self._seeded = True
+        for name, signature in present.items():
+            if not self.is_current(name, signature):
+                self.notify(name)
+        for name in self.state.keys() - present.keys():
+            self.notify(name)
+
+    def _seed_from_predictions(self, present: dict[str, tuple[int, int]]) -> None:
+        """Adopt listed invoices not modified since predictions.csv was written, so they aren't classified again."""
+        rows = self._listed()
+        if not rows:
+            return
+        written = self._rows_signature[1]
+        adopted = 0
+        for name, (size, mtime_ns) in present.items():
+            row = rows.get(normalize_filename(name))
+            if name in self.state or row is None or mtime_ns > written:
+                continue
+            label, score, top_neighbor = row
+            self.state[name] = {"size": size, "mtime_ns": mtime_ns, "sha256": None, "label": label,
+                                "score": score, "top_neighbor": top_neighbor}
+            adopted += 1
+        if adopted:
+            self._save_state()
+            print(f"📄 Adopted {adopted} invoices already classified in {self.predictions_path}")
+
+    def ready(self) -> list[str]:
+        """Pending files unchanged for ``debounce`` seconds, oldest first, up to ``batch_size``."""
+        now = time.monotonic()
+        ready = []
+        with self._pending_lock:
+            for name, (signature, since) in list(self.pending.items()):
+                current = _signature(os.path.join(self.invoices_dir, name))
+                if current is None and name not in self.state:
+                    del self.pending[name]  # deleted before it settled
+                elif current != signature:
+                    self.pending[name] = (current, now)
+                elif now - since >= self.debounce:
+                    ready.append((since, name))
+            ready = [name for _, name in sorted(ready)[:self.batch_size]]
+            for name in ready:
+                del self.pending[name]
+        return ready
+
+    def _vectors(self, names: list[str], texts: list[str]) -> list[np.ndarray | None]:
+        # The .NET cache is keyed by name, so a file whose bytes changed must be embedded again.
+        vectors = [load_cached(self.embeddings_dir, normalize_filename(n))
+                   if self.embeddings_dir and n not in self.state else None for n in names]
+        todo = [i for i, v in enumerate(vectors) if v is None and texts[i]]
+        if todo and self.client is not None:
+            for i, vector in zip(todo, self.client.embed([texts[i] for i in todo])):
+                vectors[i] = vector
+                if self.embeddings_dir and vector is not None:
+                    save_cached(self.embeddings_dir, normalize_filename(names[i]), vector)
+        return vectors
+
+    def process(self, names: list[str]) -> list[Classified]:
+        """Classify one micro-batch and update predictions.csv, label folders and zips."""
+        gone = [n for n in names if n in self.state and not os.path.isfile(os.path.join(self.invoices_dir, n))]
+        names = [n for n in names if os.path.isfile(os.path.join(self.invoices_dir, n))]
+        signatures = {n: _signature(os.path.join(self.invoices_dir, n)) for n in names}
+        hashes = {n: file_sha256(os.path.join(self.invoices_dir, n)) for n in names}
+        # A touched file with the same bytes keeps its label; just record the new mtime.
+        unchanged = [n for n in names if n in self.state and self.state[n]["sha256"] == hashes[n]]
+        for name in unchanged:
+            self.state[name].update(size=signatures[name][0], mtime_ns=signatures[name][1])
+        names = [n for n in names if n not in unchanged]
+        if not names and not gone:
+            if unchanged:
+                self._save_state()
+            return []
+
+        sources = [Source(os.path.join(self.invoices_dir, n), None, n) for n in names]
+        documents, _ = extract_all(sources, self.text_cache, workers=1 if len(sources) < 4 else None)
+        # Document.text ends every page with a newline; a scanned PDF without a text layer has nothing to embed.
+        texts = [doc.text if not doc.error and doc.text.strip() else "" for doc in documents]
+        predictions: list[Prediction | None] = [None] * len(names)
+        if self.keywords is not None:
+            predictions = [self.keywords.predict(text) if text else None for text in texts]
+        todo = [i for i, p in enumerate(predictions) if p is None]
+        saved_chunks = sum(len(chunk_text(texts[i])) for i, p in enumerate(predictions) if p is not None)
+        vectors = self._vectors([names[i] for i in todo], [texts[i] for i in todo])
+
+        found = [(i, v) for i, v in zip(todo, vectors) if v is not None]
+        for i, vector in zip(todo, vectors):
+            if vector is None:
+                print(f"⚠️ No embedding for {names[i]}" + (" (no text)" if not texts[i] else ""))
+        if found:
+            for (i, _), p in zip(found, self.classifier.predict_batch(np.vstack([v for _, v in found]))):
+                predictions[i] = p
+        decided = len(names) - len(todo)
+        self.stats["keywords"] += decided
+        self.stats["saved_chunks"] += saved_chunks
+        self.stats["embedded"] += len(found)
+        if self.keywords is not None:
+            print(f"🔑 Keywords decided {decided} of {len(names)} invoices; {len(todo)} went to embeddings")
+        results = [Classified(names[i], p) for i, p in enumerate(predictions) if p is not None]
+        failed = {names[i]: NO_TEXT if not texts[i] else NO_EMBEDDING for i, p in enumerate(predictions) if p is None}
+
+        # Deleted invoices and those that can no longer be classified leave their label folder and row
+        added: dict[str, list[str]] = {}
+        removed: set[str] = set()
+        retired = gone + list(failed)
+        for name in retired:
+            old = self.state.get(name, {}).get("label")
+            if old is not None:
+                self._remove_copy(old, normalize_filename(name))
+                removed.add(old)
+        for name in gone:
+            del self.state[name]
+            print(f"🗑️ {name} was removed from {self.invoices_dir}")
+        for name, reason in failed.items():
+            size, mtime_ns = signatures[name]
+            self.state[name] = {"size": size, "mtime_ns": mtime_ns, "sha256": hashes[name], "error": reason}
+
+        for r in results:
+            target = normalize_filename(r.name)
+            old = self.state.get(r.name, {}).get("label")
+            if old is not None and old != r.prediction.label:
+                self._remove_copy(old, target)
+                removed.add(old)
+            folder = os.path.join(self.output_dir, r.prediction.label)
+            os.makedirs(folder, exist_ok=True)
+            shutil.copy2(os.path.join(self.invoices_dir, r.name), os.path.join(folder, target))
+            if old is not None:
+                removed.add(r.prediction.label)  # replaced entry: rebuild
+            added.setdefault(r.prediction.label, []).append(target)
+            size, mtime_ns = signatures[r.name]
+            self.state[r.name] = {
+                "size": size, "mtime_ns": mtime_ns, "sha256": hashes[r.name], "label": r.prediction.label,
+                "score": round(r.prediction.score, 4), "top_neighbor": r.prediction.top_neighbor,
+            }
+            print(f"[{target}] → {r.prediction.label} (Score: {r.prediction.score:.4f}) | Top: {r.prediction.top_neighbor}")
+
+        self._update_predictions(results, [normalize_filename(n) for n in retired])
+        for label in set(added) | removed:
+            update_label_zip(self.output_dir, label, [] if label in removed else added[label])
+        self._save_state()
+        return results
+
+    def _remove_copy(self, label: str, target: str) -> None:
+        try:
+            os.remove(os.path.join(self.output_dir, label, target))
+        except OSError:
+            pass
+
+    def _listed(self) -> dict[str, tuple[str, float, str]]:
+        """Every row of predictions.csv - the watcher's and those of ``dotnet run`` - re-read when the file changed."""
+        signature = _signature(self.predictions_path)
+        if signature != self._rows_signature:
+            rows = {}
+            if signature is not None:
+                for chunk in iter_predictions(self.predictions_path):
+                    for name, label, score, top_neighbor in zip(chunk["Filename"], chunk["PredictedLabel"],
+                                                                chunk["SimilarityScore"], chunk["TopNeighbor"]):
+                        rows[name] = (label, float(score), top_neighbor)
+            self._rows, self._rows_signature = rows, signature
+        return self._rows
+
+    def _update_predictions(self, results: list[Classified], dropped: list[str]) -> None:
+        """Append the rows of new invoices; rewrite the file, keeping all other rows, when listed ones change."""
+        rows = self._listed()
+        new = {normalize_filename(r.name): (r.prediction.label, r.prediction.score, r.prediction.top_neighbor)
+               for r in results}
+        if any(name in rows for name in itertools.chain(new, dropped)):
+            rows = dict(rows)
+            for name in dropped:
+                rows.pop(name, None)
+            rows.update(new)
+            fd, tmp = tempfile.mkstemp(dir=self.output_dir, prefix=".predictions-", suffix=".csv")
+            with os.fdopen(fd, "w", encoding="utf-8", newline="") as f:
+                f.write(",".join(COLUMNS) + os.linesep)
+                for name, row in rows.items():
+                    f.write(format_row(name, *row) + os.linesep)
+            os.replace(tmp, self.predictions_path)
+        elif new:
+            new_file = not os.path.isfile(self.predictions_path)
+            with open(self.predictions_path, "a", encoding="utf-8", newline="") as f:
+                if new_file:
+                    f.write(",".join(COLUMNS) + os.linesep)
+                for name, row in new.items():
+                    f.write(format_row(name, *row) + os.linesep)
+            rows = {**rows, **new}
+        else:
+            return
+        self._rows, self._rows_signature = rows, _signature(self.predictions_path)
+
+    def step(self) -> list[Classified]:
+        """Process the files that are ready; failed batches are retried after ``RETRY_SECONDS``."""
+        names = self.ready()
+        if not names:
+            return []
+        try:
+            return self.process(names)
+        except (OSError, EmbeddingError) as e:
+            print(f"❌ Batch of {len(names)} invoices failed, retrying in {RETRY_SECONDS:.0f}s: {e}")
+            with self._pending_lock:
+                for name in names:
+                    signature = _signature(os.path.join(self.invoices_dir, name))
+                    self.pending[name] = (signature, time.monotonic() + RETRY_SECONDS - self.debounce)
+            return []
+
+    def run(self, poll: bool = False, interval: float = POLL_SECONDS) -> None:
+        """Watch until ``stop()`` (or Ctrl+C); files that arrived while stopped are picked up first."""
+        self.scan()
+        observer = None if poll else self._start_observer()
+        if observer is None:
+            print(f"👀 Polling {self.invoices_dir} every {interval:.1f}s")
+        else:
+            print(f"👀 Watching {self.invoices_dir}")
+        next_scan = time.monotonic() + interval
+        try:
+            while not self._stop.is_set():
+                while self.step():
+                    pass
+                if observer is None and time.monotonic() >= next_scan:
+                    self.scan()
+                    next_scan = time.monotonic() + interval
+                self._stop.wait(min(0.25, self.debounce / 2))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if observer is not None:
+                observer.stop()
+                observer.join()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _start_observer(self):
+        try:
+            from watchdog.events import FileSystemEventHandler
+            from watchdog.observers import Observer
+        except ImportError:
+            return None
+
+        watcher = self
+
+        class Handler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                if event.is_directory:
+                    return
+                for path in (getattr(event, "dest_path", None), event.src_path):
+                    if path and os.path.dirname(os.path.abspath(path)) == os.path.abspath(watcher.invoices_dir):
+                        watcher.notify(os.path.basename(path))
+
+        observer = Observer()
+        observer.schedule(Handler(), self.invoices_dir, recursive=False)
+        observer.start()
+        return observer
+
+
+def update_label_zip(output_dir: str, label: str, added: list[str]) -> str:
+    """Bring ``output/<label>.zip`` up to date with ``output/<label>/``.
+
+    New files are appended to the existing archive; with ``added`` empty
+    (files were removed or replaced) the archive is rebuilt.
+    """
+    folder = os.path.join(output_dir, label)
+    zip_path = os.path.join(output_dir, label + ".zip")
+    if added and os.path.isfile(zip_path):
+        with zipfile.ZipFile(zip_path, "a", zipfile.ZIP_DEFLATED) as archive:
+            existing = set(archive.namelist())
+            for name in added:
+                if name not in existing:
+                    archive.write(os.path.join(folder, name), name)
+        return zip_path
+
+    fd, tmp = tempfile.mkstemp(dir=output_dir, prefix=f".{label}-", suffix=".zip")
+    os.close(fd)
+    with zipfile.ZipFile(tmp, "w", zipfile.ZIP_DEFLATED) as archive:
+        if os.path.isdir(folder):
+            for name in sorted(os.listdir(folder)):
+                archive.write(os.path.join(folder, name), name)
+    os.replace(tmp, zip_path)
+    return zip_path
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Watch Invoices/ and classify new or changed invoices.")
+    parser.add_argument("invoices", help="Invoices folder to watch")
+    parser.add_argument("--train", required=True, help="Training embeddings (store or .NET JSON)")
+    parser.add_argument("--output", default="output", help="Output folder (default: output)")
+    parser.add_argument("--embeddings", help="Per-invoice embedding cache to reuse and fill (.NET embeddings/)")
+    parser.add_argument("-k", type=int, default=3)
+    parser.add_argument("--model", default="text-embedding-3-large")
+    parser.add_argument("--poll", action="store_true", help="Poll instead of using filesystem events")
+    parser.add_argument("--interval", type=float, default=POLL_SECONDS, help="Polling interval in seconds")
+    parser.add_argument("--debounce", type=float, default=DEBOUNCE_SECONDS,
+                        help="Seconds a file must stay unchanged before it is classified")
+    parser.add_argument("--once", action="store_true", help="Classify what is new or changed, then exit")
+    parser.add_argument("--keywords", metavar="TRAIN_DIR",
+                        help="Decide clear cases from TrainData/<label>/*motherwords.txt without embedding them")
+    args = parser.parse_args(argv)
+
+    classifier = KnnClassifier.from_store(load_embeddings(args.train), k=args.k)
+    client = EmbeddingClient(args.model) if os.environ.get("OPENAI_API_KEY") or os.environ.get("OPENAI_BASE_URL") else None
+    if client is None:
+        print("⚠️ OPENAI_API_KEY is not set; only invoices with a cached embedding can be classified")
+    keywords = KeywordMatcher.from_train_dir(args.keywords) if args.keywords else None
+    watcher = InvoiceWatcher(args.invoices, args.output, classifier, args.embeddings, client,
+                             debounce=0.0 if args.once else args.debounce, keywords=keywords)
+    if args.once:
+        watcher.scan()
+        total = 0
+        while batch := watcher.ready():
+            total += len(watcher.process(batch))
+        print(f"✅ Classified {total} new or changed invoices")
+        if keywords is not None:
+            _report_keywords(watcher.stats)
+        return
+    try:
+        watcher.run(poll=args.poll, interval=args.interval)
+    finally:
+        if keywords is not None:
+            _report_keywords(watcher.stats)
+
+
+def _report_keywords(stats: dict) -> None:
+    total = stats["keywords"] + stats["embedded"]
+    print(f"🔑 Keyword hit rate {stats['keywords'] / max(1, total):.1%}: "
+          f"{stats['saved_chunks']} embedding requests ({stats['keywords']} invoices) saved, "
+          f"{stats['embedded']} invoices embedded")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+"""WebGL scatter plots that stay small at production volumes.
+
+``px.scatter`` writes every coordinate as JSON text and inlines every
+point's hover text into the HTML, so files grow to hundreds of MB and the
+SVG renderer freezes past ~20k points. ``write_scatter_html`` writes
+
+* the coordinates as base64 float32 and the labels as uint16 typed arrays,
+  drawn with ``scattergl`` (2-D) or ``scatter3d`` traces,
+* a density grid of all points as the 2-D overview, with at most
+  ``max_points`` markers on screen; zooming in redraws the markers that
+  fall inside the view, up to the same budget,
+* hover and click details (filename, label, score, ...) in chunk files
+  next to the HTML (``<name>_detail/00000.js``) that are loaded only when
+  a point is hovered. They are plain ``<script>`` files, so the page also
+  works when opened straight from disk.
+
+Points are stored in priority order - labels interleaved round-robin in a
+seeded random order - so the first ``max_points`` rows are a stratified
+sample in which small labels stay visible.
+"""
+
+import base64
+import json
+import os
+
+import numpy as np
+
+PLOTLY_CDN = "https://cdn.plot.ly/plotly-2.35.2.min.js"
+DETAIL_CHUNK_ROWS = 2000
+MAX_POINTS = 50_000
+DENSITY_BINS = 200
+
+
+def _b64(array: np.ndarray) -> str:
+    return base64.b64encode(np.ascontiguousarray(array).tobytes()).decode("ascii")
+
+
+def priority_order(codes: np.ndarray, seed: int = 0) -> np.ndarray:
+    """Row order interleaving the labels round-robin, each label in random order."""
+    rng = np.random.default_rng(seed)
+    shuffled = rng.permutation(len(codes))
+    codes = codes[shuffled]
+    by_label = np.argsort(codes, kind="stable")
+    starts = np.searchsorted(codes[by_label], codes[by_label], side="left")
+    rank = np.empty(len(codes), dtype=np.int64)
+    rank[by_label] = np.arange(len(codes)) - starts
+    return shuffled[np.lexsort((rng.random(len(codes)), rank))]
+
+
+def density_grid(points: np.ndarray, bins: int = DENSITY_BINS) -> dict:
+    counts, x_edges, y_edges = np.histogram2d(points[:, 0], points[:, 1], bins=bins)
+    return {
+        "z": _b64(counts.T.astype(np.float32)),
+        "bins": bins,
+        "x0": float(x_edges[0]), "dx": float(x_edges[1] - x_edges[0]),
+        "y0": float(y_edges[0]), "dy": float(y_edges[1] - y_edges[0]),
+    }
+
+
+def _jsonable(value):
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and np.isnan(value):
+        return None
+    return value
+
+
+def write_detail_chunks(folder: str, detail: dict[str, list], order: np.ndarray,
+                        chunk_rows: int = DETAIL_CHUNK_ROWS) -> int:
+    """Write ``detail`` columns (in ``order``) as ``window.plotDetail(i, {...})`` script chunks."""
+    os.makedirs(folder, exist_ok=True)
+    for name in os.listdir(folder):
+        if name.endswith(".js"):
+            os.remove(os.path.join(folder, name))
+    columns = list(detail)
+    values = [np.asarray(detail[c], dtype=object)[order] for c in columns]
+    n_chunks = 0
+    for n_chunks, start in enumerate(range(0, len(order), chunk_rows), start=1):
+        rows = [[_jsonable(v) for v in row] for row in zip(*(col[start:start + chunk_rows] for col in values))]
+        payload = json.dumps({"columns": columns, "rows": rows}, ensure_ascii=False)
+        with open(os.path.join(folder, f"{n_chunks - 1:05d}.js"), "w", encoding="utf-8") as f:
+            f.write(f"window.plotDetail({n_chunks - 1}, {payload});\n")
+    return n_chunks
+
+
+def write_scatter_html(path: str, points: np.ndarray, labels, detail: dict[str, list] | None = None,
+                       title: str = "", axis_titles: tuple[str, ...] = (), max_points: int = MAX_POINTS,
+                       bins: int = DENSITY_BINS, link_column: str | None = None, seed: int = 0) -> str:
+    """Write a level-of-detail WebGL scatter of 2-D or 3-D ``points`` colored by ``labels``.
+
+    ``detail`` maps column names to per-point values shown on hover; with
+    ``link_column`` clicking a point opens that column's URL. Returns the
+    folder holding the detail chunks.
+    """
+    points = np.asarray(points, dtype=np.float32)
+    if points.ndim != 2 or points.shape[1] not in (2, 3):
+        raise ValueError(f"Expected N x 2 or N x 3 points, got {points.shape}")
+    classes, codes = np.unique(np.asarray(labels, dtype=object).astype(str), return_inverse=True)
+    if len(classes) > np.iinfo(np.uint16).max:
+        raise ValueError(f"Too many labels to plot: {len(classes)}")
+
+    order = priority_order(codes, seed)
+    base = os.path.splitext(os.path.basename(path))[0]
+    detail_dir = os.path.join(os.path.dirname(os.path.abspath(path)), f"{base}_detail")
+    n_chunks = write_detail_chunks(detail_dir, detail, order) if detail else 0
+
+    spec = {
+        "title": title,
+        "dims": points.shape[1],
+        "count": len(points),
+        "points": _b64(points[order]),
+        "codes": _b64(codes[order].astype(np.uint16)),
+        "classes": classes.tolist(),
+        "axisTitles": list(axis_titles),
+        "maxPoints": max_points,
+        "density": density_grid(points, bins) if points.shape[1] == 2 and len(points) else None,
+        "detailDir": f"{base}_detail" if n_chunks else None,
+        "chunkRows": DETAIL_CHUNK_ROWS,
+        "linkColumn": link_column,
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(_HTML.replace("__PLOTLY__", PLOTLY_CDN).replace("__SPEC__", json.dumps(spec).replace("</", "<\\/")))
+    return detail_dir
+
+
+_HTML = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<script src="__PLOTLY__"></script>
+<style>
+  body { margin: 0; font-family: sans-serif; }
+  #plot { width: 100vw; height: 92vh; }
+  #detail { height: 8vh; padding: 4px 12px; overflow: auto; font-size: 13px; border-top: 1px solid #ccc; }
+</style>
+</head>
+<body>
+<div id="plot"></div>
+<div id="detail">Hover a point for details.</div>
+<script>
+const spec = __SPEC__;
+
+function decode(b64, Type) {
+  const bytes = Uint8Array.from(atob(b64), c => c.charCodeAt(0));
+  return new Type(bytes.buffer);
+}
+const pts = decode(spec.points, Float32Array);
+const codes = decode(spec.codes, Uint16Array);
+const dims = spec.dims;
+
+// Detail chunks are loaded on demand by appending script elements.
+const chunks = {}, waiting = {};
+window.plotDetail = (i, data) => { chunks[i] = data; (waiting[i] || []).forEach(cb => cb(data)); delete waiting[i]; };
+function withDetail(row, cb) {
+  if (!spec.detailDir) return;
+  const i = Math.floor(row / spec.chunkRows);
+  const done = data => {
+    const values = data.rows[row - i * spec.chunkRows];
+    cb(Object.fromEntries(data.columns.map((c, j) => [c, values[j]])));
+  };
+  if (chunks[i]) return done(chunks[i]);
+  if (waiting[i]) return waiting[i].push(done);
+  waiting[i] = [done];
+  const s = document.createElement("script");
+  s.src = spec.detailDir + "/" + String(i).padStart(5, "0") + ".js";
+  document.head.appendChild(s);
+}
+
+// Fixed color per label, so colors survive traces dropping out of the view.
+const PALETTE = ["#636efa", "#ef553b", "#00cc96", "#ab63fa", "#ffa15a", "#19d3f3", "#ff6692", "#b6e880",
+                 "#ff97ff", "#fecb52"];
+
+// Markers: the first maxPoints rows (in priority order) inside the view.
+function markers(range) {
+  const traces = spec.classes.map((name, code) => ({ name, code, rows: [], coords: [] }));
+  let shown = 0;
+  for (let r = 0; r < spec.count && shown < spec.maxPoints; r++) {
+    const x = pts[r * dims], y = pts[r * dims + 1];
+    if (range && (x < range.x0 || x > range.x1 || y < range.y0 || y > range.y1)) continue;
+    const t = traces[codes[r]];
+    t.rows.push(r);
+    for (let d = 0; d < dims; d++) t.coords.push(pts[r * dims + d]);
+    shown++;
+  }
+  return traces.filter(t => t.rows.length).map(t => {
+    const c = Float32Array.from(t.coords);
+    const axis = d => c.filter((_, i) => i % dims === d);
+    const trace = {
+      type: dims === 3 ? "scatter3d" : "scattergl", mode: "markers", name: t.name,
+      x: axis(0), y: axis(1), customdata: Int32Array.from(t.rows),
+      marker: { size: dims === 3 ? 3 : 5, opacity: 0.8, color: PALETTE[t.code % PALETTE.length] },
+      hoverinfo: "name",
+    };
+    if (dims === 3) trace.z = axis(2);
+    return trace;
+  });
+}
+
+function density() {
+  const g = spec.density;
+  if (!g) return [];
+  const z = decode(g.z, Float32Array), rows = [];
+  for (let i = 0; i < g.bins; i++) rows.push(Array.from(z.subarray(i * g.bins, (i + 1) * g.bins), v => v || null));
+  return [{ type: "heatmap", z: rows, x0: g.x0 + g.dx / 2, dx: g.dx, y0: g.y0 + g.dy / 2, dy: g.dy,
+            colorscale: "Greys", reversescale: false, showscale: false, opacity: 0.35, hoverinfo: "skip",
+            name: "density" }];
+}
+
+const layout = { title: spec.title, margin: { l: 40, r: 10, t: 40, b: 40 }, legend: { itemsizing: "constant" } };
+const titles = spec.axisTitles;
+if (dims === 3) layout.scene = { xaxis: { title: titles[0] }, yaxis: { title: titles[1] }, zaxis: { title: titles[2] } };
+else { layout.xaxis = { title: titles[0] }; layout.yaxis = { title: titles[1] }; }
+
+const div = document.getElementById("plot");
+const background = density();
+Plotly.newPlot(div, background.concat(markers(null)), layout, { responsive: true });
+
+if (dims === 2) {
+  div.on("plotly_relayout", ev => {
+    if (ev["xaxis.autorange"] || ev["yaxis.autorange"]) {
+      return Plotly.react(div, background.concat(markers(null)), div.layout);
+    }
+    const xr = div.layout.xaxis.range, yr = div.layout.yaxis.range;
+    if (!xr || !yr) return;
+    Plotly.react(div, background.concat(markers({ x0: xr[0], x1: xr[1], y0: yr[0], y1: yr[1] })), div.layout);
+  });
+}
+
+const panel = document.getElementById("detail");
+div.on("plotly_hover", ev => {
+  const row = ev.points[0].customdata;
+  if (row === undefined) return;
+  withDetail(row, d => {
+    panel.textContent = Object.entries(d).map(([k, v]) => k + ": " + v).join("  |  ");
+  });
+});
+if (spec.linkColumn) {
+  div.on("plotly_click", ev => {
+    const row = ev.points[0].customdata;
+    if (row !== undefined) withDetail(row, d => d[spec.linkColumn] && window.open(d[spec.linkColumn], "_blank"));
+  });
+}
+</script>
+</body>
+</html>
+"""
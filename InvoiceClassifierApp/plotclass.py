@@ -1,18 +1,67 @@
 
-from flask import Flask, request, render_template_string, redirect, send_file
-import subprocess
+from flask import Flask, Response, request, render_template_string, redirect, send_file, jsonify, url_for
 import os
 
+from invoice_tools.config import load_config
+from invoice_tools.downloads import (COMPRESSION, attachment_filename, label_members, predicted_labels, stream_zip,
+                                     zip_etag)
+from invoice_tools.jobs import JobQueue, count_lines_progress
+from invoice_tools.resultsdb import DEFAULT_LIMIT, ResultsDB
+from invoice_tools.service import ClassificationService, ServiceNotReady
+from invoice_tools.uploads import UploadStore
+
 app = Flask(__name__)
-UPLOAD_FOLDER = 'C:\\Users\\Senthil Arumugam\\Downloads\\InvoiceClassifierApp_MVP_CleanFinal\\InvoiceClassifierApp\\Invoices'
-TRAIN_FOLDER = 'C:\\Users\\Senthil Arumugam\\Downloads\\InvoiceClassifierApp_MVP_CleanFinal\\InvoiceClassifierApp\\TrainData'
-SOURCE_FOLDER = 'source'
-TARGET_FOLDER = 'C:\\Users\\Senthil Arumugam\\Downloads\\InvoiceClassifierApp_MVP_CleanFinal\\InvoiceClassifierApp\\bin\\output'
+# Paths come from invoice_tools.json / $INVOICE_TOOLS_CONFIG, by default relative to this folder
+config = load_config()
+APP_DIR = config.app_dir
+UPLOAD_FOLDER = config.invoices
+TRAIN_FOLDER = config.train_data
+SOURCE_FOLDER = config.match_source
+TARGET_FOLDER = config.match_target
+# Program.cs runs with APP_DIR as working directory and writes output/predictions.csv there
+OUTPUT_FOLDER = config.output
+PREDICTIONS_CSV = config.predictions_csv
+# Indexed copy of predictions.csv behind /api/predictions, refreshed when the CSV changes
+PREDICTIONS_DB = config.predictions_db
+# Written by InvoiceProcessor.TrainAsync; a converted embedding store is used instead when present
+TRAIN_EMBEDDINGS = config.train_embeddings
+TRAIN_STORE = config.train_store
+EMBEDDINGS_CACHE = config.embeddings_cache
+UPLOAD_STORE = config.uploads
+# Memory-mapped training snapshots shared by all worker processes
+TRAINING_SNAPSHOTS = config.training_snapshots
+# Job records, logs and the pipeline lock, shared by all worker processes
+JOBS_FOLDER = config.jobs
+# Files served by /download/<name>; the first existing path wins
+DOWNLOADS = {
+    'predictions': [PREDICTIONS_CSV],
+    'similarity': [os.path.join(OUTPUT_FOLDER, 'similarity_results.csv'),
+                   os.path.join(EMBEDDINGS_CACHE, 'SimilarityResults.csv')],
+    'similarity-matrix': [os.path.join(EMBEDDINGS_CACHE, 'SimilarityMatrix.csv')],
+}
 
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 os.makedirs(TRAIN_FOLDER, exist_ok=True)
 os.makedirs(SOURCE_FOLDER, exist_ok=True)
 
+uploads = UploadStore(UPLOAD_STORE)
+results = ResultsDB(PREDICTIONS_DB, PREDICTIONS_CSV)
+
+# Pipeline runs happen in the background; both commands write to the same
+# output and embeddings folders, so they share one lock and run one at a time.
+# With JOBS_FOLDER this also holds across the workers of a multi-worker server.
+jobs = JobQueue(workers=2, state_dir=JOBS_FOLDER)
+PIPELINE_LOCK = "dotnet-pipeline"
+
+# Training data is loaded once in the background and kept warm for /api/classify;
+# under a multi-worker server every worker maps the same snapshot
+classifier_service = ClassificationService(
+    TRAIN_STORE if os.path.isdir(TRAIN_STORE) else TRAIN_EMBEDDINGS,
+    embeddings_dir=EMBEDDINGS_CACHE,
+    k=3,
+    snapshot_dir=TRAINING_SNAPSHOTS,
+).start()
+
 HTML = """
 <!doctype html>
 <html>
@@ -63,61 +112,212 @@ HTML = """
 </form>
 
 <h2>Run Classification</h2>
-<form action="/classify" method="post">
+<form action="/classify" method="post" class="job-form">
   <input type=submit value="Run Classify">
 </form>
 
 <h2>Run Similarity Match</h2>
-<form action="/match" method="post">
+<form action="/match" method="post" class="job-form">
   <input type=submit value="Run Match">
 </form>
 
+<h2>Jobs</h2>
+<div id="job-status">No job started yet.</div>
+<pre id="job-log" style="max-height: 240px; overflow: auto; background: white; padding: 10px;"></pre>
+
 <h2>Download Outputs</h2>
 <ul>
   <li><a href="/download/predictions">Download predictions.csv</a></li>
   <li><a href="/download/similarity">Download similarity_results.csv</a></li>
+  <li><a href="/download/similarity-matrix">Download SimilarityMatrix.csv</a></li>
+  {% for label in labels %}
+  <li><a href="/download/zip/{{ label|urlencode }}">Download {{ label }}.zip</a></li>
+  {% endfor %}
 </ul>
+<script>
+let currentJob = null, logCursor = 0;
+document.querySelectorAll(".job-form").forEach(form => {
+  form.addEventListener("submit", async e => {
+    e.preventDefault();
+    const resp = await fetch(form.action, {method: "POST", headers: {"Accept": "application/json"}});
+    const job = await resp.json();
+    if (job.id !== currentJob) { currentJob = job.id; logCursor = 0; document.getElementById("job-log").textContent = ""; }
+    poll();
+  });
+});
+async function cancelJob() {
+  if (currentJob) await fetch(`/jobs/${currentJob}/cancel`, {method: "POST"});
+}
+async function poll() {
+  if (!currentJob) return;
+  const job = await (await fetch(`/jobs/${currentJob}`)).json();
+  const log = await (await fetch(`/jobs/${currentJob}/log?since=${logCursor}`)).json();
+  logCursor = log.next;
+  const pre = document.getElementById("job-log");
+  pre.textContent += log.lines.map(l => l + "\\n").join("");
+  pre.scrollTop = pre.scrollHeight;
+  const running = job.status === "queued" || job.status === "running";
+  document.getElementById("job-status").innerHTML =
+    `${job.kind} job ${job.id}: <b>${job.status}</b> (${Math.round(job.progress * 100)}%)` +
+    (running ? ' <button onclick="cancelJob()">Cancel</button>' : "");
+  if (running) setTimeout(poll, 1000);
+}
+</script>
 </body>
 </html>
 """
 
 @app.route("/")
 def index():
-    return render_template_string(HTML)
+    return render_template_string(HTML, labels=sorted(predicted_labels(PREDICTIONS_CSV)))
 
 @app.route("/upload", methods=["POST"])
 def upload():
     for f in request.files.getlist("training_files"):
-        f.save(os.path.join(TRAIN_FOLDER, f.filename))
+        if f.filename:
+            uploads.save(f.stream, f.filename, TRAIN_FOLDER)
     for f in request.files.getlist("invoice_files"):
-        f.save(os.path.join(UPLOAD_FOLDER, f.filename))
+        if f.filename:
+            uploads.save(f.stream, f.filename, UPLOAD_FOLDER)
+    return redirect("/")
+
+def job_response(job, created):
+    """JSON for API clients, a redirect back to the page for plain form posts."""
+    if request.accept_mimetypes.best == "application/json":
+        body = job.to_dict()
+        body["created_new"] = created
+        return jsonify(body), 202, {"Location": url_for("job_status", job_id=job.id)}
     return redirect("/")
 
 @app.route("/classify", methods=["POST"])
 def classify():
-    subprocess.run(
-        [
-            "dotnet", "run",
-            "--project", "InvoiceClassifierApp.csproj"
-        ],
-        cwd="C:/Users/Senthil Arumugam/Downloads/InvoiceClassifierApp_MVP_CleanFinal/InvoiceClassifierApp",
-        shell=True
+    # Program.cs logs one "[file] → label" line per classified invoice
+    total = len([f for f in os.listdir(UPLOAD_FOLDER) if f.lower().endswith(".pdf")])
+    job, created = jobs.submit(
+        "classify",
+        ["dotnet", "run", "--project", "InvoiceClassifierApp.csproj"],
+        cwd=APP_DIR,
+        lock=PIPELINE_LOCK,
+        progress=count_lines_progress("→", total),
     )
-    return redirect("/")
+    return job_response(job, created)
 
 @app.route("/match", methods=["POST"])
 def match():
-    subprocess.run(["dotnet", "run", "--project", "InvoiceClassifierApp.csproj", "match", "--source", SOURCE_FOLDER, "--target", TARGET_FOLDER, "--model", "text-embedding-3-small"],cwd="C:\\Users\\Senthil Arumugam\\Downloads\\InvoiceClassifierApp_MVP_CleanFinal\\InvoiceClassifierApp")
-    return redirect("/")
+    job, created = jobs.submit(
+        "match",
+        ["dotnet", "run", "--project", "InvoiceClassifierApp.csproj", "match", "--source", SOURCE_FOLDER, "--target", TARGET_FOLDER, "--model", "text-embedding-3-small"],
+        cwd=APP_DIR,
+        lock=PIPELINE_LOCK,
+    )
+    return job_response(job, created)
+
+@app.route("/jobs")
+def list_jobs():
+    return jsonify([job.to_dict() for job in jobs.all_jobs()])
+
+@app.route("/jobs/<job_id>")
+def job_status(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "unknown job"}), 404
+    return jsonify(job.to_dict())
+
+@app.route("/jobs/<job_id>/log")
+def job_log(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "unknown job"}), 404
+    lines, next_cursor = job.log_since(request.args.get("since", 0, type=int))
+    return jsonify({"lines": lines, "next": next_cursor})
+
+@app.route("/jobs/<job_id>/cancel", methods=["POST"])
+def cancel_job(job_id):
+    if jobs.get(job_id) is None:
+        return jsonify({"error": "unknown job"}), 404
+    return jsonify({"cancelled": jobs.cancel(job_id)})
+
+@app.route("/api/classify", methods=["POST"])
+def api_classify():
+    files = request.files.getlist("files") + request.files.getlist("invoice_files")
+    if not files:
+        return jsonify({"error": "no files uploaded (use the 'files' field)"}), 400
+    try:
+        result = classifier_service.classify_files(
+            [(f.filename, f.read()) for f in files], timeout=request.args.get("timeout", 0, type=float)
+        )
+    except ServiceNotReady as e:
+        return jsonify({"error": str(e)}), 503
+    return jsonify(result)
+
+@app.route("/api/classify/status")
+def api_classify_status():
+    return jsonify(classifier_service.status())
+
+@app.route("/api/classify/reload", methods=["POST"])
+def api_classify_reload():
+    classifier_service.start()
+    return jsonify(classifier_service.status()), 202
+
+def prediction_filters():
+    return {
+        "min_score": request.args.get("min_score", type=float),
+        "max_score": request.args.get("max_score", type=float),
+        "prefix": request.args.get("prefix") or None,
+    }
+
+@app.route("/api/predictions")
+def api_predictions():
+    # ?label=&min_score=&max_score=&prefix=&order=filename|score|-score&limit=&cursor=
+    try:
+        results.sync()
+        page = results.query(
+            label=request.args.get("label") or None,
+            order=request.args.get("order", "filename"),
+            limit=request.args.get("limit", DEFAULT_LIMIT, type=int),
+            cursor=request.args.get("cursor") or None,
+            **prediction_filters(),
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"items": page.rows, "next": page.next_cursor})
+
+@app.route("/api/predictions/counts")
+def api_prediction_counts():
+    try:
+        results.sync()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    counts = results.counts(**prediction_filters())
+    return jsonify({"labels": counts, "total": sum(counts.values())})
 
-@app.route("/download/predictions")
-def download_predictions():
-    return send_file("C:/Users/Senthil Arumugam/Downloads/InvoiceClassifierApp_MVP_VerifiedFinal/InvoiceClassifierApp/output/predictions.csv",
-    as_attachment = True)
+@app.route("/download/zip/<label>")
+def download_label_zip(label):
+    # Built from the original invoices while it is sent; ?compression=deflate to compress
+    compression = request.args.get("compression", "stored")
+    if compression not in COMPRESSION:
+        return jsonify({"error": f"compression must be one of {sorted(COMPRESSION)}"}), 400
+    members = label_members(label, PREDICTIONS_CSV, UPLOAD_FOLDER, OUTPUT_FOLDER)
+    if members is None:
+        return jsonify({"error": f"unknown label {label!r}"}), 404
+    etag = zip_etag(members, compression)
+    headers = {"ETag": f'"{etag}"', "Cache-Control": "no-cache"}
+    if request.if_none_match.contains(etag):
+        return Response(status=304, headers=headers)
+    response = Response(stream_zip(members, compression), mimetype="application/zip", headers=headers)
+    response.headers.set("Content-Disposition", "attachment", **attachment_filename(f"{label}.zip"))
+    return response
 
-@app.route("/download/similarity")
-def download_similarity():
-    return send_file("output/similarity_results.csv", as_attachment=True)
+@app.route("/download/<name>")
+def download_output(name):
+    # send_file answers If-None-Match with 304 and Range/If-Range with 206, so
+    # repeated downloads are free and interrupted ones resume
+    path = next((p for p in DOWNLOADS.get(name, []) if os.path.isfile(p)), None)
+    if path is None:
+        return jsonify({"error": f"{name} is not available"}), 404
+    response = send_file(path, as_attachment=True, conditional=True, etag=True)
+    response.headers["Cache-Control"] = "no-cache"
+    return response
 
 if __name__ == "__main__":
     app.run(debug=True)